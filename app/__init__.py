@@ -1,9 +1,11 @@
 from flask import Flask
 from .config import Config
 from .models import db
+from .models.payload import dumps_json
 from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
 from flask_migrate import Migrate
+from .utils.log import configure_logging
 
 jwt = JWTManager()
 bcrypt = Bcrypt()
@@ -12,11 +14,23 @@ migrate = Migrate()
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    configure_logging(app)
+
+    # Las columnas JSON reutilizan el JSON ya calculado de ScenePayload
+    engine_options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    engine_options.setdefault('json_serializer', dumps_json)
 
     db.init_app(app)
     jwt.init_app(app)
     bcrypt.init_app(app)
     migrate.init_app(app, db)
+
+    from .services.user_cache import user_cache
+    user_cache.ttl = app.config.get('USER_CACHE_TTL', 30)
+
+    from .models.stats import init_stats
+    init_stats(app)
+
     with app.app_context():
         from .routes import init_routes
         init_routes(app)
@@ -18,8 +18,63 @@ class Config:
     FIBO_API_URL = 'https://engine.prod.bria-api.com/v2'
     FIBO_API_KEY = 'f7b5e814d48a4544b18433faabc6587d'
 
+    # Pool HTTP hacia Bria (keep-alive + reintentos)
+    FIBO_HTTP_POOL_CONNECTIONS = 4   # Hosts distintos cacheados
+    FIBO_HTTP_POOL_MAXSIZE = 16      # Conexiones por host (>= GENERATION_MAX_PARALLEL)
+    FIBO_HTTP_RETRIES = 3
+    FIBO_HTTP_BACKOFF = 0.5
+
+    # Caché de resultados por hash del payload ('memory', 'sqlite' o None)
+    FIBO_RESULT_CACHE = 'memory'
+    FIBO_RESULT_CACHE_PATH = './fibo_result_cache.sqlite3'
+    FIBO_RESULT_CACHE_TTL = 21600  # 6 horas
+    FIBO_RESULT_CACHE_MAX_ENTRIES = 1024
+
+    # Coalescencia de generaciones duplicadas entre procesos (None = solo en proceso)
+    FIBO_SINGLE_FLIGHT_LOCK_DIR = None
+
     # Mock mode
     FIBO_MOCK_MODE = False
+
+    # sync=False: Bria devuelve un request_id y ResultPoller consulta el resultado
+    FIBO_SYNC_MODE = True
+    FIBO_POLL_INITIAL_INTERVAL = 1.0
+    FIBO_POLL_MAX_INTERVAL = 15.0
+    FIBO_POLL_BACKOFF = 1.5
+    FIBO_POLL_TIMEOUT = 600
+    FIBO_POLL_LEASE_PATH = './fibo_result_poller.lock'  # Un solo worker retoma pendientes (None = todos)
+    FIBO_RESULT_ENDPOINT_TTL = 3600  # Cache de la forma de URL de resultados
+
+    # Cola de generación asíncrona (/generation/single devuelve 202)
+    GENERATION_QUEUE_MODE = False
+    GENERATION_QUEUE_PATH = './generation_queue.sqlite3'  # Compartida entre procesos; sobrevive reinicios
+    GENERATION_QUEUE_WORKERS = 2
+    GENERATION_QUEUE_POLL_INTERVAL = 0.5
+
+    # Concurrencia de storyboards (/generation/sequence)
+    GENERATION_MAX_PARALLEL = 8
+    GENERATION_MAX_PARALLEL_PER_USER = 4
+    CAMERA_PATH_MAX_KEYFRAMES = 10000  # /generation/camera-path
+
+    # Ventana del cupo: 'daily' (se reinicia a medianoche UTC, de forma
+    # perezosa en la primera reserva) o 'rolling' (token bucket de 24 h)
+    GENERATION_QUOTA_WINDOW = 'daily'
+
+    # Instantáneas de usuario para los decoradores de permisos (segundos)
+    USER_CACHE_TTL = 30
+
+    # Estadísticas desde tablas de contadores mantenidas en cada flush
+    # (False = agregación condicional en un solo SELECT, ver app/models/stats.py)
+    STATS_COUNTERS = False
+
+    # Logging estructurado (ver app/utils/log.py)
+    LOG_LEVEL = 'INFO'
+    LOG_LEVELS = {
+        'app.services.fibo_service': 'INFO',  # 'DEBUG' incluye payloads truncados
+    }
+    LOG_MAX_FIELD_LENGTH = 500
+    LOG_ASYNC = True
+
     # Storage
     UPLOAD_FOLDER = './uploads'
     OUTPUT_FOLDER = './outputs'
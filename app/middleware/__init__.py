@@ -6,12 +6,18 @@ from app.middleware.auth_middleware import (
     admin_required,
     verified_required,
     check_generation_limit,
-    owner_required
+    plan_required,
+    owner_required,
+    get_current_user,
+    get_current_user_snapshot
 )
 
 __all__ = [
     'admin_required',
     'verified_required',
     'check_generation_limit',
-    'owner_required'
+    'plan_required',
+    'owner_required',
+    'get_current_user',
+    'get_current_user_snapshot'
 ]
@@ -2,14 +2,50 @@
 Custom middleware decorators for authentication and authorization.
 """
 from functools import wraps
-from flask import jsonify, request
+from flask import g, jsonify, request
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
-from app.models.user import User
+from app.models.user import User, PLAN_LEVELS
 from app.models import db
+from app.services.user_cache import user_cache, snapshot_of
 from datetime import datetime, timedelta
 import os
 
 
+def get_current_user():
+    """
+    Usuario autenticado, cargado como mucho una vez por request.
+    
+    El resultado queda en flask.g, así que apilar decoradores y llamar a
+    esta función desde la vista no repite la consulta por primary key.
+    
+    Returns:
+        User o None si el usuario del token ya no existe
+    """
+    if 'current_user' not in g:
+        verify_jwt_in_request()
+        g.current_user = User.query.get(get_jwt_identity())
+    return g.current_user
+
+
+def get_current_user_snapshot():
+    """
+    Instantánea (id, plan, is_verified, is_active) del usuario autenticado.
+    
+    Si el User ya se cargó en esta request se usa directamente; si no, se
+    consulta la caché con TTL de app.services.user_cache.
+    """
+    if g.get('current_user') is not None:
+        return snapshot_of(g.current_user)
+    
+    verify_jwt_in_request()
+    return user_cache.get(get_jwt_identity(), _load_snapshot)
+
+
+def _load_snapshot(user_id):
+    user = get_current_user()
+    return snapshot_of(user) if user else None
+
+
 def admin_required(fn):
     """
     Decorator que requiere que el usuario sea admin (plan enterprise).
@@ -23,9 +59,7 @@ def admin_required(fn):
     """
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        verify_jwt_in_request()
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user_snapshot()
         
         if not user:
             return jsonify({"error": "Usuario no encontrado"}), 404
@@ -54,9 +88,7 @@ def verified_required(fn):
     """
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        verify_jwt_in_request()
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user_snapshot()
         
         if not user:
             return jsonify({"error": "Usuario no encontrado"}), 404
@@ -85,9 +117,8 @@ def check_generation_limit(fn):
     """
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        verify_jwt_in_request()
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        # Los contadores cambian en cada generación: se usa el User real
+        user = get_current_user()
         
         if not user:
             return jsonify({"error": "Usuario no encontrado"}), 404
@@ -119,24 +150,17 @@ def plan_required(required_plan='pro'):
         def pro_feature():
             ...
     """
-    plan_hierarchy = {
-        'free': 0,
-        'pro': 1,
-        'enterprise': 2
-    }
+    required_plan_level = PLAN_LEVELS.get(required_plan, 0)
     
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
-            user = User.query.get(current_user_id)
+            user = get_current_user_snapshot()
             
             if not user:
                 return jsonify({"error": "Usuario no encontrado"}), 404
             
-            user_plan_level = plan_hierarchy.get(user.plan, 0)
-            required_plan_level = plan_hierarchy.get(required_plan, 0)
+            user_plan_level = PLAN_LEVELS.get(user.plan, 0)
             
             if user_plan_level < required_plan_level:
                 return jsonify({
@@ -11,6 +11,7 @@ Importa todos los modelos en el orden correcto para evitar dependencias circular
 # Importar modelos de base de datos en orden de dependencias
 from app.models.user import User
 from app.models.project import Project, Generation
+from app.models.stats import ProjectStats, UserStats
 
 # Importar dataclasses (no tienen dependencias de DB)
 from app.models.camera import CameraSettings
@@ -22,6 +23,8 @@ __all__ = [
     'User',
     'Project',
     'Generation',
+    'ProjectStats',
+    'UserStats',
     'CameraSettings',
     'LightingSetup',
     'LightSource',
@@ -1,13 +1,19 @@
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field
 from typing import Optional, Dict, Any
 
-@dataclass
+from app.models.constraints import camera_errors, first_error
+from app.models.serialization import compile_serializer, field_layout
+
+@dataclass(slots=True, frozen=True)
 class CameraSettings:
     """
     Configuración de cámara estilo cinematográfico.
     
     Simula controles profesionales de cámara para generación de imágenes.
     Todos los parámetros están inspirados en cinematografía real.
+
+    Es un valor inmutable (frozen): para variarla se crea otra instancia con
+    dataclasses.replace().
     """
     
     # ============ ÁNGULOS DE CÁMARA ============
@@ -166,47 +172,6 @@ class CameraSettings:
         - 2.39:1: Anamórfico (cine épico)
     """
     
-    def to_fibo_json(self) -> Dict[str, Any]:
-        """
-        Convierte los settings a formato JSON compatible con FIBO API.
-        
-        Returns:
-            dict: Parámetros formateados para FIBO
-        """
-        return {
-            "camera": {
-                "angle": self.angle,
-                "shot_type": self.shot_type,
-                "movement": self.movement,
-                "fov": self.fov,
-                "focal_length": self.focal_length,
-                "aperture": self.aperture,
-                "sensor_size": self.sensor_size
-            },
-            "composition": {
-                "rule": self.composition_rule,
-                "depth_of_field": self.depth_of_field,
-                "focus_point": self.focus_point
-            },
-            "optical_effects": {
-                "lens_distortion": self.lens_distortion,
-                "vignette": self.vignette,
-                "chromatic_aberration": self.chromatic_aberration
-            },
-            "format": {
-                "aspect_ratio": self.aspect_ratio
-            }
-        }
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """
-        Convierte a diccionario simple.
-        
-        Returns:
-            dict: Todos los campos como diccionario
-        """
-        return asdict(self)
-    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'CameraSettings':
         """
@@ -297,27 +262,48 @@ class CameraSettings:
         """
         Valida que los parámetros estén en rangos aceptables.
         
+        Las restricciones están en app/models/constraints.py; camera_errors()
+        devuelve todas las violaciones en lugar de solo la primera.
+        
         Returns:
             tuple: (es_válido, mensaje_error)
         """
-        # Validar FOV
-        if not 10 <= self.fov <= 150:
-            return False, "FOV debe estar entre 10 y 150 grados"
-        
-        # Validar focal length
-        if not 10 <= self.focal_length <= 500:
-            return False, "Focal length debe estar entre 10mm y 500mm"
-        
-        # Validar aperture
-        if not 0.95 <= self.aperture <= 32:
-            return False, "Aperture debe estar entre f/0.95 y f/32"
-        
-        # Validar lens distortion
-        if not -1.0 <= self.lens_distortion <= 1.0:
-            return False, "Lens distortion debe estar entre -1.0 y 1.0"
-        
-        # Validar vignette
-        if not 0.0 <= self.vignette <= 1.0:
-            return False, "Vignette debe estar entre 0.0 y 1.0"
-        
-        return True, None
\ No newline at end of file
+        return first_error(camera_errors(self))
+
+
+# ============ SERIALIZACIÓN ============
+# Métodos generados una vez a partir de los layouts (ver serialization.py)
+
+CAMERA_FIBO_LAYOUT = (
+    ("camera", (
+        ("angle", "angle"),
+        ("shot_type", "shot_type"),
+        ("movement", "movement"),
+        ("fov", "fov"),
+        ("focal_length", "focal_length"),
+        ("aperture", "aperture"),
+        ("sensor_size", "sensor_size"),
+    )),
+    ("composition", (
+        ("rule", "composition_rule"),
+        ("depth_of_field", "depth_of_field"),
+        ("focus_point", "focus_point"),
+    )),
+    ("optical_effects", (
+        ("lens_distortion", "lens_distortion"),
+        ("vignette", "vignette"),
+        ("chromatic_aberration", "chromatic_aberration"),
+    )),
+    ("format", (
+        ("aspect_ratio", "aspect_ratio"),
+    )),
+)
+
+CameraSettings.to_fibo_json = compile_serializer(
+    CameraSettings, "to_fibo_json", CAMERA_FIBO_LAYOUT,
+    "Convierte los settings a formato JSON compatible con FIBO API."
+)
+CameraSettings.to_dict = compile_serializer(
+    CameraSettings, "to_dict", field_layout(CameraSettings),
+    "Convierte a diccionario simple con todos los campos."
+)
@@ -0,0 +1,193 @@
+"""
+Restricciones de Scene, CameraSettings y LightingSetup declaradas como datos.
+
+Las mismas tablas alimentan:
+    - los validadores compilados de este módulo (validate() de cada clase y
+      validate_scenes() para un storyboard completo)
+    - los esquemas Pydantic de app/schemas/validation.py
+
+Cada validador se genera una sola vez al importar: una función con un `if`
+por restricción, sin bucles sobre la tabla ni getattr en tiempo de
+ejecución, que devuelve todas las violaciones (no solo la primera).
+"""
+from typing import Any, Callable, List, NamedTuple, Sequence
+
+
+class Constraint(NamedTuple):
+    field: str
+    kind: str                 # 'range' | 'not_blank' | 'max_length'
+    low: Any = None
+    high: Any = None
+    message: str = ""
+    optional: bool = False    # None es válido
+
+
+class Nested(NamedTuple):
+    field: str
+    rules: tuple
+    prefix: str
+
+
+class EachItem(NamedTuple):
+    field: str
+    rules: tuple
+    prefix: str               # con {} para el índice del elemento
+
+
+def between(field: str, low, high, message: str, optional: bool = False) -> Constraint:
+    """low <= valor <= high; el mensaje puede usar {low} y {high}"""
+    return Constraint(field, 'range', low, high, message.format(low=low, high=high), optional)
+
+
+# ============ TABLAS ============
+
+CAMERA_CONSTRAINTS = (
+    between('fov', 10, 150, "FOV debe estar entre {low} y {high} grados"),
+    between('focal_length', 10, 500, "Focal length debe estar entre {low}mm y {high}mm"),
+    between('aperture', 0.95, 32, "Aperture debe estar entre f/{low} y f/{high}"),
+    between('lens_distortion', -1.0, 1.0, "Lens distortion debe estar entre {low} y {high}"),
+    between('vignette', 0.0, 1.0, "Vignette debe estar entre {low} y {high}"),
+)
+
+LIGHT_SOURCE_CONSTRAINTS = (
+    between('intensity', 0.0, 2.0, "intensity debe estar entre {low} y {high}"),
+    between('color_temp', 1000, 12000, "color_temp debe estar entre {low}K y {high}K"),
+    between('softness', 0.0, 1.0, "softness debe estar entre {low} y {high}"),
+)
+
+LIGHTING_CONSTRAINTS = (
+    between('ambient_intensity', 0.0, 1.0, "Ambient intensity debe estar entre {low} y {high}"),
+    between('contrast', 0.1, 3.0, "Contrast debe estar entre {low} y {high}"),
+    between('exposure', -3.0, 3.0, "Exposure debe estar entre {low} y {high}"),
+    between('highlights', -1.0, 1.0, "Highlights debe estar entre {low} y {high}"),
+    between('shadows', -1.0, 1.0, "Shadows debe estar entre {low} y {high}"),
+    between('fog', 0.0, 1.0, "Fog debe estar entre {low} y {high}"),
+    between('haze', 0.0, 1.0, "Haze debe estar entre {low} y {high}"),
+    between('shadow_intensity', 0.0, 2.0, "Shadow intensity debe estar entre {low} y {high}"),
+    between('bloom', 0.0, 1.0, "Bloom debe estar entre {low} y {high}"),
+)
+
+SCENE_CONSTRAINTS = (
+    Constraint('prompt', 'not_blank', message="El prompt no puede estar vacío"),
+    Constraint('prompt', 'max_length', high=2000, message="El prompt no puede exceder 2000 caracteres"),
+    between('width', 256, 2048, "Width debe estar entre {low} y {high}"),
+    between('height', 256, 2048, "Height debe estar entre {low} y {high}"),
+    between('steps', 10, 100, "Steps debe estar entre {low} y {high}"),
+    between('guidance_scale', 1.0, 20.0, "Guidance scale debe estar entre {low} y {high}"),
+    between('seed', 0, None, "Seed debe ser un número positivo", optional=True),
+    between('detail_level', 0.1, 3.0, "Detail level debe estar entre {low} y {high}"),
+    between('texture_strength', 0.0, 3.0, "Texture strength debe estar entre {low} y {high}"),
+    between('sharpness', 0.1, 2.0, "Sharpness debe estar entre {low} y {high}"),
+)
+
+# Reglas completas de cada clase, incluidas las anidadas
+LIGHTING_RULES = (
+    *LIGHTING_CONSTRAINTS,
+    EachItem('lights', LIGHT_SOURCE_CONSTRAINTS, "Light {}: "),
+)
+
+SCENE_RULES = (
+    *SCENE_CONSTRAINTS,
+    Nested('camera', CAMERA_CONSTRAINTS, "Error en cámara: "),
+    Nested('lighting', LIGHTING_RULES, "Error en iluminación: "),
+)
+
+
+# ============ COMPILACIÓN ============
+
+def _failure(constraint: Constraint, value: str) -> str:
+    """Condición Python que es verdadera si `value` viola la restricción"""
+    if constraint.kind == 'not_blank':
+        condition = f"not {value} or not {value}.strip()"
+    elif constraint.kind == 'max_length':
+        condition = f"{value} is not None and len({value}) > {constraint.high!r}"
+    elif constraint.kind == 'range':
+        chain = value
+        if constraint.low is not None:
+            chain = f"{constraint.low!r} <= {chain}"
+        if constraint.high is not None:
+            chain = f"{chain} <= {constraint.high!r}"
+        condition = f"not ({chain})"
+    else:
+        raise ValueError(f"Tipo de restricción desconocido: {constraint.kind!r}")
+
+    if constraint.optional:
+        condition = f"{value} is not None and {condition}"
+    return condition
+
+
+def compile_validator(name: str, rules: Sequence) -> Callable[[Any], List[str]]:
+    """
+    Genera `name(obj) -> list[str]` con todas las violaciones de `rules`.
+
+    Los mensajes se guardan como constantes del módulo generado, así que
+    el texto nunca se interpola en el código fuente.
+    """
+    messages = []
+    lines = []
+
+    def message(text: str) -> str:
+        messages.append(text)
+        return f"_m{len(messages) - 1}"
+
+    def emit(rules, obj, prefix, indexes, indent):
+        pad = "    " * indent
+        for rule in rules:
+            if isinstance(rule, Nested):
+                emit(rule.rules, f"{obj}.{rule.field}", prefix + rule.prefix, indexes, indent)
+            elif isinstance(rule, EachItem):
+                depth = len(indexes)
+                item, index = f"_item{depth}", f"_i{depth}"
+                lines.append(f"{pad}for {index}, {item} in enumerate({obj}.{rule.field} or ()):")
+                emit(rule.rules, item, prefix + rule.prefix, indexes + [index], indent + 1)
+            else:
+                text = prefix + rule.message
+                if indexes:
+                    # Solo el prefijo lleva {} para los índices
+                    text = prefix + rule.message.replace('{', '{{').replace('}', '}}')
+                    append = f"errors.append({message(text)}.format({', '.join(indexes)}))"
+                else:
+                    append = f"errors.append({message(text)})"
+                lines.append(f"{pad}if {_failure(rule, f'{obj}.{rule.field}')}:")
+                lines.append(f"{pad}    {append}")
+
+    emit(rules, "obj", "", [], 1)
+    source = f"def {name}(obj):\n    errors = []\n" + "\n".join(lines) + "\n    return errors\n"
+
+    namespace = {f"_m{i}": text for i, text in enumerate(messages)}
+    exec(compile(source, f"<validator {name}>", "exec"), namespace)
+    function = namespace[name]
+    function.__source__ = source
+    return function
+
+
+camera_errors = compile_validator('camera_errors', CAMERA_CONSTRAINTS)
+lighting_errors = compile_validator('lighting_errors', LIGHTING_RULES)
+scene_errors = compile_validator('scene_errors', SCENE_RULES)
+
+
+def first_error(errors: List[str]) -> tuple:
+    """(es_válido, mensaje_error) a partir de una lista de violaciones"""
+    return (False, errors[0]) if errors else (True, None)
+
+
+def validate_scenes(scenes: Sequence[Any]) -> List[List[str]]:
+    """
+    Valida un storyboard completo.
+
+    Args:
+        scenes: Lista de Scene
+
+    Una escena con tipos mal formados (p. ej. fov "50" o luces como dicts)
+    no interrumpe el resto: el error se reporta como violación de esa escena.
+
+    Returns:
+        list[list[str]]: Violaciones por escena (lista vacía si es válida)
+    """
+    results = []
+    for scene in scenes:
+        try:
+            results.append(scene_errors(scene))
+        except (TypeError, AttributeError) as e:
+            results.append([f"Parámetros de escena inválidos: {e}"])
+    return results
@@ -1,7 +1,10 @@
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field
 from typing import Optional, List, Dict, Any
 
-@dataclass
+from app.models.constraints import first_error, lighting_errors
+from app.models.serialization import Each, When, compile_serializer, field_layout
+
+@dataclass(slots=True, frozen=True)
 class LightSource:
     """
     Representa una fuente de luz individual en la escena.
@@ -71,12 +74,15 @@ class LightSource:
     """
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class LightingSetup:
     """
     Configuración completa de iluminación para la escena.
     
     Simula setup profesional de iluminación cinematográfica.
+
+    Como LightSource, es un valor inmutable (frozen): para variarla se crea
+    otra instancia con dataclasses.replace().
     """
     
     # ============ PRESETS DE ILUMINACIÓN ============
@@ -233,72 +239,6 @@ class LightingSetup:
     Rango: 0.0 (sin bloom) a 1.0 (bloom intenso)
     """
     
-    def to_fibo_json(self) -> Dict[str, Any]:
-        """
-        Convierte los settings a formato JSON compatible con FIBO API.
-        
-        Returns:
-            dict: Parámetros formateados para FIBO
-        """
-        result = {
-            "lighting": {
-                "preset": self.preset,
-                "time_of_day": self.time_of_day,
-                "ambient_intensity": self.ambient_intensity,
-                "ambient_color": self.ambient_color,
-                "color_grading": self.color_grading
-            },
-            "exposure": {
-                "contrast": self.contrast,
-                "exposure": self.exposure,
-                "highlights": self.highlights,
-                "shadows": self.shadows
-            },
-            "atmosphere": {
-                "fog": self.fog,
-                "haze": self.haze,
-                "god_rays": self.god_rays
-            },
-            "shadows": {
-                "intensity": self.shadow_intensity,
-                "softness": self.shadow_softness
-            },
-            "effects": {
-                "lens_flare": self.lens_flare,
-                "bloom": self.bloom
-            }
-        }
-        
-        # Si hay luces personalizadas, incluirlas
-        if self.lights:
-            result["custom_lights"] = [
-                {
-                    "type": light.type,
-                    "intensity": light.intensity,
-                    "color_temp": light.color_temp,
-                    "position": light.position,
-                    "softness": light.softness,
-                    "angle": light.angle,
-                    "color_tint": light.color_tint
-                }
-                for light in self.lights
-            ]
-        
-        return result
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """
-        Convierte a diccionario simple.
-        
-        Returns:
-            dict: Todos los campos como diccionario
-        """
-        data = asdict(self)
-        # Convertir lista de LightSource a dicts
-        if self.lights:
-            data['lights'] = [asdict(light) for light in self.lights]
-        return data
-    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'LightingSetup':
         """
@@ -435,49 +375,61 @@ class LightingSetup:
         """
         Valida que los parámetros estén en rangos aceptables.
         
+        Las restricciones están en app/models/constraints.py; lighting_errors()
+        devuelve todas las violaciones en lugar de solo la primera.
+        
         Returns:
             tuple: (es_válido, mensaje_error)
         """
-        # Validar ambient_intensity
-        if not 0.0 <= self.ambient_intensity <= 1.0:
-            return False, "Ambient intensity debe estar entre 0.0 y 1.0"
-        
-        # Validar contrast
-        if not 0.1 <= self.contrast <= 3.0:
-            return False, "Contrast debe estar entre 0.1 y 3.0"
-        
-        # Validar exposure
-        if not -3.0 <= self.exposure <= 3.0:
-            return False, "Exposure debe estar entre -3.0 y 3.0"
-        
-        # Validar highlights y shadows
-        if not -1.0 <= self.highlights <= 1.0:
-            return False, "Highlights debe estar entre -1.0 y 1.0"
-        if not -1.0 <= self.shadows <= 1.0:
-            return False, "Shadows debe estar entre -1.0 y 1.0"
-        
-        # Validar fog y haze
-        if not 0.0 <= self.fog <= 1.0:
-            return False, "Fog debe estar entre 0.0 y 1.0"
-        if not 0.0 <= self.haze <= 1.0:
-            return False, "Haze debe estar entre 0.0 y 1.0"
-        
-        # Validar shadow_intensity
-        if not 0.0 <= self.shadow_intensity <= 2.0:
-            return False, "Shadow intensity debe estar entre 0.0 y 2.0"
-        
-        # Validar bloom
-        if not 0.0 <= self.bloom <= 1.0:
-            return False, "Bloom debe estar entre 0.0 y 1.0"
-        
-        # Validar luces personalizadas
-        if self.lights:
-            for i, light in enumerate(self.lights):
-                if not 0.0 <= light.intensity <= 2.0:
-                    return False, f"Light {i}: intensity debe estar entre 0.0 y 2.0"
-                if not 1000 <= light.color_temp <= 12000:
-                    return False, f"Light {i}: color_temp debe estar entre 1000K y 12000K"
-                if not 0.0 <= light.softness <= 1.0:
-                    return False, f"Light {i}: softness debe estar entre 0.0 y 1.0"
-        
-        return True, None
\ No newline at end of file
+        return first_error(lighting_errors(self))
+
+
+# ============ SERIALIZACIÓN ============
+# Métodos generados una vez a partir de los layouts (ver serialization.py)
+
+LIGHT_SOURCE_LAYOUT = field_layout(LightSource)
+
+LIGHTING_FIBO_LAYOUT = (
+    ("lighting", (
+        ("preset", "preset"),
+        ("time_of_day", "time_of_day"),
+        ("ambient_intensity", "ambient_intensity"),
+        ("ambient_color", "ambient_color"),
+        ("color_grading", "color_grading"),
+    )),
+    ("exposure", (
+        ("contrast", "contrast"),
+        ("exposure", "exposure"),
+        ("highlights", "highlights"),
+        ("shadows", "shadows"),
+    )),
+    ("atmosphere", (
+        ("fog", "fog"),
+        ("haze", "haze"),
+        ("god_rays", "god_rays"),
+    )),
+    ("shadows", (
+        ("intensity", "shadow_intensity"),
+        ("softness", "shadow_softness"),
+    )),
+    ("effects", (
+        ("lens_flare", "lens_flare"),
+        ("bloom", "bloom"),
+    )),
+    # Si hay luces personalizadas, incluirlas
+    ("custom_lights", When("lights", "truthy", Each("lights", LIGHT_SOURCE_LAYOUT))),
+)
+
+LightSource.to_dict = compile_serializer(
+    LightSource, "to_dict", LIGHT_SOURCE_LAYOUT,
+    "Convierte a diccionario simple con todos los campos."
+)
+LightingSetup.to_fibo_json = compile_serializer(
+    LightingSetup, "to_fibo_json", LIGHTING_FIBO_LAYOUT,
+    "Convierte los settings a formato JSON compatible con FIBO API."
+)
+LightingSetup.to_dict = compile_serializer(
+    LightingSetup, "to_dict",
+    field_layout(LightingSetup, {"lights": Each("lights", LIGHT_SOURCE_LAYOUT)}),
+    "Convierte a diccionario simple; las luces se convierten a dicts."
+)
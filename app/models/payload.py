@@ -0,0 +1,128 @@
+"""
+Payload de FIBO construido una vez por escena.
+
+Scene.to_fibo_payload() devuelve un ScenePayload: un dict normal que además
+guarda su JSON y su hash de contenido la primera vez que se piden. El mismo
+objeto viaja a la persistencia (columna JSON de Generation y cola de
+trabajos), a la caché de resultados, al single-flight y a la llamada a Bria,
+así que cada frame se serializa una sola vez.
+
+El JSON canónico (claves ordenadas, sin metadatos de organización) es la
+base del hash; el JSON completo se arma agregando esos metadatos al final
+del canónico, sin volver a recorrer el resto del payload.
+
+El payload se trata como inmutable una vez construido: las operaciones de
+dict de primer nivel descartan lo cacheado, pero modificar un dict anidado
+(payload['camera']['fov'] = ...) no lo hace.
+"""
+import hashlib
+import json
+from typing import Any, Dict
+
+# Campos de organización que no afectan la imagen generada
+NON_RENDER_FIELDS = frozenset({'scene_number', 'tags'})
+
+_ENCODER = json.JSONEncoder(sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+class ScenePayload(dict):
+    """dict con JSON canónico, JSON completo y hash cacheados"""
+
+    __slots__ = ('_canonical', '_json', '_hash')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._changed()
+
+    def _changed(self):
+        self._canonical = None
+        self._json = None
+        self._hash = None
+
+    def _serialize(self):
+        render = {k: v for k, v in self.items() if k not in NON_RENDER_FIELDS}
+        canonical = _ENCODER.encode(render)
+
+        extra = [
+            f"{_ENCODER.encode(key)}:{_ENCODER.encode(value)}"
+            for key, value in self.items() if key in NON_RENDER_FIELDS
+        ]
+        if extra:
+            separator = ',' if render else ''
+            self._json = canonical[:-1] + separator + ','.join(extra) + '}'
+        else:
+            self._json = canonical
+        self._canonical = canonical
+
+    @property
+    def canonical_json(self) -> str:
+        """JSON de los campos de render, con claves ordenadas"""
+        if self._canonical is None:
+            self._serialize()
+        return self._canonical
+
+    @property
+    def json_text(self) -> str:
+        """JSON del payload completo (para persistir)"""
+        if self._json is None:
+            self._serialize()
+        return self._json
+
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 hexadecimal del JSON canónico"""
+        if self._hash is None:
+            self._hash = hashlib.sha256(self.canonical_json.encode('utf-8')).hexdigest()
+        return self._hash
+
+    # Las modificaciones de primer nivel invalidan lo cacheado
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def __ior__(self, other):
+        result = super().__ior__(other)
+        self._changed()
+        return result
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._changed()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._changed()
+        return item
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        self._changed()
+        return value
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+
+def as_scene_payload(payload: Dict[str, Any]) -> ScenePayload:
+    """El mismo objeto si ya es ScenePayload; si no, una copia envuelta"""
+    return payload if isinstance(payload, ScenePayload) else ScenePayload(payload)
+
+
+def dumps_json(value: Any) -> str:
+    """
+    Serializador JSON para SQLAlchemy y la cola de trabajos: reutiliza el
+    JSON ya calculado de un ScenePayload.
+    """
+    if isinstance(value, ScenePayload):
+        return value.json_text
+    return json.dumps(value)
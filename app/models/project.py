@@ -1,6 +1,7 @@
 from datetime import datetime
+from types import MappingProxyType
+from sqlalchemy.dialects.postgresql import JSONB
 from app.models import db
-import json
 
 class Project(db.Model):
     __tablename__ = 'projects'
@@ -26,6 +27,11 @@ class Project(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
+    # Galería pública paginada por cursor (ver app/utils/pagination.py)
+    __table_args__ = (
+        db.Index('ix_projects_public_status_updated', 'is_public', 'status', updated_at.desc(), id.desc()),
+    )
+    
     # Relaciones - Usar strings para evitar import circular
     # owner = relación definida en User via backref
     generations = db.relationship('Generation', backref='project', lazy='dynamic', cascade='all, delete-orphan')
@@ -33,8 +39,16 @@ class Project(db.Model):
     def __repr__(self):
         return f'<Project {self.id}: {self.title}>'
     
-    def to_dict(self, include_generations=False):
-        """Serializa el proyecto a diccionario"""
+    def to_dict(self, include_generations=False, owners=None):
+        """
+        Serializa el proyecto a diccionario.
+        
+        Args:
+            include_generations: Incluir las generaciones del proyecto
+            owners: {user_id: User} ya cargados; evita un SELECT de users por
+                proyecto en los listados (si no, se usa self.owner)
+        """
+        owner = owners[self.user_id] if owners else self.owner
         data = {
             'id': self.id,
             'title': self.title,
@@ -47,16 +61,18 @@ class Project(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'owner': {
-                'id': self.owner.id,
-                'username': self.owner.username,
-                'avatar_url': self.owner.avatar_url
+                'id': owner.id,
+                'username': owner.username,
+                'avatar_url': owner.avatar_url
             }
         }
         
         if include_generations:
-            data['generations'] = [g.to_dict() for g in self.generations.order_by('scene_number').all()]
-            data['generation_count'] = self.generations.count()
-            data['completed_count'] = self.generations.filter_by(status='completed').count()
+            # Los conteos salen de la misma lista: sin consultas COUNT extra
+            generations = self.generations.order_by('scene_number').all()
+            data['generations'] = [g.to_dict() for g in generations]
+            data['generation_count'] = len(generations)
+            data['completed_count'] = sum(1 for g in generations if g.status == 'completed')
         
         return data
     
@@ -77,8 +93,9 @@ class Generation(db.Model):
     negative_prompt = db.Column(db.Text)
     image_url = db.Column(db.String(500))
     
-    # Parámetros guardados (JSON)
-    parameters = db.Column(db.Text)  # JSON string con todos los parámetros
+    # Parámetros guardados: JSONB en Postgres, texto JSON en SQLite.
+    # Se deserializan una sola vez al cargar la fila.
+    parameters = db.Column(db.JSON().with_variant(JSONB(), 'postgresql'))
     
     # Metadatos
     seed = db.Column(db.Integer)
@@ -99,18 +116,38 @@ class Generation(db.Model):
     
     # Relaciones - user definida en User via backref, project definida arriba
     
+    # Filtros de /generation/history sobre los parámetros: nombre -> ruta JSON
+    PARAMETER_FILTERS = MappingProxyType({
+        'style': ('style',),
+        'shot_type': ('camera', 'shot_type'),
+        'color_grading': ('lighting', 'color_grading'),
+    })
+    
+    # Índices de expresión (user_id, parámetro): el historial siempre filtra por usuario
+    __table_args__ = (
+        # Historial paginado por cursor (ver app/utils/pagination.py)
+        db.Index('ix_generations_user_created', 'user_id', created_at.desc(), id.desc()),
+        db.Index('ix_generations_user_style', 'user_id', parameters['style'].as_string()),
+        db.Index('ix_generations_user_shot_type', 'user_id', parameters[('camera', 'shot_type')].as_string()),
+        db.Index('ix_generations_user_color_grading', 'user_id', parameters[('lighting', 'color_grading')].as_string()),
+    )
+    
     def __repr__(self):
         return f'<Generation {self.id} - {self.status}>'
     
+    @classmethod
+    def parameter_equals(cls, name, value):
+        """Condición SQL `parámetro == value` que usa el índice de expresión"""
+        path = cls.PARAMETER_FILTERS[name]
+        return cls.parameters[path if len(path) > 1 else path[0]].as_string() == value
+    
     def set_parameters(self, params_dict):
-        """Guarda los parámetros como JSON"""
-        self.parameters = json.dumps(params_dict)
+        """Guarda los parámetros (la columna JSON serializa al hacer flush)"""
+        self.parameters = params_dict
     
     def get_parameters(self):
-        """Obtiene los parámetros desde JSON"""
-        if self.parameters:
-            return json.loads(self.parameters)
-        return {}
+        """Obtiene los parámetros ya deserializados"""
+        return self.parameters or {}
     
     def to_dict(self):
         """Serializa la generación a diccionario"""
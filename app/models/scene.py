@@ -1,9 +1,12 @@
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field
 from typing import Optional, Dict, Any
-from app.models.camera import CameraSettings
-from app.models.lighting import LightingSetup
+from app.models.camera import CAMERA_FIBO_LAYOUT, CameraSettings
+from app.models.lighting import LIGHT_SOURCE_LAYOUT, LIGHTING_FIBO_LAYOUT, LightingSetup
+from app.models.constraints import first_error, scene_errors
+from app.models.payload import ScenePayload
+from app.models.serialization import Each, When, compile_serializer, field_layout, prefixed
 
-@dataclass
+@dataclass(slots=True)
 class Scene:
     """
     Representa una escena completa con todos los parámetros para generación.
@@ -163,83 +166,6 @@ class Scene:
     Notas adicionales sobre la escena.
     """
     
-    def to_fibo_payload(self) -> Dict[str, Any]:
-        """
-        Genera el payload completo para enviar a FIBO API.
-        
-        Returns:
-            dict: Payload formateado para FIBO
-        """
-        # Payload base
-        payload = {
-            "prompt": self.prompt,
-            "negative_prompt": self.negative_prompt,
-            "width": self.width,
-            "height": self.height,
-            "steps": self.steps,
-            "guidance_scale": self.guidance_scale,
-            "style": self.style,
-            "detail_level": self.detail_level,
-            "texture_strength": self.texture_strength,
-            "sharpness": self.sharpness
-        }
-        
-        # Agregar seed si existe
-        if self.seed is not None:
-            payload["seed"] = self.seed
-        
-        # Agregar paleta de colores si existe
-        if self.color_palette:
-            payload["color_palette"] = self.color_palette
-        
-        # Agregar mood si existe
-        if self.mood:
-            payload["mood"] = self.mood
-        
-        # Merge camera settings
-        payload.update(self.camera.to_fibo_json())
-        
-        # Merge lighting settings
-        payload.update(self.lighting.to_fibo_json())
-        
-        # Agregar metadatos
-        if self.scene_number is not None:
-            payload["scene_number"] = self.scene_number
-        
-        if self.tags:
-            payload["tags"] = self.tags
-        
-        return payload
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """
-        Convierte a diccionario simple para serialización.
-        
-        Returns:
-            dict: Escena como diccionario
-        """
-        return {
-            "prompt": self.prompt,
-            "negative_prompt": self.negative_prompt,
-            "camera": self.camera.to_dict(),
-            "lighting": self.lighting.to_dict(),
-            "width": self.width,
-            "height": self.height,
-            "steps": self.steps,
-            "guidance_scale": self.guidance_scale,
-            "seed": self.seed,
-            "style": self.style,
-            "color_palette": self.color_palette,
-            "mood": self.mood,
-            "detail_level": self.detail_level,
-            "texture_strength": self.texture_strength,
-            "sharpness": self.sharpness,
-            "scene_number": self.scene_number,
-            "project_id": self.project_id,
-            "tags": self.tags,
-            "notes": self.notes
-        }
-    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Scene':
         """
@@ -270,58 +196,13 @@ class Scene:
         """
         Valida que todos los parámetros sean correctos.
         
+        Las restricciones están en app/models/constraints.py; scene_errors()
+        devuelve todas las violaciones en lugar de solo la primera.
+        
         Returns:
             tuple: (es_válido, mensaje_error)
         """
-        # Validar prompt
-        if not self.prompt or len(self.prompt.strip()) == 0:
-            return False, "El prompt no puede estar vacío"
-        
-        if len(self.prompt) > 2000:
-            return False, "El prompt no puede exceder 2000 caracteres"
-        
-        # Validar dimensiones
-        if not 256 <= self.width <= 2048:
-            return False, "Width debe estar entre 256 y 2048"
-        
-        if not 256 <= self.height <= 2048:
-            return False, "Height debe estar entre 256 y 2048"
-        
-        # Validar steps
-        if not 10 <= self.steps <= 100:
-            return False, "Steps debe estar entre 10 y 100"
-        
-        # Validar guidance_scale
-        if not 1.0 <= self.guidance_scale <= 20.0:
-            return False, "Guidance scale debe estar entre 1.0 y 20.0"
-        
-        # Validar seed si existe
-        if self.seed is not None and self.seed < 0:
-            return False, "Seed debe ser un número positivo"
-        
-        # Validar detail_level
-        if not 0.1 <= self.detail_level <= 3.0:
-            return False, "Detail level debe estar entre 0.1 y 3.0"
-        
-        # Validar texture_strength
-        if not 0.0 <= self.texture_strength <= 3.0:
-            return False, "Texture strength debe estar entre 0.0 y 3.0"
-        
-        # Validar sharpness
-        if not 0.1 <= self.sharpness <= 2.0:
-            return False, "Sharpness debe estar entre 0.1 y 2.0"
-        
-        # Validar cámara
-        valid_camera, camera_error = self.camera.validate()
-        if not valid_camera:
-            return False, f"Error en cámara: {camera_error}"
-        
-        # Validar iluminación
-        valid_lighting, lighting_error = self.lighting.validate()
-        if not valid_lighting:
-            return False, f"Error en iluminación: {lighting_error}"
-        
-        return True, None
+        return first_error(scene_errors(self))
     
     @classmethod
     def preset_cinematic_wide(cls, prompt: str) -> 'Scene':
@@ -474,4 +355,47 @@ class Scene:
         complexity_factor = 1000000  # ajustar según hardware
         
         estimated = base_time + (pixels * self.steps) / complexity_factor
-        return round(estimated, 1)
\ No newline at end of file
+        return round(estimated, 1)
+
+
+# ============ SERIALIZACIÓN ============
+# Métodos generados una vez a partir de los layouts (ver serialization.py).
+# El payload incluye cámara e iluminación en la misma pasada, sin llamadas
+# intermedias a to_fibo_json ni dict.update.
+
+SCENE_FIBO_LAYOUT = (
+    ("prompt", "prompt"),
+    ("negative_prompt", "negative_prompt"),
+    ("width", "width"),
+    ("height", "height"),
+    ("steps", "steps"),
+    ("guidance_scale", "guidance_scale"),
+    ("style", "style"),
+    ("detail_level", "detail_level"),
+    ("texture_strength", "texture_strength"),
+    ("sharpness", "sharpness"),
+    ("seed", When("seed", "not_none")),
+    ("color_palette", When("color_palette", "truthy")),
+    ("mood", When("mood", "truthy")),
+    *prefixed(CAMERA_FIBO_LAYOUT, "camera"),
+    *prefixed(LIGHTING_FIBO_LAYOUT, "lighting"),
+    ("scene_number", When("scene_number", "not_none")),
+    ("tags", When("tags", "truthy")),
+)
+
+Scene.to_fibo_payload = compile_serializer(
+    Scene, "to_fibo_payload", SCENE_FIBO_LAYOUT,
+    "Genera el payload completo para enviar a FIBO API (ver payload.py).",
+    result_type=ScenePayload
+)
+Scene.to_dict = compile_serializer(
+    Scene, "to_dict",
+    field_layout(Scene, {
+        "camera": prefixed(field_layout(CameraSettings), "camera"),
+        "lighting": prefixed(
+            field_layout(LightingSetup, {"lights": Each("lights", LIGHT_SOURCE_LAYOUT)}),
+            "lighting"
+        ),
+    }),
+    "Convierte a diccionario simple para serialización."
+)
@@ -0,0 +1,122 @@
+"""
+Serializadores compilados para las dataclasses de escena.
+
+to_fibo_payload / to_fibo_json / to_dict se llaman por cada frame de una
+secuencia. En lugar de armar dicts anidados campo por campo con llamadas
+intermedias y dict.update, o de usar dataclasses.asdict (que recorre y
+copia recursivamente), cada clase describe su salida con un layout y aquí
+se genera, una sola vez al importar, una función que construye el dict
+completo en una pasada.
+
+Un layout es una tupla de pares (clave, spec). spec puede ser:
+    - "campo" o "camera.fov": ruta de atributos desde la instancia
+    - otro layout: dict anidado
+    - Each("lights", layout): lista con un dict por elemento (None si el campo es None)
+    - When("seed", "not_none" | "truthy", spec): solo si se cumple la condición
+      (únicamente en el nivel superior)
+"""
+from dataclasses import fields
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+
+class Each(NamedTuple):
+    field: str
+    layout: tuple
+
+
+class When(NamedTuple):
+    field: str
+    check: str
+    spec: Any = None
+
+
+_CHECKS = {
+    'not_none': '{} is not None',
+    'truthy': '{}',
+}
+
+
+def _path(obj: str, path: str) -> str:
+    if not all(part.isidentifier() for part in path.split('.')):
+        raise ValueError(f"Ruta de atributo inválida: {path!r}")
+    return f"{obj}.{path}"
+
+
+def _expression(spec, obj: str, depth: int = 0) -> str:
+    """Expresión Python que evalúa `spec` sobre la variable `obj`"""
+    if isinstance(spec, str):
+        return _path(obj, spec)
+    if isinstance(spec, Each):
+        item = f"_item{depth}"
+        source = _path(obj, spec.field)
+        inner = _expression(spec.layout, item, depth + 1)
+        return f"(None if {source} is None else [{inner} for {item} in {source}])"
+    if isinstance(spec, When):
+        raise ValueError("When solo se admite en el nivel superior del layout")
+    entries = ", ".join(f"{key!r}: {_expression(value, obj, depth)}" for key, value in spec)
+    return "{" + entries + "}"
+
+
+def field_layout(cls, nested: Optional[dict] = None) -> tuple:
+    """
+    Layout con todos los campos de una dataclass, en orden de declaración.
+
+    Args:
+        cls: Dataclass
+        nested: {campo: spec} para campos que no se copian tal cual
+    """
+    nested = nested or {}
+    return tuple((f.name, nested.get(f.name, f.name)) for f in fields(cls))
+
+
+def prefixed(layout: tuple, prefix: str) -> tuple:
+    """Reescribe las rutas de un layout para leerlas desde `prefix`"""
+    def rewrite(spec):
+        if isinstance(spec, str):
+            return f"{prefix}.{spec}"
+        if isinstance(spec, Each):
+            return Each(f"{prefix}.{spec.field}", spec.layout)
+        if isinstance(spec, When):
+            return When(f"{prefix}.{spec.field}", spec.check, rewrite(spec.spec or spec.field))
+        return tuple((key, rewrite(value)) for key, value in spec)
+
+    return rewrite(layout)
+
+
+def compile_serializer(cls, name: str, layout: Tuple, doc: Optional[str] = None,
+                       result_type: Optional[type] = None) -> Callable:
+    """
+    Genera el método `name` de `cls` a partir de un layout.
+
+    Args:
+        result_type: Subclase de dict para el resultado (dict si es None)
+
+    Returns:
+        function: Método listo para asignar a la clase
+    """
+    fixed = []
+    lines = []
+    for key, spec in layout:
+        if isinstance(spec, When):
+            condition = _CHECKS[spec.check].format(_path('self', spec.field))
+            value = _expression(spec.spec or spec.field, 'self')
+            lines.append(f"    if {condition}:\n        result[{key!r}] = {value}")
+        elif lines:
+            lines.append(f"    result[{key!r}] = {_expression(spec, 'self')}")
+        else:
+            fixed.append((key, spec))
+
+    # Se arma como dict y se envuelve al final: una sola copia en C, sin
+    # pasar por los métodos Python de la subclase en cada asignación
+    result = "result" if result_type is None else "_result_type(result)"
+    body = [f"    result = {_expression(tuple(fixed), 'self')}", *lines, f"    return {result}"]
+    source = f"def {name}(self):\n" + "\n".join(body) + "\n"
+
+    namespace = {"_result_type": result_type}
+    exec(compile(source, f"<serializer {cls.__name__}.{name}>", "exec"), namespace)
+    function = namespace[name]
+    function.__qualname__ = f"{cls.__qualname__}.{name}"
+    function.__module__ = cls.__module__
+    function.__doc__ = doc
+    function.__source__ = source
+    return function
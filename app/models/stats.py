@@ -0,0 +1,330 @@
+"""
+Estadísticas agregadas de proyectos y usuarios.
+
+Por defecto se calculan con un solo SELECT de agregación condicional
+(SUM(CASE ...)). Con STATS_COUNTERS = True se leen de tablas de contadores
+desnormalizadas (project_stats, user_stats) que se mantienen en cada flush:
+un listener after_flush calcula cuánto cambia cada contador con el
+historial de atributos de los objetos nuevos, modificados y borrados, y lo
+aplica con UPDATE ... SET n = n + delta. Leer estadísticas cuesta entonces
+una consulta por clave primaria sin importar el volumen de datos.
+
+Los contadores solo reflejan cambios hechos a través del ORM. Tras activar
+STATS_COUNTERS en una base que ya tenía datos (o tras cambios masivos por
+SQL) hay que llamar a rebuild_stats().
+"""
+from collections import defaultdict
+
+from flask import current_app, has_app_context
+from sqlalchemy import case, delete, event, func, inspect, insert, select, update
+
+from app.models import db
+from app.models.user import User
+from app.models.project import Project, Generation
+
+PROJECT_COUNTERS = (
+    'total_generations',
+    'completed_generations',
+    'failed_generations',
+    'favorite_generations'
+)
+
+USER_COUNTERS = (
+    'total_projects',
+    'public_projects',
+    'completed_generations',
+    'favorite_generations'
+)
+
+
+class ProjectStats(db.Model):
+    """Contadores de generaciones por proyecto (STATS_COUNTERS)"""
+    __tablename__ = 'project_stats'
+
+    project_id = db.Column(
+        db.Integer,
+        db.ForeignKey('projects.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    total_generations = db.Column(db.Integer, nullable=False, default=0)
+    completed_generations = db.Column(db.Integer, nullable=False, default=0)
+    failed_generations = db.Column(db.Integer, nullable=False, default=0)
+    favorite_generations = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_counts(self):
+        return {name: getattr(self, name) for name in PROJECT_COUNTERS}
+
+
+class UserStats(db.Model):
+    """Contadores de proyectos y generaciones por usuario (STATS_COUNTERS)"""
+    __tablename__ = 'user_stats'
+
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('users.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    total_projects = db.Column(db.Integer, nullable=False, default=0)
+    public_projects = db.Column(db.Integer, nullable=False, default=0)
+    completed_generations = db.Column(db.Integer, nullable=False, default=0)
+    favorite_generations = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_counts(self):
+        return {name: getattr(self, name) for name in USER_COUNTERS}
+
+
+def _count_when(condition):
+    """SUM(CASE WHEN condition THEN 1 ELSE 0 END), 0 si no hay filas"""
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _project_count_columns():
+    return (
+        func.count(Generation.id),
+        _count_when(Generation.status == 'completed'),
+        _count_when(Generation.status == 'failed'),
+        _count_when(Generation.is_favorite.is_(True)),
+    )
+
+
+def _user_count_select(user_id):
+    """
+    Los cuatro contadores de usuario en una sola fila: una agregación por
+    tabla, unidas como dos subconsultas de una fila.
+    """
+    projects = select(
+        func.count(Project.id).label('total_projects'),
+        _count_when(Project.is_public.is_(True)).label('public_projects')
+    ).where(Project.user_id == user_id).subquery()
+
+    generations = select(
+        _count_when(Generation.status == 'completed').label('completed_generations'),
+        _count_when(Generation.is_favorite.is_(True)).label('favorite_generations')
+    ).where(Generation.user_id == user_id).subquery()
+
+    return select(
+        projects.c.total_projects,
+        projects.c.public_projects,
+        generations.c.completed_generations,
+        generations.c.favorite_generations
+    ).select_from(projects.join(generations, db.true()))
+
+
+def aggregate_project_counts(project_id):
+    """Contadores de un proyecto con un único SELECT agregado"""
+    row = db.session.query(*_project_count_columns()).filter(
+        Generation.project_id == project_id
+    ).one()
+    return dict(zip(PROJECT_COUNTERS, (int(value) for value in row)))
+
+
+def aggregate_user_counts(user_id):
+    """Contadores de un usuario en una sola consulta"""
+    row = db.session.execute(_user_count_select(user_id)).one()
+    return dict(zip(USER_COUNTERS, (int(value) for value in row)))
+
+
+def counters_enabled():
+    return has_app_context() and current_app.config.get('STATS_COUNTERS', False)
+
+
+def project_generation_counts(project_id):
+    """
+    Contadores de generaciones de un proyecto.
+
+    Returns:
+        dict: total_generations, completed_generations, failed_generations,
+        favorite_generations
+    """
+    if counters_enabled():
+        stats = ProjectStats.query.get(project_id)
+        if stats is not None:
+            return stats.to_counts()
+    return aggregate_project_counts(project_id)
+
+
+def user_counts(user_id):
+    """
+    Contadores públicos de un usuario.
+
+    Returns:
+        dict: total_projects, public_projects, completed_generations,
+        favorite_generations
+    """
+    if counters_enabled():
+        stats = UserStats.query.get(user_id)
+        if stats is not None:
+            return stats.to_counts()
+    return aggregate_user_counts(user_id)
+
+
+def rebuild_stats():
+    """Recalcula todas las tablas de contadores desde las tablas base"""
+    db.session.execute(delete(ProjectStats))
+    db.session.execute(
+        insert(ProjectStats).from_select(
+            ['project_id', *PROJECT_COUNTERS],
+            select(Project.id, *_project_count_columns())
+            .select_from(Project)
+            .outerjoin(Generation, Generation.project_id == Project.id)
+            .group_by(Project.id)
+        )
+    )
+
+    def correlated(column, model, condition=None):
+        query = select(column).where(model.user_id == User.id)
+        if condition is not None:
+            query = query.where(condition)
+        return query.scalar_subquery()
+
+    db.session.execute(delete(UserStats))
+    db.session.execute(
+        insert(UserStats).from_select(
+            ['user_id', *USER_COUNTERS],
+            select(
+                User.id,
+                correlated(func.count(Project.id), Project),
+                correlated(func.count(Project.id), Project, Project.is_public.is_(True)),
+                correlated(func.count(Generation.id), Generation, Generation.status == 'completed'),
+                correlated(func.count(Generation.id), Generation, Generation.is_favorite.is_(True))
+            )
+        )
+    )
+    db.session.commit()
+
+
+# ============ MANTENIMIENTO INCREMENTAL ============
+
+# Atributos cuyo valor anterior hace falta para calcular los deltas
+_TRACKED_ATTRIBUTES = {
+    Generation: ('project_id', 'user_id', 'status', 'is_favorite'),
+    Project: ('user_id', 'is_public'),
+}
+
+# (tabla de contadores, modelo base, valores -> (clave, {contador: aporte}))
+_CONTRIBUTIONS = (
+    (ProjectStats, Generation, lambda v: (v['project_id'], {
+        'total_generations': 1,
+        'completed_generations': int(v['status'] == 'completed'),
+        'failed_generations': int(v['status'] == 'failed'),
+        'favorite_generations': int(bool(v['is_favorite'])),
+    })),
+    (UserStats, Generation, lambda v: (v['user_id'], {
+        'completed_generations': int(v['status'] == 'completed'),
+        'favorite_generations': int(bool(v['is_favorite'])),
+    })),
+    (UserStats, Project, lambda v: (v['user_id'], {
+        'total_projects': 1,
+        'public_projects': int(bool(v['is_public'])),
+    })),
+)
+
+# Modelo dueño -> tabla de contadores (una fila por instancia)
+_STATS_TABLES = {
+    User: UserStats,
+    Project: ProjectStats,
+}
+
+
+def _key_attribute(stats_model):
+    """Atributo mapeado de la clave primaria (project_id / user_id)"""
+    return getattr(stats_model, inspect(stats_model).primary_key[0].key)
+
+
+def _values(obj, names, previous):
+    """Valores actuales o anteriores al flush de los atributos `names`"""
+    state = inspect(obj)
+    values = {}
+    for name in names:
+        history = state.attrs[name].history
+        if previous and history.deleted:
+            values[name] = history.deleted[0]
+        else:
+            values[name] = getattr(obj, name)
+    return values
+
+
+def _collect_deltas(session):
+    """{tabla de contadores: {clave: {contador: delta}}} de este flush"""
+    deltas = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+
+    def add(obj, previous, sign):
+        values = _values(obj, _TRACKED_ATTRIBUTES[type(obj)], previous)
+        for stats_model, model, contribution in _CONTRIBUTIONS:
+            if isinstance(obj, model):
+                key, amounts = contribution(values)
+                for name, amount in amounts.items():
+                    deltas[stats_model][key][name] += sign * amount
+
+    for obj in session.new:
+        if type(obj) in _TRACKED_ATTRIBUTES:
+            add(obj, previous=False, sign=1)
+    for obj in session.dirty:
+        if type(obj) in _TRACKED_ATTRIBUTES:
+            add(obj, previous=True, sign=-1)
+            add(obj, previous=False, sign=1)
+    for obj in session.deleted:
+        if type(obj) in _TRACKED_ATTRIBUTES:
+            add(obj, previous=True, sign=-1)
+
+    return deltas
+
+
+def _after_flush(session, flush_context):
+    if not counters_enabled():
+        return
+
+    # Filas en cero para usuarios y proyectos nuevos (antes de aplicar deltas)
+    for owner_model, stats_model in _STATS_TABLES.items():
+        key_column = _key_attribute(stats_model)
+        for obj in session.new:
+            if isinstance(obj, owner_model):
+                session.execute(insert(stats_model).values({key_column.key: obj.id}))
+
+    for stats_model, by_key in _collect_deltas(session).items():
+        key_column = _key_attribute(stats_model)
+        for key, delta in by_key.items():
+            changes = {name: amount for name, amount in delta.items() if amount}
+            if key is None or not changes:
+                continue
+            session.execute(
+                update(stats_model).where(key_column == key).values({
+                    name: getattr(stats_model, name) + amount
+                    for name, amount in changes.items()
+                }).execution_options(synchronize_session=False)
+            )
+
+    for owner_model, stats_model in _STATS_TABLES.items():
+        deleted = [obj.id for obj in session.deleted if isinstance(obj, owner_model)]
+        if deleted:
+            key_column = _key_attribute(stats_model)
+            session.execute(
+                delete(stats_model).where(key_column.in_(deleted))
+                .execution_options(synchronize_session=False)
+            )
+
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+def init_stats(app):
+    """
+    Activa el mantenimiento de contadores si STATS_COUNTERS está activo.
+
+    Los listeners 'set' con active_history=True hacen que SQLAlchemy cargue
+    el valor anterior aunque el atributo esté expirado (p. ej. tras un
+    commit); sin él no se podría saber desde qué estado transicionó la fila.
+    """
+    if not app.config.get('STATS_COUNTERS', False):
+        return
+
+    for model, names in _TRACKED_ATTRIBUTES.items():
+        for name in names:
+            attribute = getattr(model, name)
+            if not event.contains(attribute, 'set', _keep_previous_value):
+                event.listen(attribute, 'set', _keep_previous_value,
+                             active_history=True, retval=True)
+
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
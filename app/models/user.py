@@ -1,6 +1,26 @@
+from flask import current_app
 from flask_bcrypt import Bcrypt
+from sqlalchemy import case, func, or_, update
 from . import db
-from datetime import datetime
+from app.services.user_cache import user_cache
+from datetime import datetime, timedelta
+from types import MappingProxyType
+
+QUOTA_WINDOW_SECONDS = 86400
+
+# Límite diario por plan (None = ilimitado); planes desconocidos usan 'free'
+PLAN_LIMITS = MappingProxyType({
+    'free': 100,
+    'pro': 500,
+    'enterprise': None
+})
+
+# Orden de los planes para plan_required
+PLAN_LEVELS = MappingProxyType({
+    'free': 0,
+    'pro': 1,
+    'enterprise': 2
+})
 
 bcrypt = Bcrypt()
 
@@ -42,6 +62,14 @@ class User(db.Model):
     projects = db.relationship('Project', backref='owner', lazy='dynamic', cascade='all, delete-orphan')
     generations = db.relationship('Generation', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     
+    # Búsqueda por trigramas (app/services/user_search.py); requiere pg_trgm
+    __table_args__ = (
+        db.Index('ix_users_username_trgm', 'username',
+                 postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'}),
+        db.Index('ix_users_full_name_trgm', 'full_name',
+                 postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'}),
+    )
+    
     def __repr__(self):
         return f'<User {self.username}>'
     
@@ -77,79 +105,223 @@ class User(db.Model):
         
         if include_stats:
             # Importar aquí para evitar circular import
-            from app.models.project import Project, Generation
-            data['stats'] = {
-                'total_projects': Project.query.filter_by(user_id=self.id).count(),
-                'public_projects': Project.query.filter_by(user_id=self.id, is_public=True).count(),
-                'completed_generations': Generation.query.filter_by(user_id=self.id, status='completed').count(),
-                'favorite_generations': Generation.query.filter_by(user_id=self.id, is_favorite=True).count()
-            }
+            from app.models.stats import user_counts
+            # Una sola consulta (o la fila de user_stats con STATS_COUNTERS)
+            data['stats'] = user_counts(self.id)
         
         return data
     
     def can_generate(self, max_per_day=None):
         """Verifica si el usuario puede generar más imágenes hoy"""
-        if self.plan == 'enterprise':
-            return True
-        
         if max_per_day is None:
-            limits = {
-                'free': 100,
-                'pro': 500,
-                'enterprise': float('inf')
-            }
-            max_per_day = limits.get(self.plan, 100)
+            max_per_day = self.get_daily_limit()
+            if max_per_day is None:
+                return True
         
-        return self.generations_today < max_per_day
+        return self.generations_used() < max_per_day
     
     def get_remaining_generations(self):
         """Obtiene el número de generaciones restantes hoy"""
-        if self.plan == 'enterprise':
+        limit = self.get_daily_limit()
+        if limit is None:
             return 'unlimited'
         
-        limits = {
-            'free': 100,
-            'pro': 500
-        }
-        limit = limits.get(self.plan, 100)
-        remaining = limit - self.generations_today
+        remaining = limit - self.generations_used()
         
         return max(0, remaining)
     
-    def increment_generation_count(self):
+    def get_daily_limit(self):
+        """Límite diario de generaciones del plan (None = ilimitado)"""
+        return PLAN_LIMITS.get(self.plan, PLAN_LIMITS['free'])
+    
+    @staticmethod
+    def _quota_mode():
+        """'daily' (se reinicia a medianoche UTC) o 'rolling' (token bucket)"""
+        return current_app.config.get('GENERATION_QUOTA_WINDOW', 'daily')
+    
+    @staticmethod
+    def _window_start(now):
+        """Inicio de la ventana diaria actual (medianoche UTC)"""
+        return datetime(now.year, now.month, now.day)
+    
+    def _drained(self, now):
+        """
+        Estado del token bucket en `now`.
+        
+        El uso se vacía a ritmo constante (límite / 24 h). Para no perder
+        fracciones, last_generation_reset solo avanza lo que realmente se
+        vació.
+        
+        Returns:
+            tuple: (uso actual, nuevo last_generation_reset)
+        """
+        used = self.generations_today or 0
+        last = self.last_generation_reset
+        limit = self.get_daily_limit()
+        if last is None or limit is None or used == 0:
+            return 0, now
+        
+        seconds_per_unit = QUOTA_WINDOW_SECONDS / limit
+        drained = int((now - last).total_seconds() // seconds_per_unit)
+        if drained >= used:
+            return 0, now
+        return used - drained, last + timedelta(seconds=drained * seconds_per_unit)
+    
+    def generations_used(self, now=None):
+        """Generaciones que cuentan contra el cupo actual (sin escribir)"""
+        now = now or datetime.utcnow()
+        if self._quota_mode() == 'rolling':
+            return self._drained(now)[0]
+        
+        if self.last_generation_reset is None or self.last_generation_reset < self._window_start(now):
+            return 0
+        return self.generations_today or 0
+    
+    def reserve_generations(self, count=1):
+        """
+        Reserva cupo con un solo UPDATE condicional en la base.
+        
+        generations_today solo se incrementa si el resultado no supera el
+        límite del plan, así que peticiones concurrentes nunca sobrepasan la
+        cuota y no hace falta leer la fila con bloqueo. Si la ventana diaria
+        ya cambió, el mismo UPDATE reinicia el contador: no hace falta un
+        barrido nocturno de la tabla. No hace commit: la reserva se confirma
+        junto con el resto de la transacción.
+        
+        Returns:
+            bool: True si se reservó el cupo
+        """
+        if self._quota_mode() == 'rolling':
+            return self._reserve_rolling(count)
+        
+        now = datetime.utcnow()
+        stale = or_(
+            User.last_generation_reset.is_(None),
+            User.last_generation_reset < self._window_start(now)
+        )
+        # En un UPDATE todas las expresiones ven los valores anteriores de la fila
+        generations_today = case((stale, 0), else_=func.coalesce(User.generations_today, 0))
+        stmt = update(User).where(User.id == self.id).values(
+            generations_today=generations_today + count,
+            last_generation_reset=case((stale, now), else_=User.last_generation_reset)
+        ).execution_options(synchronize_session=False)
+        
+        limit = self.get_daily_limit()
+        if limit is not None:
+            stmt = stmt.where(generations_today + count <= limit)
+        
+        if db.engine.dialect.full_returning:
+            # Postgres: UPDATE ... RETURNING
+            reserved = db.session.execute(stmt.returning(User.id)).first() is not None
+        else:
+            reserved = db.session.execute(stmt).rowcount == 1
+        
+        db.session.expire(self, ['generations_today', 'last_generation_reset'])
+        return reserved
+    
+    def _reserve_rolling(self, count, attempts=5):
+        """
+        Reserva en modo token bucket con compare-and-swap.
+        
+        El vaciado depende del tiempo transcurrido, que no se puede calcular
+        de forma portable en SQL, así que se calcula aquí y el UPDATE solo
+        aplica si la fila no cambió desde la lectura.
+        """
+        limit = self.get_daily_limit()
+        
+        for _ in range(attempts):
+            db.session.refresh(self, ['generations_today', 'last_generation_reset'])
+            now = datetime.utcnow()
+            used, last_reset = self._drained(now)
+            
+            if limit is not None and used + count > limit:
+                return False
+            
+            result = db.session.execute(
+                update(User).where(
+                    User.id == self.id,
+                    User.generations_today == self.generations_today,
+                    User.last_generation_reset == self.last_generation_reset
+                    if self.last_generation_reset is not None
+                    else User.last_generation_reset.is_(None)
+                ).values(
+                    generations_today=used + count,
+                    last_generation_reset=last_reset
+                ).execution_options(synchronize_session=False)
+            )
+            db.session.expire(self, ['generations_today', 'last_generation_reset'])
+            if result.rowcount == 1:
+                return True
+        
+        return False
+    
+    def refund_generations(self, count=1):
+        """Devuelve cupo reservado para frames que fallaron (sin commit)"""
+        generations_today = func.coalesce(User.generations_today, 0)
+        stmt = update(User).where(User.id == self.id).values(
+            generations_today=case(
+                (generations_today > count, generations_today - count),
+                else_=0
+            )
+        ).execution_options(synchronize_session=False)
+        
+        if self._quota_mode() == 'daily':
+            # Una reserva de la ventana anterior no se devuelve a la nueva
+            stmt = stmt.where(User.last_generation_reset >= self._window_start(datetime.utcnow()))
+        
+        db.session.execute(stmt)
+        db.session.expire(self, ['generations_today'])
+    
+    def confirm_generations(self, count=1):
+        """Suma generaciones completadas cuyo cupo ya fue reservado (sin commit)"""
+        db.session.execute(
+            update(User).where(User.id == self.id).values(
+                total_generations=func.coalesce(User.total_generations, 0) + count
+            ).execution_options(synchronize_session=False)
+        )
+        db.session.expire(self, ['total_generations'])
+    
+    # Con commit=False los helpers solo modifican la sesión y el llamador
+    # confirma todo en su propia transacción (unit of work)
+    
+    def increment_generation_count(self, commit=True):
         """Incrementa el contador de generaciones"""
         self.generations_today += 1
         self.total_generations += 1
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
-    def reset_daily_count(self):
+    def reset_daily_count(self, commit=True):
         """Resetea el contador diario de generaciones"""
         self.generations_today = 0
         self.last_generation_reset = datetime.utcnow()
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
-    def spend_credits(self, amount):
+    def spend_credits(self, amount, commit=True):
         """Gasta créditos del usuario"""
         if self.credits < amount:
             return False
         
         self.credits -= amount
-        db.session.commit()
+        if commit:
+            db.session.commit()
         return True
     
-    def add_credits(self, amount):
+    def add_credits(self, amount, commit=True):
         """Agrega créditos al usuario"""
         self.credits += amount
-        db.session.commit()
+        if commit:
+            db.session.commit()
     
     def upgrade_plan(self, new_plan):
         """Actualiza el plan del usuario"""
-        valid_plans = ['free', 'pro', 'enterprise']
-        if new_plan not in valid_plans:
+        if new_plan not in PLAN_LIMITS:
             return False
         
         self.plan = new_plan
         db.session.commit()
+        user_cache.invalidate(self.id)
         return True
     
     def verify_email(self):
@@ -157,6 +329,7 @@ class User(db.Model):
         self.is_verified = True
         self.verification_token = None
         db.session.commit()
+        user_cache.invalidate(self.id)
     
     @classmethod
     def get_by_email(cls, email):
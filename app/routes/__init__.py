@@ -10,9 +10,11 @@ def init_routes(app):
     from .users import users_bp
     from .generation import generation_bp
     from .presets import bp as presets_bp
+    from .metrics import metrics_bp
     app.register_blueprint(auth_bp)
     app.register_blueprint(projects_bp)
     app.register_blueprint(users_bp)
     app.register_blueprint(generation_bp)
     app.register_blueprint(presets_bp)
+    app.register_blueprint(metrics_bp)
 
@@ -1,22 +1,55 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 from app.services.fibo_service import FIBOService
-from app.models.scene import Scene
-from app.models.camera import CameraSettings
-from app.models.lighting import LightingSetup
-from app.models.user import User
+from app.services.generation_queue import get_generation_queue
+from app.services.result_poller import get_result_poller
+from app.services.translator import translate_camera_path
+from app.services.path_segmenter import segment_camera_path, segment_to_scene_data
+from app.models.constraints import scene_errors, validate_scenes
 from app.models.project import Generation
 from app.models import db
+from app.middleware import get_current_user
+from app.utils.metrics import stage_timer, timed_commit
+from app.schemas.validation import SceneInputError, build_scene
+from app.utils.pagination import keyset_paginate, wants_cursor
 import time
 
 generation_bp = Blueprint('generation', __name__, url_prefix='/generation')
 fibo_service = FIBOService()
 
+def _timed_commit():
+    """Commit de la sesión medido como etapa db_commit"""
+    timed_commit(db.session)
+
+# Claves de /single que configuran el request, no la escena
+REQUEST_ONLY_FIELDS = ('async',)
+
+_TRUE_VALUES = ('true', '1', 'yes', 'on')
+_FALSE_VALUES = ('false', '0', 'no', 'off')
+
+def _queue_mode(data):
+    """
+    Modo cola pedido en el campo `async`; si no viene, GENERATION_QUEUE_MODE.
+    
+    Raises:
+        ValueError: Si `async` no es un booleano (True/False o su texto)
+    """
+    value = data.get('async')
+    if value is None:
+        return bool(current_app.config.get('GENERATION_QUEUE_MODE', False))
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in _TRUE_VALUES + _FALSE_VALUES:
+        return value.strip().lower() in _TRUE_VALUES
+    raise ValueError("El campo async debe ser booleano")
+
 @generation_bp.route('/health', methods=['GET'])
 def health_check():
     """Verifica el estado de la conexión con FIBO"""
     health = fibo_service.health_check()
+    if fibo_service.result_cache:
+        health['result_cache'] = fibo_service.result_cache.stats()
     return jsonify(health), 200
 
 @generation_bp.route('/single', methods=['POST'])
@@ -24,86 +57,86 @@ def health_check():
 def generate_single_frame():
     """Genera un solo frame con los parámetros dados"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        with stage_timer('user_lookup'):
+            user = get_current_user()
         
         if not user:
             return jsonify({"error": "Usuario no encontrado"}), 404
         
-        # Verificar límite de generaciones
-        if not user.can_generate():
+        data = request.get_json()
+        
+        if not data or not data.get('prompt'):
+            return jsonify({"error": "El prompt es requerido"}), 400
+        
+        # Modo cola: se encola el trabajo y se responde 202 de inmediato
+        try:
+            queue_mode = _queue_mode(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Reservar cupo diario (UPDATE condicional, se confirma en el commit de abajo)
+        if not user.reserve_generations():
+            db.session.rollback()
             return jsonify({
                 "error": "Has alcanzado tu límite diario de generaciones",
                 "remaining": 0,
                 "upgrade_url": "/pricing"
             }), 429
         
-        data = request.get_json()
-        
-        if not data or not data.get('prompt'):
-            return jsonify({"error": "El prompt es requerido"}), 400
-        
         # Crear registro de generación
         generation = Generation(
             user_id=user.id,
             project_id=data.get('project_id'),
             prompt=data['prompt'],
             negative_prompt=data.get('negative_prompt', ''),
-            status='generating'
+            status='pending' if queue_mode else 'generating'
         )
         
         db.session.add(generation)
-        db.session.commit()
+        _timed_commit()
         
+        # Una generación hace a lo sumo dos commits: el de arriba (reserva el
+        # registro) y el que la finaliza
         try:
-            # Construir la escena
-            camera = CameraSettings(
-                angle=data.get('camera', {}).get('angle', 'eye_level'),
-                shot_type=data.get('camera', {}).get('shot_type', 'medium_shot'),
-                fov=data.get('camera', {}).get('fov', 50.0),
-                focal_length=data.get('camera', {}).get('focal_length', 50.0),
-                aperture=data.get('camera', {}).get('aperture', 2.8),
-                composition_rule=data.get('camera', {}).get('composition_rule', 'rule_of_thirds'),
-                depth_of_field=data.get('camera', {}).get('depth_of_field', 'medium')
-            )
-            
-            lighting = LightingSetup(
-                preset=data.get('lighting', {}).get('preset', 'three_point'),
-                time_of_day=data.get('lighting', {}).get('time_of_day', 'golden_hour'),
-                color_grading=data.get('lighting', {}).get('color_grading', 'neutral'),
-                ambient_intensity=data.get('lighting', {}).get('ambient_intensity', 0.3)
-            )
-            
-            scene = Scene(
-                prompt=data['prompt'],
-                negative_prompt=data.get('negative_prompt', ''),
-                camera=camera,
-                lighting=lighting,
-                width=data.get('width', 1024),
-                height=data.get('height', 576),
-                steps=data.get('steps', 30),
-                guidance_scale=data.get('guidance_scale', 7.5),
-                seed=data.get('seed'),
-                style=data.get('style', 'cinematic'),
-                color_palette=data.get('color_palette')
-            )
+            # Construir la escena (tipos y campos) y validar sus rangos
+            try:
+                with stage_timer('scene_build'):
+                    scene = build_scene(data, ignore=REQUEST_ONLY_FIELDS)
+                with stage_timer('validate'):
+                    errors = scene_errors(scene)
+            except SceneInputError as e:
+                errors = e.errors
             
-            # Validar escena
-            valid, error_msg = scene.validate()
-            if not valid:
+            if errors:
                 generation.status = 'failed'
-                generation.error_message = error_msg
-                db.session.commit()
-                return jsonify({"error": error_msg}), 400
+                generation.error_message = '; '.join(errors)
+                user.refund_generations()
+                _timed_commit()
+                return jsonify({"error": generation.error_message, "errors": errors}), 400
             
             # Guardar parámetros
-            generation.set_parameters(scene.to_fibo_payload())
+            with stage_timer('payload_build'):
+                payload = scene.to_fibo_payload()
+            generation.set_parameters(payload)
             if scene.seed:
                 generation.seed = scene.seed
             
+            if queue_mode:
+                _timed_commit()
+                
+                queue, pool = get_generation_queue(current_app._get_current_object(), fibo_service)
+                queue.put(generation.id, payload)
+                pool.notify()
+                
+                return jsonify({
+                    "success": True,
+                    "generation_id": generation.id,
+                    "status": generation.status,
+                    "status_url": f"/generation/{generation.id}"
+                }), 202
+            
             # Generar con FIBO
             start_time = time.time()
-            payload = scene.to_fibo_payload()
             result = fibo_service.generate_image(payload)
             generation_time = time.time() - start_time
             
@@ -112,7 +145,8 @@ def generate_single_frame():
                 generation.status = 'failed'
                 generation.error_message = result['error']
                 generation.generation_time = generation_time
-                db.session.commit()
+                user.refund_generations()
+                _timed_commit()
                 
                 return jsonify({
                     "success": False,
@@ -121,6 +155,22 @@ def generate_single_frame():
                     "generation_id": generation.id
                 }), 500
             
+            # Bria en modo asíncrono: el poller completará la generación
+            if result.get('pending'):
+                generation.fibo_generation_id = result.get('id')
+                _timed_commit()
+                
+                get_result_poller(current_app._get_current_object(), fibo_service).track(
+                    generation.id, generation.fibo_generation_id
+                )
+                
+                return jsonify({
+                    "success": True,
+                    "generation_id": generation.id,
+                    "status": generation.status,
+                    "status_url": f"/generation/{generation.id}"
+                }), 202
+            
             # Actualizar generación con resultado exitoso
             generation.status = 'completed'
             generation.image_url = result.get('image_url')
@@ -128,22 +178,24 @@ def generate_single_frame():
             generation.generation_time = generation_time
             generation.completed_at = datetime.utcnow()
             
-            # Incrementar contador del usuario
-            user.increment_generation_count()
+            # El cupo ya estaba reservado: solo se suma al total
+            user.confirm_generations()
             
-            db.session.commit()
+            _timed_commit()
             
             return jsonify({
                 "success": True,
                 "generation": generation.to_dict(),
                 "remaining_today": user.get_remaining_generations(),
-                "mock_mode": result.get('mock', False)
+                "mock_mode": result.get('mock', False),
+                "cached": result.get('cached', False)
             }), 200
             
         except Exception as e:
             generation.status = 'failed'
             generation.error_message = str(e)
-            db.session.commit()
+            user.refund_generations()
+            _timed_commit()
             raise e
             
     except Exception as e:
@@ -158,8 +210,8 @@ def generate_single_frame():
 def generate_sequence():
     """Genera una secuencia de frames (storyboard)"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        with stage_timer('user_lookup'):
+            user = get_current_user()
         
         if not user:
             return jsonify({"error": "Usuario no encontrado"}), 404
@@ -170,19 +222,22 @@ def generate_sequence():
         if not scenes_data:
             return jsonify({"error": "Se requiere al menos una escena"}), 400
         
-        # Verificar límite
-        remaining = user.get_remaining_generations()
-        if isinstance(remaining, int) and len(scenes_data) > remaining:
+        # Reservar cupo para toda la secuencia; los frames fallidos se devuelven
+        if not user.reserve_generations(len(scenes_data)):
+            db.session.rollback()
+            remaining = user.get_remaining_generations()
             return jsonify({
                 "error": f"Excedes tu límite diario. Puedes generar {remaining} más hoy",
                 "remaining": remaining
             }), 429
         
         project_id = data.get('project_id')
-        results = []
+        generations = []
+        built = []
+        jobs = []
         
+        # Crear todos los registros de una vez
         for i, scene_data in enumerate(scenes_data):
-            # Crear generación para cada escena
             generation = Generation(
                 user_id=user.id,
                 project_id=project_id,
@@ -192,42 +247,71 @@ def generate_sequence():
                 status='generating'
             )
             db.session.add(generation)
-            db.session.commit()
+            generations.append(generation)
             
             try:
-                # Construir escena
-                scene = Scene(
-                    prompt=scene_data['prompt'],
-                    camera=CameraSettings(**scene_data.get('camera', {})),
-                    lighting=LightingSetup(**scene_data.get('lighting', {})),
-                    scene_number=i + 1
-                )
-                
-                generation.set_parameters(scene.to_fibo_payload())
-                
-                # Generar
-                start_time = time.time()
-                result = fibo_service.generate_image(scene.to_fibo_payload())
-                generation_time = time.time() - start_time
-                
-                if 'error' in result:
-                    generation.status = 'failed'
-                    generation.error_message = result['error']
-                else:
-                    generation.status = 'completed'
-                    generation.image_url = result.get('image_url')
-                    generation.generation_time = generation_time
-                    generation.completed_at = datetime.utcnow()
-                    user.increment_generation_count()
-                
-                db.session.commit()
-                results.append(generation.to_dict())
+                # Construir escena; un frame mal formado no afecta al resto
+                with stage_timer('scene_build'):
+                    scene = build_scene(scene_data, scene_number=i + 1)
+                built.append((generation, scene))
                 
             except Exception as e:
                 generation.status = 'failed'
                 generation.error_message = str(e)
-                db.session.commit()
-                results.append(generation.to_dict())
+        
+        # Validar el storyboard completo; cada frame reporta todas sus violaciones
+        with stage_timer('validate'):
+            violations = validate_scenes([scene for _, scene in built])
+        
+        for (generation, scene), errors in zip(built, violations):
+            if errors:
+                generation.status = 'failed'
+                generation.error_message = '; '.join(errors)
+                continue
+            
+            with stage_timer('payload_build'):
+                payload = scene.to_fibo_payload()
+            generation.set_parameters(payload)
+            jobs.append((generation, payload))
+        
+        if len(jobs) < len(scenes_data):
+            user.refund_generations(len(scenes_data) - len(jobs))
+        
+        _timed_commit()
+        
+        # Generar en paralelo; cada frame se guarda en cuanto termina
+        frames = fibo_service.iter_sequence(
+            [payload for _, payload in jobs],
+            user_key=user.id
+        )
+        pending = []
+        for index, result, generation_time in frames:
+            generation = jobs[index][0]
+            
+            if 'error' in result:
+                generation.status = 'failed'
+                generation.error_message = result['error']
+                user.refund_generations()
+            elif result.get('pending'):
+                generation.fibo_generation_id = result.get('id')
+                pending.append(generation)
+            else:
+                generation.status = 'completed'
+                generation.image_url = result.get('image_url')
+                generation.fibo_generation_id = result.get('id')
+                generation.generation_time = generation_time
+                generation.completed_at = datetime.utcnow()
+                user.confirm_generations()
+            
+            _timed_commit()
+        
+        if pending:
+            poller = get_result_poller(current_app._get_current_object(), fibo_service)
+            for generation in pending:
+                poller.track(generation.id, generation.fibo_generation_id)
+        
+        # Mantener el orden por scene_number
+        results = [g.to_dict() for g in generations]
         
         return jsonify({
             "success": True,
@@ -241,6 +325,62 @@ def generate_sequence():
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+@generation_bp.route('/camera-path', methods=['POST'])
+@jwt_required()
+def translate_path():
+    """
+    Traduce una trayectoria de cámara 3D completa a parámetros cinematográficos.
+    
+    Body: {"positions": [[x,y,z], ...], "light_positions": [[x,y,z], ...] o [x,y,z], "fov": 50 o [...]}
+    
+    Con "segment": true (y "prompt") agrupa los keyframes en planos y
+    devuelve una escena por plano, lista para /generation/sequence.
+    """
+    try:
+        data = request.get_json() or {}
+        positions = data.get('positions')
+        
+        if not positions:
+            return jsonify({"error": "Se requiere al menos una posición"}), 400
+        
+        max_keyframes = current_app.config.get('CAMERA_PATH_MAX_KEYFRAMES', 10000)
+        if len(positions) > max_keyframes:
+            return jsonify({"error": f"Máximo {max_keyframes} keyframes por request"}), 400
+        
+        if data.get('segment'):
+            prompt = data.get('prompt')
+            if not prompt:
+                return jsonify({"error": "Se requiere un prompt para segmentar"}), 400
+            
+            segments = segment_camera_path(
+                positions,
+                light_positions=data.get('light_positions', [0, 3, 3]),
+                fovs=data.get('fov', 50)
+            )
+            
+            return jsonify({
+                "success": True,
+                "segments": segments,
+                "scenes": [segment_to_scene_data(segment, prompt) for segment in segments],
+                "total_keyframes": len(positions),
+                "total": len(segments)
+            }), 200
+        
+        frames = translate_camera_path(
+            positions,
+            light_positions=data.get('light_positions', [0, 3, 3]),
+            fovs=data.get('fov', 50)
+        )
+        
+        return jsonify({
+            "success": True,
+            "frames": frames,
+            "total": len(frames)
+        }), 200
+        
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
 @generation_bp.route('/history', methods=['GET'])
 @jwt_required()
 def get_generation_history():
@@ -260,6 +400,25 @@ def get_generation_history():
         if status:
             query = query.filter_by(status=status)
         
+        # Filtros sobre los parámetros (?style=noir&shot_type=close_up)
+        for name in Generation.PARAMETER_FILTERS:
+            value = request.args.get(name)
+            if value:
+                query = query.filter(Generation.parameter_equals(name, value))
+        
+        # Modo cursor: ?cursor= (primera página) o ?cursor=<next_cursor>
+        if wants_cursor():
+            items, next_cursor = keyset_paginate(
+                query, Generation.created_at, Generation.id,
+                request.args.get('cursor'), per_page
+            )
+            return jsonify({
+                "success": True,
+                "generations": [g.to_dict() for g in items],
+                "per_page": per_page,
+                "next_cursor": next_cursor
+            }), 200
+        
         query = query.order_by(Generation.created_at.desc())
         
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
@@ -1,9 +1,12 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import joinedload
 from app.models import db
 from app.models.project import Project
 from app.models.user import User
+from app.models.stats import project_generation_counts
 from app.middleware import owner_required
+from app.utils.pagination import keyset_paginate, wants_cursor
 
 projects_bp = Blueprint('projects', __name__, url_prefix='/projects')
 
@@ -14,6 +17,7 @@ def get_projects():
     """
     Lista todos los proyectos del usuario actual.
     Query params: ?page=1&per_page=10&status=draft
+    Modo cursor: ?cursor=&per_page=10, luego ?cursor=<next_cursor>
     """
     try:
         current_user_id = get_jwt_identity()
@@ -21,13 +25,25 @@ def get_projects():
         per_page = request.args.get('per_page', 10, type=int)
         status = request.args.get('status')
         
-        # Query base: solo proyectos del usuario
-        query = Project.query.filter_by(user_id=current_user_id)
+        # Query base: solo proyectos del usuario (owner en el mismo SELECT)
+        query = Project.query.options(joinedload(Project.owner)).filter_by(user_id=current_user_id)
         
         # Filtro opcional por status
         if status:
             query = query.filter_by(status=status)
         
+        if wants_cursor():
+            items, next_cursor = keyset_paginate(
+                query, Project.updated_at, Project.id,
+                request.args.get('cursor'), per_page
+            )
+            return jsonify({
+                "success": True,
+                "projects": [p.to_dict() for p in items],
+                "per_page": per_page,
+                "next_cursor": next_cursor
+            }), 200
+        
         # Ordenar por más reciente
         query = query.order_by(Project.updated_at.desc())
         
@@ -203,11 +219,24 @@ def get_public_projects():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 12, type=int)
         
-        query = Project.query.filter_by(
+        # Los owners se cargan con un JOIN en vez de un SELECT por proyecto
+        query = Project.query.options(joinedload(Project.owner)).filter_by(
             is_public=True, 
             status='completed'
         ).order_by(Project.updated_at.desc())
         
+        if wants_cursor():
+            items, next_cursor = keyset_paginate(
+                query, Project.updated_at, Project.id,
+                request.args.get('cursor'), per_page
+            )
+            return jsonify({
+                "success": True,
+                "projects": [p.to_dict() for p in items],
+                "per_page": per_page,
+                "next_cursor": next_cursor
+            }), 200
+        
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         
         return jsonify({
@@ -234,11 +263,12 @@ def get_project_stats(project_id, resource=None):
     Obtiene estadísticas del proyecto.
     """
     try:
+        counts = project_generation_counts(resource.id)
         stats = {
-            "total_generations": resource.generations.count(),
-            "completed_generations": resource.generations.filter_by(status='completed').count(),
-            "failed_generations": resource.generations.filter_by(status='failed').count(),
-            "favorite_count": resource.generations.filter_by(is_favorite=True).count(),
+            "total_generations": counts['total_generations'],
+            "completed_generations": counts['completed_generations'],
+            "failed_generations": counts['failed_generations'],
+            "favorite_count": counts['favorite_generations'],
             "created_at": resource.created_at.isoformat(),
             "last_updated": resource.updated_at.isoformat()
         }
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
 from app.models.project import Project
+from app.services.user_search import search_users as run_user_search, search_users_page
+from app.utils.pagination import keyset_paginate, wants_cursor
 
 users_bp = Blueprint('users', __name__)
 
@@ -39,6 +41,9 @@ def get_user_public_projects(username):
         if not user:
             return jsonify({"error": "Usuario no encontrado"}), 404
         
+        # Todos los proyectos son del mismo usuario, ya cargado
+        owners = {user.id: user}
+        
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 12, type=int)
         
@@ -48,10 +53,22 @@ def get_user_public_projects(username):
             status='completed'
         ).order_by(Project.updated_at.desc())
         
+        if wants_cursor():
+            items, next_cursor = keyset_paginate(
+                query, Project.updated_at, Project.id,
+                request.args.get('cursor'), per_page
+            )
+            return jsonify({
+                "projects": [p.to_dict(owners=owners) for p in items],
+                "per_page": per_page,
+                "next_cursor": next_cursor,
+                "user": user.to_dict()
+            }), 200
+        
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         
         return jsonify({
-            "projects": [p.to_dict() for p in pagination.items],
+            "projects": [p.to_dict(owners=owners) for p in pagination.items],
             "total": pagination.total,
             "page": page,
             "per_page": per_page,
@@ -64,23 +81,30 @@ def get_user_public_projects(username):
 
 @users_bp.route('/search', methods=['GET'])
 def search_users():
-    """Busca usuarios por username"""
+    """
+    Busca usuarios por username o nombre, ordenados por relevancia.
+    Query params: ?q=texto&page=1&per_page=10, o ?cursor= para paginar por cursor
+    """
     try:
-        query = request.args.get('q', '')
+        query = request.args.get('q', '').strip()
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         
         if not query:
             return jsonify({"error": "Query de búsqueda requerido"}), 400
         
-        users_query = User.query.filter(
-            User.username.ilike(f'%{query}%')
-        ).filter_by(is_active=True)
+        if wants_cursor():
+            users, next_cursor = run_user_search(query, per_page, request.args.get('cursor'))
+            return jsonify({
+                "users": [u.to_dict() for u in users],
+                "per_page": per_page,
+                "next_cursor": next_cursor
+            }), 200
         
-        pagination = users_query.paginate(page=page, per_page=per_page, error_out=False)
+        users, pagination = search_users_page(query, page, per_page)
         
         return jsonify({
-            "users": [u.to_dict() for u in pagination.items],
+            "users": [u.to_dict() for u in users],
             "total": pagination.total,
             "page": page,
             "per_page": per_page,
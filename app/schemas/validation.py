@@ -1,5 +1,13 @@
-from pydantic import BaseModel, constr, conint
-from typing import List, Optional
+from dataclasses import MISSING, fields
+from pydantic import BaseModel, Extra, Field, ValidationError, constr, conint, create_model
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models.camera import CameraSettings
+from app.models.constraints import (
+    CAMERA_CONSTRAINTS, LIGHT_SOURCE_CONSTRAINTS, LIGHTING_CONSTRAINTS, SCENE_CONSTRAINTS
+)
+from app.models.lighting import LightingSetup, LightSource
+from app.models.scene import Scene
 
 class UserSchema(BaseModel):
     id: int
@@ -41,4 +49,126 @@ class FiboSchema(BaseModel):
     status: str
 
 class ValidationErrorSchema(BaseModel):
-    detail: List[str]
\ No newline at end of file
+    detail: List[str]
+
+# ============ PARÁMETROS DE ESCENA ============
+# Generados desde las tablas de app/models/constraints.py: los límites de
+# Pydantic y los de Scene.validate() son los mismos datos.
+
+def _field_bounds(constraints):
+    """{campo: kwargs de Field} a partir de una tabla de restricciones"""
+    bounds = {}
+    for constraint in constraints:
+        kwargs = bounds.setdefault(constraint.field, {})
+        if constraint.kind == 'range':
+            if constraint.low is not None:
+                kwargs['ge'] = constraint.low
+            if constraint.high is not None:
+                kwargs['le'] = constraint.high
+        elif constraint.kind == 'max_length':
+            kwargs['max_length'] = constraint.high
+        elif constraint.kind == 'not_blank':
+            kwargs['regex'] = r'\s*\S'
+    return bounds
+
+
+def _parameters_schema(name, dataclass_cls, constraints, types=None, config=None):
+    """
+    Esquema con los campos y valores por defecto de una dataclass y los
+    límites de su tabla de restricciones.
+    """
+    types = types or {}
+    bounds = _field_bounds(constraints)
+    definitions = {}
+    for f in fields(dataclass_cls):
+        annotation = types.get(f.name, f.type)
+        if f.default_factory is not MISSING:
+            factory = annotation if f.name in types else f.default_factory
+            info = Field(default_factory=factory, **bounds.get(f.name, {}))
+        else:
+            default = ... if f.default is MISSING else f.default
+            info = Field(default, **bounds.get(f.name, {}))
+        definitions[f.name] = (annotation, info)
+    return create_model(name, __config__=config, **definitions)
+
+
+LightSourceParametersSchema = _parameters_schema(
+    'LightSourceParametersSchema', LightSource, LIGHT_SOURCE_CONSTRAINTS
+)
+
+CameraParametersSchema = _parameters_schema(
+    'CameraParametersSchema', CameraSettings, CAMERA_CONSTRAINTS
+)
+
+LightingParametersSchema = _parameters_schema(
+    'LightingParametersSchema', LightingSetup, LIGHTING_CONSTRAINTS,
+    types={'lights': Optional[List[LightSourceParametersSchema]]}
+)
+
+SceneParametersSchema = _parameters_schema(
+    'SceneParametersSchema', Scene, SCENE_CONSTRAINTS,
+    types={'camera': CameraParametersSchema, 'lighting': LightingParametersSchema}
+)
+
+
+# ============ ENTRADA DE ESCENAS ============
+# /generation/single y /generation/sequence usan Pydantic solo para convertir
+# tipos ("50" -> 50.0, luces como dicts -> LightSource) y rechazar campos
+# desconocidos. Los rangos los revisa el validador compilado de
+# app/models/constraints.py (scene_errors / validate_scenes), por lote.
+
+class _ForbidExtra:
+    extra = Extra.forbid
+
+
+_LightSourceInput = _parameters_schema(
+    '_LightSourceInput', LightSource, (), config=_ForbidExtra
+)
+
+_CameraInput = _parameters_schema(
+    '_CameraInput', CameraSettings, (), config=_ForbidExtra
+)
+
+_LightingInput = _parameters_schema(
+    '_LightingInput', LightingSetup, (), config=_ForbidExtra,
+    types={'lights': Optional[List[_LightSourceInput]]}
+)
+
+_SceneInput = _parameters_schema(
+    '_SceneInput', Scene, (), config=_ForbidExtra,
+    types={'camera': _CameraInput, 'lighting': _LightingInput}
+)
+
+
+class SceneInputError(ValueError):
+    """Escena con tipos inválidos o campos desconocidos"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def build_scene(data: Dict[str, Any], ignore: Tuple[str, ...] = (), **overrides) -> Scene:
+    """
+    Construye la Scene de un request sin revisar rangos.
+
+    Args:
+        data: Datos de la escena
+        ignore: Claves del request que no son parámetros de escena
+        overrides: Campos que se fijan después de convertir (ej: scene_number)
+
+    Raises:
+        SceneInputError: Con todos los errores de tipo y campos desconocidos
+    """
+    fields_data = {k: v for k, v in data.items() if k not in ignore}
+    try:
+        parameters = _SceneInput.parse_obj(fields_data)
+    except ValidationError as e:
+        raise SceneInputError([
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in e.errors()
+        ])
+
+    values = parameters.dict()
+    values.update(overrides)
+    return Scene.from_dict(values)
@@ -0,0 +1,61 @@
+"""
+Límites de concurrencia para llamadas a FIBO.
+
+Un semáforo global acota cuántas generaciones simultáneas hace el proceso
+contra Bria, y un semáforo por usuario evita que un storyboard grande
+acapare todos los slots.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict, Hashable, List, Optional
+
+
+class ConcurrencyLimiter:
+    """Semáforos global y por usuario, compartidos entre threads"""
+
+    def __init__(self, global_limit: int = 8, per_user_limit: int = 4):
+        self.global_limit = global_limit
+        self.per_user_limit = per_user_limit
+        self._global = threading.BoundedSemaphore(global_limit)
+        # user_key -> [semáforo, referencias (slots en uso o en espera)]
+        self._per_user: Dict[Hashable, List] = {}
+        self._lock = threading.Lock()
+
+    def _acquire_user(self, user_key: Hashable) -> threading.BoundedSemaphore:
+        """Semáforo del usuario, con una referencia más mientras se use"""
+        with self._lock:
+            entry = self._per_user.get(user_key)
+            if entry is None:
+                entry = [threading.BoundedSemaphore(self.per_user_limit), 0]
+                self._per_user[user_key] = entry
+            entry[1] += 1
+            return entry[0]
+
+    def _release_user(self, user_key: Hashable):
+        """Suelta la referencia; el semáforo se descarta cuando nadie lo usa ni lo espera"""
+        with self._lock:
+            entry = self._per_user[user_key]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._per_user[user_key]
+
+    @contextmanager
+    def slot(self, user_key: Optional[Hashable] = None):
+        """
+        Reserva un slot de ejecución.
+
+        El semáforo del usuario se toma antes que el global para que un
+        usuario que ya agotó su cuota no retenga slots globales mientras espera.
+        """
+        if user_key is None:
+            with self._global:
+                yield
+            return
+
+        user_semaphore = self._acquire_user(user_key)
+        try:
+            with user_semaphore:
+                with self._global:
+                    yield
+        finally:
+            self._release_user(user_key)
@@ -1,8 +1,58 @@
 import requests
+import logging
 import os
 import time
-from typing import Optional, Dict, Any
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, Iterator, Tuple
 from app.config import Config
+from app.services.concurrency import ConcurrencyLimiter
+from app.models.payload import as_scene_payload
+from app.services.result_cache import build_result_cache, canonical_payload_hash
+from app.services.single_flight import SingleFlight
+from app.services.prompt_compiler import enhance_prompt
+from app.utils.log import Truncated, fields
+from app.utils.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+class ResultEndpointResolver:
+    """
+    Aprende qué forma de URL de resultados responde en Bria.
+    
+    La forma que respondió (2xx o un 4xx distinto de 404) se recuerda por
+    proceso durante `ttl` segundos y se prueba primero; las demás solo se
+    consultan si esa devuelve 404. Los 5xx y timeouts no se recuerdan.
+    """
+    
+    def __init__(self, api_url: str, ttl: float = 3600):
+        base_url = api_url.replace('/v2', '')
+        self.templates = (
+            f"{api_url}/results/{{id}}",
+            f"{api_url}/result/{{id}}",
+            f"{base_url}/results/{{id}}"
+        )
+        self.ttl = ttl
+        self._cached = None
+        self._cached_at = 0.0
+        self._lock = threading.Lock()
+    
+    def probe_order(self) -> Tuple[str, ...]:
+        """Templates a probar, empezando por la forma cacheada si sigue vigente"""
+        with self._lock:
+            cached = self._cached
+            if cached is None or time.time() - self._cached_at > self.ttl:
+                return self.templates
+        return (cached,) + tuple(t for t in self.templates if t != cached)
+    
+    def remember(self, template: str):
+        """Guarda la forma que respondió"""
+        with self._lock:
+            self._cached = template
+            self._cached_at = time.time()
+
 
 class FIBOService:
     """Servicio para interactuar con FIBO API de Bria.ai"""
@@ -11,18 +61,125 @@ class FIBOService:
         self.api_url = Config.FIBO_API_URL
         self.api_key = Config.FIBO_API_KEY
         self.mock_mode = os.getenv('FIBO_MOCK_MODE', 'false').lower() == 'true'
+        self.sync_mode = Config.FIBO_SYNC_MODE
+        self.log_field_limit = Config.LOG_MAX_FIELD_LENGTH
+        self.limiter = ConcurrencyLimiter(
+            global_limit=Config.GENERATION_MAX_PARALLEL,
+            per_user_limit=Config.GENERATION_MAX_PARALLEL_PER_USER
+        )
+        self.session = self._build_session()
+        self.result_cache = build_result_cache(
+            Config.FIBO_RESULT_CACHE,
+            path=Config.FIBO_RESULT_CACHE_PATH,
+            ttl=Config.FIBO_RESULT_CACHE_TTL,
+            max_entries=Config.FIBO_RESULT_CACHE_MAX_ENTRIES
+        )
+        self.single_flight = SingleFlight(lock_dir=Config.FIBO_SINGLE_FLIGHT_LOCK_DIR)
+        self.result_endpoints = ResultEndpointResolver(self.api_url, ttl=Config.FIBO_RESULT_ENDPOINT_TTL)
+    
+    def _build_session(self) -> requests.Session:
+        """
+        Crea una sesión HTTP con pool de conexiones keep-alive.
+        
+        Reutilizar la sesión evita un handshake TCP+TLS nuevo contra Bria en
+        cada generación y cada consulta de estado. Los pools de urllib3 son
+        thread-safe, así que la sesión se comparte entre los threads del worker.
+        """
+        retry = Retry(
+            total=Config.FIBO_HTTP_RETRIES,
+            backoff_factor=Config.FIBO_HTTP_BACKOFF,
+            status_forcelist=(429, 502, 503, 504),
+            # POST no es idempotente (cada llamada se cobra), así que solo se
+            # reintenta ante errores de conexión; los GET también ante 5xx
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=Config.FIBO_HTTP_POOL_CONNECTIONS,
+            pool_maxsize=Config.FIBO_HTTP_POOL_MAXSIZE,
+            max_retries=retry
+        )
+        
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({"api_token": self.api_key})
+        return session
+    
+    def connection_stats(self) -> Dict[str, Any]:
+        """
+        Métricas de reutilización de conexiones del pool HTTP.
+        
+        Returns:
+            dict: pools por host, requests enviados, conexiones abiertas y ratio de reutilización
+        """
+        total_requests = 0
+        total_connections = 0
+        total_pools = 0
+        
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            total_pools += len(pools)
+            for key in pools.keys():
+                # Un pool puede salir del LRU entre keys() y get()
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                total_requests += pool.num_requests
+                total_connections += pool.num_connections
+        
+        reused = max(0, total_requests - total_connections)
+        return {
+            "pools": total_pools,
+            "requests": total_requests,
+            "connections_opened": total_connections,
+            "connections_reused": reused,
+            "reuse_ratio": round(reused / total_requests, 3) if total_requests else 0.0
+        }
         
     def generate_image(self, scene_payload: Dict[str, Any]) -> Dict[str, Any]:
         """
         Genera una imagen usando FIBO.
         En modo mock, simula la respuesta sin llamar a la API real.
+        Si el payload (con seed) ya se generó antes, devuelve el resultado cacheado.
         """
+        # Caché, single-flight y persistencia comparten el mismo hash/JSON
+        scene_payload = as_scene_payload(scene_payload)
+        
+        if self.result_cache:
+            cached = self.result_cache.get(scene_payload)
+            if cached is not None:
+                return dict(cached, cached=True)
+        
+        # Sin seed cada llamada produce una imagen distinta: no se coalesce
+        if scene_payload.get('seed') is None:
+            return self._generate_uncached(scene_payload)
+        
+        # Requests idénticos en vuelo comparten una sola llamada a Bria
+        recheck = (lambda: self.result_cache.get(scene_payload)) if self.result_cache else None
+        result, shared = self.single_flight.do(
+            canonical_payload_hash(scene_payload),
+            lambda: self._generate_uncached(scene_payload),
+            recheck=recheck
+        )
+        
+        if shared:
+            return dict(result, coalesced=True)
+        return result
+    
+    def _generate_uncached(self, scene_payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Genera la imagen (mock o Bria) y guarda el resultado en caché"""
         # Si no hay API key o está en modo mock, usar mock
         if self.mock_mode or not self.api_key or self.api_key == 'tu-api-key-aqui-copia-la-de-production':
-            return self._mock_generate(scene_payload)
+            result = self._mock_generate(scene_payload)
+        else:
+            # Llamada real a FIBO API de Bria.ai
+            result = self._real_generate_bria(scene_payload)
+        
+        if self.result_cache:
+            self.result_cache.set(scene_payload, result)
         
-        # Llamada real a FIBO API de Bria.ai
-        return self._real_generate_bria(scene_payload)
+        return result
     
     def _real_generate_bria(self, scene_payload: Dict[str, Any]) -> Dict[str, Any]:
         """Llamada real a FIBO API de Bria.ai"""
@@ -30,34 +187,36 @@ class FIBOService:
         # Transformar el payload al formato de Bria.ai
         bria_payload = self._transform_to_bria_format(scene_payload)
         
+        # Bria usa "api_token" en header (ya incluido en la sesión)
         headers = {
-            "Content-Type": "application/json",
-            "api_token": self.api_key  # Bria usa "api_token" en header
+            "Content-Type": "application/json"
         }
         
         try:
             # Endpoint de text-to-image de Bria
             url = f"{self.api_url}/image/generate/lite"
             
-            print(f"🚀 Llamando a Bria.ai: {url}")
-            print(f"📦 Payload: {bria_payload}")
+            logger.info("bria.request", extra=fields(url=url, seed=bria_payload.get("seed")))
+            logger.debug("bria.payload", extra=fields(payload=Truncated(bria_payload, self.log_field_limit)))
             
-            response = requests.post(
-                url,
-                json=bria_payload,
-                headers=headers,
-                timeout=300  # 5 minutos timeout
-            )
+            with stage_timer('upstream_http'):
+                response = self.session.post(
+                    url,
+                    json=bria_payload,
+                    headers=headers,
+                    timeout=300  # 5 minutos timeout
+                )
             
-            print(f"📡 Response status: {response.status_code}")
+            logger.info("bria.response", extra=fields(url=url, status_code=response.status_code))
             
             response.raise_for_status()
             result = response.json()
             
-            print(f"✅ Response: {result}")
+            logger.debug("bria.response.body", extra=fields(body=Truncated(result, self.log_field_limit)))
             
             # Transformar respuesta de Bria al formato interno
-            return self._transform_bria_response(result, bria_payload)
+            with stage_timer('response_transform'):
+                return self._transform_bria_response(result, bria_payload)
             
         except requests.exceptions.ConnectionError as e:
             return {
@@ -100,27 +259,31 @@ class FIBOService:
         }
         """
         # Mejorar prompt con info cinematográfica
-        enhanced_prompt = self._enhance_prompt_with_cinematics(
-            scene_payload.get("prompt", ""),
-            scene_payload
-        )
+        with stage_timer('prompt_enhance'):
+            enhanced_prompt = self._enhance_prompt_with_cinematics(
+                scene_payload.get("prompt", ""),
+                scene_payload
+            )
         
-        # Payload con sync=true para respuesta síncrona
+        # Con sync=true Bria devuelve la imagen; con sync=false solo un request_id
+        # que consulta ResultPoller, sin bloquear el worker durante el render
         bria_payload = {
             "prompt": enhanced_prompt,
             "num_results": 1,
             "width": scene_payload.get("width", 1024),
             "height": scene_payload.get("height", 1024),
-            "sync": True  # ← Clave para obtener imagen inmediatamente
+            "sync": self.sync_mode
         }
         
         # Agregar seed si existe
         if scene_payload.get("seed"):
             bria_payload["seed"] = scene_payload["seed"]
         
-        print(f"\n📝 Prompt original: {scene_payload.get('prompt')}")
-        print(f"✨ Prompt mejorado: {enhanced_prompt}")
-        print(f"🔄 Modo síncrono: {bria_payload['sync']}\n")
+        logger.debug("bria.prompt", extra=fields(
+            original=Truncated(scene_payload.get('prompt'), self.log_field_limit),
+            enhanced=Truncated(enhanced_prompt, self.log_field_limit),
+            sync=bria_payload['sync']
+        ))
         
         return bria_payload
     
@@ -128,74 +291,9 @@ class FIBOService:
         """
         Mejora el prompt agregando descripciones cinematográficas.
         Como Bria no tiene parámetros específicos de cámara/luz,
-        los agregamos al prompt de texto.
+        los agregamos al prompt de texto (ver prompt_compiler).
         """
-        enhancements = []
-        
-        # Extraer info de cámara
-        camera = scene_payload.get("camera", {})
-        if camera:
-            shot_type = camera.get("shot_type", "")
-            angle = camera.get("angle", "")
-            
-            if shot_type:
-                shot_descriptions = {
-                    "close_up": "close-up shot",
-                    "medium_shot": "medium shot",
-                    "wide_shot": "wide shot",
-                    "extreme_wide_shot": "extreme wide angle shot",
-                    "full_shot": "full body shot"
-                }
-                if shot_type in shot_descriptions:
-                    enhancements.append(shot_descriptions[shot_type])
-            
-            if angle and angle != "eye_level":
-                angle_descriptions = {
-                    "low_angle": "low angle view",
-                    "high_angle": "high angle view",
-                    "birds_eye": "aerial bird's eye view"
-                }
-                if angle in angle_descriptions:
-                    enhancements.append(angle_descriptions[angle])
-        
-        # Extraer info de iluminación
-        lighting = scene_payload.get("lighting", {})
-        if lighting:
-            time_of_day = lighting.get("time_of_day", "")
-            color_grading = lighting.get("color_grading", "")
-            
-            if time_of_day:
-                time_descriptions = {
-                    "golden_hour": "golden hour lighting",
-                    "blue_hour": "blue hour lighting",
-                    "night": "night scene",
-                    "dawn": "dawn lighting"
-                }
-                if time_of_day in time_descriptions:
-                    enhancements.append(time_descriptions[time_of_day])
-            
-            if color_grading and color_grading != "neutral":
-                grading_descriptions = {
-                    "cinematic": "cinematic color grading",
-                    "warm": "warm tones",
-                    "cool": "cool tones",
-                    "cyberpunk": "cyberpunk neon colors"
-                }
-                if color_grading in grading_descriptions:
-                    enhancements.append(grading_descriptions[color_grading])
-        
-        # Agregar estilo si existe
-        style = scene_payload.get("style", "")
-        if style and style != "realistic":
-            enhancements.append(f"{style} style")
-        
-        # Construir prompt mejorado
-        if enhancements:
-            enhanced = f"{base_prompt}, {', '.join(enhancements)}"
-        else:
-            enhanced = base_prompt
-        
-        return enhanced
+        return enhance_prompt(base_prompt, scene_payload)
     
     def _transform_bria_response(self, bria_result: Dict[str, Any], original_payload: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -208,14 +306,26 @@ class FIBOService:
                 "seed": 123456
             }
         }
+        
+        Con sync=false devuelve el ID para consultar el estado:
+        {
+            "request_id": "...",
+            "status_url": "https://..."
+        }
         """
         try:
-            print(f"\n{'='*60}")
-            print(f"🔄 PROCESANDO RESPUESTA SÍNCRONA")
-            print(f"{'='*60}")
-            print(f"Respuesta completa: {bria_result}")
-            print(f"{'='*60}\n")
+            if not bria_result.get("result") and bria_result.get("request_id"):
+                return {
+                    "success": True,
+                    "id": bria_result["request_id"],
+                    "image_url": None,
+                    "status": "generating",
+                    "pending": True,
+                    "mock": False,
+                    "provider": "bria.ai"
+                }
             
+
             # Extraer el resultado (es un dict, no una lista)
             result = bria_result.get("result", {})
             
@@ -235,8 +345,7 @@ class FIBOService:
                     "raw_response": bria_result
                 }
             
-            print(f"✅ Imagen obtenida: {image_url}")
-            print(f"🎲 Seed: {seed}\n")
+            logger.debug("bria.image", extra=fields(image_url=image_url, seed=seed))
             
             return {
                 "success": True,
@@ -254,7 +363,7 @@ class FIBOService:
             }
             
         except Exception as e:
-            print(f"❌ Error procesando respuesta: {str(e)}")
+            logger.exception("bria.response.invalid", extra=fields(body=Truncated(bria_result, self.log_field_limit)))
             return {
                 "error": f"Error al procesar respuesta de Bria: {str(e)}",
                 "raw_response": bria_result
@@ -263,72 +372,39 @@ class FIBOService:
     def _get_result(self, result_id: str) -> Dict[str, Any]:
         """
         Consulta el resultado de una generación en Bria.ai
+        
+        Usa la forma de URL que ya funcionó (cacheada por el resolver) y solo
+        prueba las alternativas si esa devuelve 404.
         """
-        headers = {
-            "api_token": self.api_key
-        }
+        tried = []
         
         try:
-            url = f"{self.api_url}/results/{result_id}"
-            
-            print(f"\n{'='*60}")
-            print(f"🔍 CONSULTANDO RESULTADO")
-            print(f"{'='*60}")
-            print(f"URL: {url}")
-            print(f"Result ID: {result_id}")
-            print(f"{'='*60}\n")
-            
-            response = requests.get(
-                url,
-                headers=headers,
-                timeout=30
-            )
-            
-            print(f"\n{'='*60}")
-            print(f"📊 RESPUESTA DE STATUS")
-            print(f"{'='*60}")
-            print(f"Status Code: {response.status_code}")
-            print(f"Body: {response.text}")
-            print(f"{'='*60}\n")
-            
-            if response.status_code == 404:
-                # Tal vez el endpoint es diferente, probar alternativas
-                print("⚠️  404 en /results/{id}, probando endpoint alternativo...")
+            for template in self.result_endpoints.probe_order():
+                url = template.format(id=result_id)
+                tried.append(url)
                 
-                # Intentar con /result (singular)
-                alt_url = f"{self.api_url}/result/{result_id}"
-                print(f"🔄 Probando: {alt_url}")
+                response = self.session.get(url, timeout=30)
                 
-                alt_response = requests.get(alt_url, headers=headers, timeout=30)
+                logger.debug("bria.result.poll", extra=fields(url=url, status_code=response.status_code))
                 
-                if alt_response.status_code == 200:
-                    print("✅ Funcionó con /result (singular)")
-                    return alt_response.json()
+                if response.status_code == 404:
+                    continue
                 
-                # Intentar sin /v2
-                alt_url2 = f"{self.api_url.replace('/v2', '')}/results/{result_id}"
-                print(f"🔄 Probando: {alt_url2}")
+                # Un 5xx no confirma la forma de la URL: solo 2xx o un 4xx definitivo
+                if response.status_code < 500:
+                    self.result_endpoints.remember(template)
+                response.raise_for_status()
+                result = response.json()
                 
-                alt_response2 = requests.get(alt_url2, headers=headers, timeout=30)
-                
-                if alt_response2.status_code == 200:
-                    print("✅ Funcionó sin /v2")
-                    return alt_response2.json()
-                
-                return {
-                    "error": f"Endpoint no encontrado. Probé: {url}, {alt_url}, {alt_url2}",
-                    "status_code": 404
-                }
-            
-            response.raise_for_status()
-            result = response.json()
-            
-            print(f"📊 Estado: {result.get('status', 'unknown')}")
+                return result
             
-            return result
+            return {
+                "error": f"Endpoint no encontrado. Probé: {', '.join(tried)}",
+                "status_code": 404
+            }
             
         except requests.exceptions.RequestException as e:
-            print(f"❌ Error: {str(e)}")
+            logger.warning("bria.result.error", extra=fields(result_id=result_id, error=str(e)))
             return {
                 "error": f"Error al consultar resultado: {str(e)}"
             }
@@ -373,15 +449,55 @@ class FIBOService:
             }
         }
     
-    def generate_sequence(self, scenes: list) -> list:
-        """Genera una secuencia de frames"""
-        results = []
-        for i, scene in enumerate(scenes):
-            print(f"Generando frame {i+1}/{len(scenes)}")
-            result = self.generate_image(scene)
-            results.append(result)
+    def generate_sequence(self, scenes: list, user_key=None) -> list:
+        """
+        Genera una secuencia de frames en paralelo.
+        
+        Returns:
+            list: Resultados en el mismo orden que `scenes`
+        """
+        results = [None] * len(scenes)
+        for index, result, _ in self.iter_sequence(scenes, user_key=user_key):
+            results[index] = result
         return results
     
+    def iter_sequence(self, scenes: list, user_key=None) -> Iterator[Tuple[int, Dict[str, Any], float]]:
+        """
+        Genera los frames con concurrencia acotada y los entrega según terminan.
+        
+        Args:
+            scenes: Lista de payloads de FIBO
+            user_key: Identificador para el límite por usuario (ej: user.id)
+            
+        Yields:
+            tuple: (índice en `scenes`, resultado, tiempo de generación)
+        """
+        if not scenes:
+            return
+        
+        def run(payload):
+            with self.limiter.slot(user_key):
+                start_time = time.time()
+                try:
+                    result = self.generate_image(payload)
+                except Exception as e:
+                    result = {"error": str(e)}
+                return result, time.time() - start_time
+        
+        max_workers = min(len(scenes), self.limiter.per_user_limit)
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fibo-frame')
+        futures = {executor.submit(run, payload): i for i, payload in enumerate(scenes)}
+        try:
+            for future in as_completed(futures):
+                result, generation_time = future.result()
+                yield futures[future], result, generation_time
+        finally:
+            # Si el consumidor abandona el generador (GeneratorExit) o falla,
+            # los frames que no empezaron no se envían a Bria
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
     def health_check(self) -> Dict[str, Any]:
         """Verifica si la API de FIBO está disponible"""
         
@@ -401,7 +517,7 @@ class FIBOService:
         
         try:
             # Probar conexión con endpoint simple
-            response = requests.get(
+            response = self.session.get(
                 f"{self.api_url.replace('/v1', '').replace('/v2', '')}/health",
                 timeout=10
             )
@@ -409,7 +525,8 @@ class FIBOService:
                 "status": "healthy" if response.status_code == 200 else "degraded",
                 "mode": "real",
                 "provider": "bria.ai",
-                "api_url": self.api_url
+                "api_url": self.api_url,
+                "connections": self.connection_stats()
             }
         except:
             return {
@@ -430,18 +547,34 @@ class FIBOService:
         if result.get("error"):
             return result
         
-        if result.get("status") == "success":
-            image_url = result.get("urls", [{}])[0].get("url", "")
+        status = str(result.get("status", "unknown")).lower()
+        
+        if status in ("success", "completed"):
+            # V2 devuelve {"result": {"image_url": ...}}; la versión anterior {"urls": [...]}
+            if result.get("result"):
+                image_url = result["result"].get("image_url", "")
+                seed = result["result"].get("seed")
+            else:
+                image_url = result.get("urls", [{}])[0].get("url", "")
+                seed = result.get("seed")
             return {
                 "success": True,
                 "id": result_id,
                 "image_url": image_url,
-                "seed": result.get("seed"),
+                "seed": seed,
                 "status": "completed"
             }
-        else:
+        
+        if status in ("error", "failed"):
             return {
                 "success": False,
-                "status": result.get("status", "unknown"),
-                "message": f"Generación aún en proceso: {result.get('status')}"
-            }
\ No newline at end of file
+                "id": result_id,
+                "status": "failed",
+                "error": result.get("error") or f"Bria reportó estado {result.get('status')}"
+            }
+        
+        return {
+            "success": False,
+            "status": result.get("status", "unknown"),
+            "message": f"Generación aún en proceso: {result.get('status')}"
+        }
@@ -0,0 +1,414 @@
+"""
+Cola de trabajos de generación.
+
+Permite que /generation/single responda de inmediato (202) mientras un pool
+de workers en segundo plano llama a FIBO y actualiza el registro Generation
+(pending → generating → completed/failed).
+
+La cola está respaldada por SQLite (stdlib), así que funciona sin brokers
+externos. Por defecto vive en un archivo, que varios procesos de gunicorn
+comparten y que sobrevive a un reinicio; con ':memory:' vive dentro del
+proceso y se pierde al reiniciarlo.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Set
+
+from app.models import db
+from app.models.payload import ScenePayload, dumps_json
+from app.services.result_poller import get_result_poller
+from app.utils.metrics import timed_commit
+
+logger = logging.getLogger(__name__)
+
+# Serializa la creación de la cola y el arranque del pool entre threads de requests
+_init_lock = threading.Lock()
+
+
+class SQLiteJobQueue:
+    """Cola FIFO persistente sobre una tabla SQLite."""
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            isolation_level=None,  # Transacciones explícitas
+            timeout=30
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS generation_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                generation_id INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_generation_jobs_status "
+            "ON generation_jobs (status, id)"
+        )
+
+    def put(self, generation_id: int, payload: Dict[str, Any]) -> int:
+        """
+        Encola un trabajo de generación.
+
+        Args:
+            generation_id: ID del registro Generation
+            payload: Payload de FIBO (scene.to_fibo_payload())
+
+        Returns:
+            int: ID del trabajo
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO generation_jobs (generation_id, payload, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (generation_id, dumps_json(payload), now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Toma el siguiente trabajo pendiente de forma atómica.
+
+        BEGIN IMMEDIATE bloquea la base para escritura, así que dos workers
+        (aunque estén en procesos distintos) nunca toman el mismo trabajo.
+
+        Returns:
+            dict o None si la cola está vacía
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, generation_id, payload, attempts FROM generation_jobs "
+                    "WHERE status = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+
+                self._conn.execute(
+                    "UPDATE generation_jobs SET status = 'processing', "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (time.time(), row[0])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return {
+            "id": row[0],
+            "generation_id": row[1],
+            "payload": ScenePayload(json.loads(row[2])),
+            "attempts": row[3] + 1
+        }
+
+    def complete(self, job_id: int):
+        """Marca un trabajo como terminado"""
+        self._set_status(job_id, 'done')
+
+    def fail(self, job_id: int, error: str):
+        """Marca un trabajo como fallido"""
+        self._set_status(job_id, 'failed', error)
+
+    def requeue_stale(self, older_than: float = 600.0) -> int:
+        """
+        Devuelve a la cola trabajos que quedaron en 'processing'
+        (por ejemplo, si el proceso murió a mitad de la generación).
+
+        Returns:
+            int: Número de trabajos reencolados
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE generation_jobs SET status = 'queued', updated_at = ? "
+                "WHERE status = 'processing' AND updated_at < ?",
+                (time.time(), time.time() - older_than)
+            )
+            return cursor.rowcount
+
+    def active_generation_ids(self) -> Set[int]:
+        """IDs de Generation con un trabajo en cola o en proceso"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT generation_id FROM generation_jobs "
+                "WHERE status IN ('queued', 'processing')"
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def pending_count(self) -> int:
+        """Número de trabajos esperando worker"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM generation_jobs WHERE status = 'queued'"
+            ).fetchone()
+        return row[0]
+
+    def _set_status(self, job_id: int, status: str, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE generation_jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+
+class GenerationWorkerPool:
+    """
+    Pool de threads que consume la cola y ejecuta las generaciones.
+
+    Cada worker abre su propio app context, así que usa su propia sesión
+    de SQLAlchemy y nunca comparte objetos ORM con el request original.
+    """
+
+    def __init__(self, app, queue: SQLiteJobQueue, fibo_service,
+                 num_workers: int = 2, poll_interval: float = 0.5, orphan_grace: float = 60.0):
+        self.app = app
+        self.queue = queue
+        self.fibo_service = fibo_service
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.orphan_grace = orphan_grace
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Arranca los workers (idempotente y seguro entre threads)"""
+        if self._threads:
+            return
+
+        with _init_lock:
+            if self._threads:
+                return
+
+            self.queue.requeue_stale()
+            self.reconcile_orphans()
+
+            for i in range(self.num_workers):
+                thread = threading.Thread(
+                    target=self._run,
+                    name=f'generation-worker-{i}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Detiene los workers al terminar el trabajo en curso"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Despierta a los workers cuando llega un trabajo nuevo"""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            job = self.queue.claim()
+
+            if job is None:
+                # La cola puede compartirse entre procesos, así que además
+                # de la notificación local se hace polling periódico
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            try:
+                self._process(job)
+                self.queue.complete(job['id'])
+            except Exception as e:
+                logger.exception("Fallo procesando trabajo %s", job['id'])
+                self.queue.fail(job['id'], str(e))
+                self._fail_generation(job['generation_id'], str(e))
+
+    def _fail_generation(self, generation_id: int, error: str):
+        """
+        Marca como fallida una generación cuyo trabajo falló y devuelve su cupo.
+
+        Las que ya esperan a Bria (con fibo_generation_id) se dejan al poller.
+        """
+        from app.models.project import Generation
+        from app.models.user import User
+
+        with self.app.app_context():
+            try:
+                generation = Generation.query.get(generation_id)
+                if generation is None or generation.status not in ('pending', 'generating'):
+                    return
+                if generation.fibo_generation_id:
+                    return
+
+                generation.status = 'failed'
+                generation.error_message = error
+                user = User.query.get(generation.user_id)
+                if user:
+                    user.refund_generations(1)
+                timed_commit(db.session)
+            except Exception:
+                db.session.rollback()
+                logger.exception("No se pudo marcar como fallida la generación %s", generation_id)
+            finally:
+                db.session.remove()
+
+    def reconcile_orphans(self) -> int:
+        """
+        Reencola generaciones 'pending' que no tienen trabajo en la cola
+        (por ejemplo, si la cola vivía en memoria y el proceso se reinició).
+
+        Solo se consideran las creadas hace más de `orphan_grace` segundos,
+        para no duplicar las que un request está por encolar. Con ':memory:'
+        cada proceso tiene su propia cola y no puede ver las de los demás,
+        así que no se reconcilia.
+
+        Returns:
+            int: Número de generaciones reencoladas o marcadas como fallidas
+        """
+        from app.models.project import Generation
+        from app.models.user import User
+
+        if self.queue.path == ':memory:':
+            return 0
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.orphan_grace)
+        active = self.queue.active_generation_ids()
+        reconciled = 0
+
+        with self.app.app_context():
+            try:
+                orphans = Generation.query.filter(
+                    Generation.status == 'pending',
+                    Generation.created_at < cutoff
+                ).all()
+
+                for generation in orphans:
+                    if generation.id in active:
+                        continue
+                    reconciled += 1
+
+                    parameters = generation.get_parameters()
+                    if parameters:
+                        self.queue.put(generation.id, ScenePayload(parameters))
+                        continue
+
+                    generation.status = 'failed'
+                    generation.error_message = "Trabajo de generación perdido antes de procesarse"
+                    user = User.query.get(generation.user_id)
+                    if user:
+                        user.refund_generations(1)
+
+                timed_commit(db.session)
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+        if reconciled:
+            logger.warning("Se reconciliaron %d generaciones pendientes sin trabajo en cola", reconciled)
+        return reconciled
+
+    def _process(self, job: Dict[str, Any]):
+        """Ejecuta una generación y actualiza su registro"""
+        from app.models.project import Generation
+        from app.models.user import User
+
+        with self.app.app_context():
+            try:
+                generation = Generation.query.get(job['generation_id'])
+                if generation is None:
+                    return
+
+                generation.status = 'generating'
+                timed_commit(db.session)
+
+                start_time = time.time()
+                try:
+                    result = self.fibo_service.generate_image(job['payload'])
+                except Exception as e:
+                    result = {"error": str(e)}
+                generation_time = time.time() - start_time
+
+                generation.generation_time = generation_time
+                user = User.query.get(generation.user_id)
+
+                if 'error' in result:
+                    generation.status = 'failed'
+                    generation.error_message = result['error']
+                    if user:
+                        user.refund_generations()
+                    timed_commit(db.session)
+                    return
+                
+                # Bria en modo asíncrono: el poller termina la generación
+                if result.get('pending'):
+                    generation.fibo_generation_id = result.get('id')
+                    timed_commit(db.session)
+                    get_result_poller(self.app, self.fibo_service).track(
+                        generation.id, generation.fibo_generation_id
+                    )
+                    return
+
+                generation.status = 'completed'
+                generation.image_url = result.get('image_url')
+                generation.fibo_generation_id = result.get('id')
+                generation.completed_at = datetime.utcnow()
+
+                # El cupo se reservó al encolar: solo se suma al total
+                if user:
+                    user.confirm_generations()
+
+                timed_commit(db.session)
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+
+def get_generation_queue(app, fibo_service):
+    """
+    Obtiene (o crea) la cola y el pool de workers de la aplicación.
+
+    Se inicializa de forma perezosa en el primer encolado para no levantar
+    threads en procesos que nunca usan el modo asíncrono (migraciones, CLI).
+
+    Returns:
+        tuple: (SQLiteJobQueue, GenerationWorkerPool)
+    """
+    state = app.extensions.get('generation_queue')
+    if state is None:
+        with _init_lock:
+            state = app.extensions.get('generation_queue')
+            if state is None:
+                queue = SQLiteJobQueue(app.config.get('GENERATION_QUEUE_PATH', './generation_queue.sqlite3'))
+                pool = GenerationWorkerPool(
+                    app,
+                    queue,
+                    fibo_service,
+                    num_workers=app.config.get('GENERATION_QUEUE_WORKERS', 2),
+                    poll_interval=app.config.get('GENERATION_QUEUE_POLL_INTERVAL', 0.5)
+                )
+                state = app.extensions['generation_queue'] = (queue, pool)
+
+    queue, pool = state
+    pool.start()
+    return queue, pool
@@ -0,0 +1,187 @@
+"""
+Segmentación de trayectorias de cámara en planos.
+
+Los keyframes consecutivos de una trayectoria casi siempre caen en la misma
+combinación (angle, shot_type, lighting). Este módulo agrupa la trayectoria
+traducida en planos (run-length encoding) y genera una Scene por plano, en
+lugar de una generación por keyframe.
+
+Para que el jitter de la cámara alrededor de un umbral no haga saltar la
+categoría en cada keyframe, cada canal usa histéresis: la categoría actual
+se mantiene mientras la métrica siga dentro de su banda ensanchada por un
+margen, y solo cambia cuando la métrica sale claramente de ella.
+"""
+from types import MappingProxyType
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.models.camera import CameraSettings
+from app.models.lighting import LightingSetup
+from app.models.scene import Scene
+from app.services.translator import (
+    _as_points, camera_distances, camera_heights, light_elevations,
+    map_camera_angles, map_lightings, map_shot_sizes
+)
+
+INF = float('inf')
+
+# Bandas (categoría, mínimo, máximo) de las reglas de translator.py.
+# Una categoría puede tener varias bandas (neutral en lighting).
+ANGLE_BANDS = (
+    ("low_angle", -INF, -1.0),
+    ("eye_level", -1.0, 1.0),
+    ("high_angle", 1.0, 3.0),
+    ("birds_eye", 3.0, INF),
+)
+
+SHOT_BANDS = (
+    ("close_up", 0.0, 4.0),
+    ("medium_shot", 4.0, 8.0),
+    ("long_shot", 8.0, INF),
+)
+
+LIGHTING_BANDS = (
+    ("flat_lighting", -INF, 20.0),
+    ("neutral", 20.0, 35.0),
+    ("studio_lighting", 35.0, 55.0),
+    ("neutral", 55.0, 60.0),
+    ("dramatic_lighting", 60.0, INF),
+)
+
+# Categoría de luz del traductor -> preset de LightingSetup
+LIGHTING_PRESETS = MappingProxyType({
+    "studio_lighting": "three_point",
+    "flat_lighting": "high_key",
+    "dramatic_lighting": "dramatic",
+    "neutral": "natural",
+})
+
+
+def _within(category: str, value: float, bands: Sequence[Tuple[str, float, float]],
+            margin: float) -> bool:
+    """La métrica sigue dentro de alguna banda de `category` ensanchada por `margin`"""
+    return any(
+        lo - margin <= value <= hi + margin
+        for name, lo, hi in bands if name == category
+    )
+
+
+def apply_hysteresis(values: Sequence[float], raw: Sequence[str],
+                     bands: Sequence[Tuple[str, float, float]], margin: float) -> List[str]:
+    """
+    Suaviza una secuencia de categorías.
+
+    Args:
+        values: Métrica por keyframe (altura, distancia, elevación)
+        raw: Categoría sin suavizar por keyframe (reglas del traductor)
+        bands: Bandas de cada categoría
+        margin: Cuánto puede salirse la métrica de la banda actual sin cambiar
+
+    Returns:
+        list[str]: Categoría suavizada por keyframe
+    """
+    smoothed = []
+    current = None
+    for value, category in zip(values, raw):
+        if current is not None and category != current and _within(current, value, bands, margin):
+            smoothed.append(current)
+        else:
+            current = category
+            smoothed.append(category)
+    return smoothed
+
+
+def segment_camera_path(positions, light_positions=(0, 3, 3), fovs=50,
+                        angle_margin: float = 0.25, shot_margin: float = 0.5,
+                        lighting_margin: float = 3.0) -> List[Dict[str, Any]]:
+    """
+    Agrupa una trayectoria en planos con la misma (angle, shot_type, lighting).
+
+    Args:
+        positions: N×3 posiciones de cámara
+        light_positions: N×3, o un solo [x, y, z]
+        fovs: N valores, o uno solo
+        angle_margin: Histéresis sobre la altura (unidades de escena)
+        shot_margin: Histéresis sobre la distancia (unidades de escena)
+        lighting_margin: Histéresis sobre la elevación de la luz (grados)
+
+    Returns:
+        list[dict]: Un dict por plano con start, end (exclusivo), keyframes,
+        angle, shot_type, lighting y fov (promedio del plano)
+    """
+    positions = _as_points(positions, "positions")
+    count = len(positions)
+
+    lights = _as_points(light_positions, "light_positions")
+    if len(lights) not in (1, count):
+        raise ValueError("light_positions debe tener un punto o uno por keyframe")
+    lights = np.broadcast_to(lights, (count, 3))
+
+    fovs = np.broadcast_to(np.asarray(fovs, dtype=float), (count,))
+
+    angles = apply_hysteresis(camera_heights(positions).tolist(),
+                              map_camera_angles(positions).tolist(), ANGLE_BANDS, angle_margin)
+    shots = apply_hysteresis(camera_distances(positions).tolist(),
+                             map_shot_sizes(positions).tolist(), SHOT_BANDS, shot_margin)
+    lightings = apply_hysteresis(light_elevations(lights).tolist(),
+                                 map_lightings(lights).tolist(), LIGHTING_BANDS, lighting_margin)
+
+    segments = []
+    start = 0
+    for index in range(1, count + 1):
+        if index < count and (angles[index], shots[index], lightings[index]) == \
+                (angles[start], shots[start], lightings[start]):
+            continue
+        segments.append({
+            "start": start,
+            "end": index,
+            "keyframes": index - start,
+            "angle": angles[start],
+            "shot_type": shots[start],
+            "lighting": lightings[start],
+            "fov": float(fovs[start:index].mean())
+        })
+        start = index
+
+    return segments
+
+
+def segment_to_scene_data(segment: Dict[str, Any], prompt: str) -> Dict[str, Any]:
+    """
+    Datos de escena de un plano, con el formato de /generation/sequence.
+
+    Returns:
+        dict: {"prompt", "camera": {angle, shot_type, fov}, "lighting": {preset}}
+    """
+    return {
+        "prompt": prompt,
+        "camera": {
+            "angle": segment["angle"],
+            "shot_type": segment["shot_type"],
+            "fov": segment["fov"]
+        },
+        "lighting": {"preset": LIGHTING_PRESETS[segment["lighting"]]}
+    }
+
+
+def segments_to_scenes(segments: List[Dict[str, Any]], prompt: str, **scene_kwargs) -> List[Scene]:
+    """
+    Una Scene por plano, numeradas en orden.
+
+    Args:
+        segments: Resultado de segment_camera_path
+        prompt: Prompt común a todos los planos
+        **scene_kwargs: Otros campos de Scene (style, negative_prompt, ...)
+    """
+    scenes = []
+    for i, segment in enumerate(segments):
+        scene_data = segment_to_scene_data(segment, prompt)
+        scenes.append(Scene(
+            prompt=prompt,
+            camera=CameraSettings(**scene_data["camera"]),
+            lighting=LightingSetup(**scene_data["lighting"]),
+            scene_number=i + 1,
+            **scene_kwargs
+        ))
+    return scenes
@@ -0,0 +1,63 @@
+"""
+Lease entre procesos retenido mientras viva el proceso.
+
+Sirve para tareas que deben correr en un solo worker de gunicorn (por
+ejemplo, retomar generaciones pendientes al arrancar). Se apoya en flock
+sobre un lock-file: si el proceso que lo tiene muere, el sistema operativo
+lo libera y el siguiente que lo pida lo obtiene.
+"""
+import os
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lease entre procesos
+    fcntl = None
+
+
+class ProcessLease:
+    """Lease exclusivo sobre un lock-file, tomado sin esperar"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def try_acquire(self) -> bool:
+        """
+        Toma el lease si está libre y lo retiene hasta release().
+
+        Returns:
+            bool: True si este proceso tiene el lease (también si ya lo tenía)
+        """
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            return True
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        """Suelta el lease (el lock-file se conserva para el próximo dueño)"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def build_process_lease(path: Optional[str]) -> Optional[ProcessLease]:
+    """ProcessLease para `path`, o None si no está configurado"""
+    return ProcessLease(path) if path else None
@@ -0,0 +1,162 @@
+"""
+Compilación de prompts cinematográficos para Bria.
+
+Bria no tiene parámetros de cámara/luz, así que se describen en el texto del
+prompt. Los vocabularios son tablas inmutables a nivel de módulo que cubren
+todas las opciones documentadas en CameraSettings, LightingSetup y Scene, y
+el resultado se memoiza por combinación de campos.
+"""
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict
+
+# ============ CÁMARA ============
+SHOT_DESCRIPTIONS = MappingProxyType({
+    "extreme_close_up": "extreme close-up shot",
+    "close_up": "close-up shot",
+    "medium_close_up": "medium close-up shot",
+    "medium_shot": "medium shot",
+    "medium_full_shot": "medium full shot",
+    "full_shot": "full body shot",
+    "wide_shot": "wide shot",
+    "long_shot": "long shot",  # Emitido por el traductor 3D
+    "extreme_wide_shot": "extreme wide angle shot",
+})
+
+# eye_level es el ángulo neutro: no se describe
+ANGLE_DESCRIPTIONS = MappingProxyType({
+    "eye_level": "",
+    "high_angle": "high angle view",
+    "low_angle": "low angle view",
+    "birds_eye": "aerial bird's eye view",
+    "dutch_angle": "dutch angle, tilted camera",
+    "worms_eye": "worm's eye view from the ground",
+})
+
+# ============ ILUMINACIÓN ============
+TIME_DESCRIPTIONS = MappingProxyType({
+    "dawn": "dawn lighting",
+    "golden_hour": "golden hour lighting",
+    "morning": "clear morning light",
+    "noon": "harsh midday sunlight",
+    "afternoon": "afternoon daylight",
+    "blue_hour": "blue hour lighting",
+    "dusk": "dusk lighting",
+    "night": "night scene",
+    "overcast": "soft overcast light",
+})
+
+# neutral es la gradación por defecto: no se describe
+GRADING_DESCRIPTIONS = MappingProxyType({
+    "neutral": "",
+    "warm": "warm tones",
+    "cool": "cool tones",
+    "cinematic": "cinematic color grading",
+    "vintage": "vintage film look",
+    "bleach_bypass": "bleach bypass look",
+    "cross_process": "cross-processed colors",
+    "sepia": "sepia tones",
+    "black_white": "black and white",
+    "noir": "high contrast film noir",
+    "cyberpunk": "cyberpunk neon colors",
+    "matrix": "green matrix tint",
+    "blade_runner": "blade runner orange and teal palette",
+})
+
+# ============ ESCENA ============
+MOOD_DESCRIPTIONS = MappingProxyType({
+    "epic": "epic atmosphere",
+    "intimate": "intimate atmosphere",
+    "mysterious": "mysterious atmosphere",
+    "peaceful": "peaceful atmosphere",
+    "tense": "tense atmosphere",
+    "joyful": "joyful atmosphere",
+    "melancholic": "melancholic atmosphere",
+    "dramatic": "dramatic atmosphere",
+    "romantic": "romantic atmosphere",
+    "horrific": "horror atmosphere",
+})
+
+PALETTE_DESCRIPTIONS = MappingProxyType({
+    "vibrant": "vibrant saturated colors",
+    "muted": "muted desaturated colors",
+    "pastel": "pastel colors",
+    "monochrome": "monochrome palette",
+    "warm": "warm color palette",
+    "cool": "cool color palette",
+    "earth_tones": "earth tones",
+    "neon": "neon colors",
+    "black_white": "black and white palette",
+})
+
+# realistic es el estilo base de Bria: no se describe
+STYLE_DESCRIPTIONS = MappingProxyType({
+    "realistic": "",
+    "cinematic": "cinematic style",
+    "artistic": "artistic style",
+    "anime": "anime style",
+    "cartoon": "cartoon style",
+    "sketch": "sketch style",
+    "oil_painting": "oil painting style",
+    "watercolor": "watercolor style",
+    "comic_book": "comic book style",
+    "concept_art": "concept art style",
+})
+
+
+def _as_key(value: Any) -> str:
+    """Normaliza un campo del payload a una clave hashable"""
+    return value if isinstance(value, str) else ""
+
+
+@lru_cache(maxsize=4096)
+def compile_prompt(base_prompt: str, shot_type: str = "", angle: str = "",
+                   time_of_day: str = "", color_grading: str = "", mood: str = "",
+                   color_palette: str = "", style: str = "") -> str:
+    """
+    Construye el prompt mejorado a partir de los campos cinematográficos.
+
+    Returns:
+        str: Prompt con las descripciones agregadas
+    """
+    enhancements = [
+        SHOT_DESCRIPTIONS.get(shot_type, ""),
+        ANGLE_DESCRIPTIONS.get(angle, ""),
+        TIME_DESCRIPTIONS.get(time_of_day, ""),
+        GRADING_DESCRIPTIONS.get(color_grading, ""),
+        MOOD_DESCRIPTIONS.get(mood, ""),
+        PALETTE_DESCRIPTIONS.get(color_palette, ""),
+        # Estilos fuera del vocabulario se describen tal cual
+        STYLE_DESCRIPTIONS.get(style, f"{style} style" if style else ""),
+    ]
+    enhancements = [e for e in enhancements if e]
+
+    if enhancements:
+        return f"{base_prompt}, {', '.join(enhancements)}"
+    return base_prompt
+
+
+def enhance_prompt(base_prompt: str, scene_payload: Dict[str, Any]) -> str:
+    """
+    Mejora el prompt con la información de cámara, luz y estilo del payload.
+
+    Args:
+        base_prompt: Prompt original
+        scene_payload: Payload de Scene.to_fibo_payload()
+
+    Returns:
+        str: Prompt mejorado
+    """
+    camera = scene_payload.get("camera") or {}
+    lighting = scene_payload.get("lighting") or {}
+
+    return compile_prompt(
+        _as_key(base_prompt),
+        _as_key(camera.get("shot_type")),
+        _as_key(camera.get("angle")),
+        _as_key(lighting.get("time_of_day")),
+        _as_key(lighting.get("color_grading")),
+        _as_key(scene_payload.get("mood")),
+        _as_key(scene_payload.get("color_palette")),
+        _as_key(scene_payload.get("style")),
+    )
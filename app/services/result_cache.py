@@ -0,0 +1,187 @@
+"""
+Caché de resultados de FIBO direccionada por contenido.
+
+Con el mismo prompt, seed, dimensiones y cámara/iluminación, FIBO devuelve la
+misma imagen, así que un payload idéntico (con seed) puede reutilizar el
+resultado anterior sin otra llamada pagada a Bria.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+from app.models.payload import as_scene_payload
+
+def canonical_payload_hash(scene_payload: Dict[str, Any]) -> str:
+    """
+    Hash canónico de un payload de Scene.to_fibo_payload().
+
+    Las claves se ordenan y se excluyen los metadatos de organización, así
+    que el mismo frame reenviado en otra posición del storyboard produce
+    el mismo hash. Para un ScenePayload se reutiliza el hash ya calculado.
+
+    Returns:
+        str: SHA-256 hexadecimal
+    """
+    return as_scene_payload(scene_payload).content_hash
+
+
+class MemoryLRUBackend:
+    """LRU en memoria con expiración por TTL (por proceso)"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 21600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Caché en disco sobre SQLite, compartible entre procesos"""
+
+    def __init__(self, path: str = './fibo_result_cache.sqlite3', ttl: float = 21600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fibo_results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM fibo_results WHERE key = ?",
+                (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM fibo_results WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fibo_results (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl)
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM fibo_results").fetchone()[0]
+
+
+class ResultCache:
+    """
+    Caché de resultados con contadores de hits/misses.
+
+    Solo participan payloads con seed: sin seed, Bria elige uno aleatorio
+    y dos llamadas idénticas no producen la misma imagen.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_cacheable(scene_payload: Dict[str, Any]) -> bool:
+        return scene_payload.get('seed') is not None
+
+    def get(self, scene_payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Busca un resultado previo para el payload"""
+        if not self.is_cacheable(scene_payload):
+            return None
+
+        result = self.backend.get(canonical_payload_hash(scene_payload))
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return result
+
+    def set(self, scene_payload: Dict[str, Any], result: Dict[str, Any]):
+        """Guarda un resultado exitoso (los pendientes de polling no tienen imagen aún)"""
+        if not self.is_cacheable(scene_payload) or 'error' in result or not result.get('image_url'):
+            return
+        self.backend.set(canonical_payload_hash(scene_payload), result)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+def build_result_cache(backend: Optional[str], path: Optional[str] = None,
+                       ttl: float = 21600, max_entries: int = 1024) -> Optional[ResultCache]:
+    """
+    Crea la caché según configuración.
+
+    Args:
+        backend: 'memory', 'sqlite' o None (desactivada)
+        path: Ruta del archivo SQLite
+        ttl: Segundos de vida de cada entrada
+        max_entries: Tamaño máximo del LRU en memoria
+
+    Returns:
+        ResultCache o None
+    """
+    if not backend:
+        return None
+
+    if backend == 'memory':
+        return ResultCache(MemoryLRUBackend(max_entries=max_entries, ttl=ttl))
+
+    if backend == 'sqlite':
+        return ResultCache(SQLiteBackend(path or './fibo_result_cache.sqlite3', ttl=ttl))
+
+    raise ValueError(f"Backend de caché desconocido: {backend}")
@@ -0,0 +1,267 @@
+"""
+Poller de resultados pendientes de Bria.
+
+Con FIBO_SYNC_MODE = False, Bria responde con un request_id en lugar de la
+imagen. Este poller sigue todas las generaciones pendientes desde un único
+thread en segundo plano, consulta cada una con backoff adaptativo y escribe
+el resultado en su registro Generation.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.models import db
+from app.services.process_lease import ProcessLease, build_process_lease
+from app.utils.metrics import timed_commit
+
+logger = logging.getLogger(__name__)
+
+
+class _Tracked:
+    """Estado de polling de una generación"""
+
+    __slots__ = ('generation_id', 'fibo_generation_id', 'interval', 'started_at')
+
+    def __init__(self, generation_id: int, fibo_generation_id: str, interval: float):
+        self.generation_id = generation_id
+        self.fibo_generation_id = fibo_generation_id
+        self.interval = interval
+        self.started_at = time.time()
+
+
+class ResultPoller:
+    """
+    Sigue muchos fibo_generation_id a la vez desde un solo thread.
+
+    Los pendientes se guardan en un heap ordenado por próxima consulta, así
+    que cada vuelta solo toca los que ya vencieron. El intervalo de cada uno
+    crece por `backoff` hasta `max_interval`: los renders largos se consultan
+    cada vez menos.
+
+    Con `lease` (un ProcessLease) solo un proceso de gunicorn retoma las
+    generaciones pendientes al arrancar.
+    """
+
+    def __init__(self, app, fibo_service, initial_interval: float = 1.0,
+                 max_interval: float = 15.0, backoff: float = 1.5, timeout: float = 600.0,
+                 lease: Optional[ProcessLease] = None):
+        self.app = app
+        self.fibo_service = fibo_service
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.lease = lease
+        self._heap: List[Tuple[float, int, _Tracked]] = []
+        self._tracked: Dict[int, _Tracked] = {}
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        """Arranca el thread de polling (idempotente; lo reinicia si murió)"""
+        with self._cond:
+            if self._thread is not None:
+                if self._thread.is_alive():
+                    return
+                logger.error("El thread del poller de Bria terminó; se reinicia")
+                # Lo que el thread había sacado del heap se vuelve a programar
+                self._heap = []
+                now = time.time()
+                for tracked in self._tracked.values():
+                    self._schedule(tracked, now)
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='fibo-result-poller', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if self.lease is not None:
+            self.lease.release()
+
+    def track(self, generation_id: int, fibo_generation_id: str):
+        """Registra una generación pendiente para consultarla"""
+        with self._cond:
+            if generation_id in self._tracked:
+                return
+            tracked = _Tracked(generation_id, fibo_generation_id, self.initial_interval)
+            self._tracked[generation_id] = tracked
+            self._schedule(tracked, time.time() + tracked.interval)
+            self._cond.notify()
+            restart = self._thread is not None and not self._thread.is_alive()
+
+        if restart:
+            self.start()
+
+    def recover(self) -> int:
+        """
+        Retoma generaciones que quedaron 'generating' con ID de Bria
+        (por ejemplo, tras reiniciar el proceso).
+
+        Con lease, solo el proceso que lo obtiene las retoma y lo retiene
+        mientras viva; si muere, el sistema operativo lo libera y el próximo
+        poller que arranque las retoma. Una generación consultada por dos
+        procesos se escribe una sola vez (_write_results solo toca las que
+        siguen 'generating').
+
+        Returns:
+            int: Número de generaciones retomadas
+        """
+        from app.models.project import Generation
+
+        if self.lease is not None and not self.lease.try_acquire():
+            return 0
+
+        with self.app.app_context():
+            try:
+                rows = Generation.query.with_entities(
+                    Generation.id, Generation.fibo_generation_id
+                ).filter(
+                    Generation.status == 'generating',
+                    Generation.fibo_generation_id.isnot(None)
+                ).all()
+            finally:
+                db.session.remove()
+
+        for generation_id, fibo_generation_id in rows:
+            self.track(generation_id, fibo_generation_id)
+        return len(rows)
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._tracked)
+
+    def _schedule(self, tracked: _Tracked, due_at: float):
+        heapq.heappush(self._heap, (due_at, next(self._counter), tracked))
+
+    def _take_due(self) -> List[_Tracked]:
+        """Espera hasta que haya consultas vencidas y las saca del heap"""
+        with self._cond:
+            while not self._stopping:
+                now = time.time()
+                if self._heap and self._heap[0][0] <= now:
+                    due = []
+                    while self._heap and self._heap[0][0] <= now:
+                        due.append(heapq.heappop(self._heap)[2])
+                    return due
+
+                wait = self._heap[0][0] - now if self._heap else None
+                self._cond.wait(wait)
+            return []
+
+    def _run(self):
+        while True:
+            due = self._take_due()
+            if not due:
+                return
+
+            finished = []
+            for tracked in due:
+                try:
+                    result = self.fibo_service.get_result_by_id(tracked.fibo_generation_id)
+                except Exception as e:
+                    result = {"error": str(e), "transient": True}
+
+                if self._is_finished(tracked, result):
+                    finished.append((tracked, result))
+                else:
+                    tracked.interval = min(tracked.interval * self.backoff, self.max_interval)
+                    with self._cond:
+                        self._schedule(tracked, time.time() + tracked.interval)
+
+            if finished:
+                try:
+                    self._write_results(finished)
+                except Exception:
+                    # Siguen en seguimiento: se vuelven a consultar y escribir
+                    logger.exception("No se pudieron guardar %d resultados de Bria", len(finished))
+                    with self._cond:
+                        for tracked, _ in finished:
+                            tracked.interval = min(tracked.interval * self.backoff, self.max_interval)
+                            self._schedule(tracked, time.time() + tracked.interval)
+                else:
+                    with self._cond:
+                        for tracked, _ in finished:
+                            self._tracked.pop(tracked.generation_id, None)
+
+    def _is_finished(self, tracked: _Tracked, result: Dict[str, Any]) -> bool:
+        if result.get('status') in ('completed', 'failed'):
+            return True
+
+        if time.time() - tracked.started_at > self.timeout:
+            result['status'] = 'failed'
+            result['error'] = result.get('error') or "Tiempo de espera agotado consultando Bria"
+            return True
+
+        # Errores de red o estados intermedios: seguir consultando
+        return False
+
+    def _write_results(self, finished: List[Tuple[_Tracked, Dict[str, Any]]]):
+        """Escribe todos los resultados de la vuelta en un solo commit"""
+        from app.models.project import Generation
+        from app.models.user import User
+
+        with self.app.app_context():
+            try:
+                for tracked, result in finished:
+                    generation = Generation.query.get(tracked.generation_id)
+                    if generation is None or generation.status != 'generating':
+                        continue
+
+                    generation.generation_time = time.time() - tracked.started_at
+                    user = User.query.get(generation.user_id)
+
+                    if result['status'] == 'failed':
+                        generation.status = 'failed'
+                        generation.error_message = result.get('error')
+                        # Devolver el cupo reservado al pedir la generación
+                        if user:
+                            user.refund_generations()
+                        continue
+
+                    generation.status = 'completed'
+                    generation.image_url = result.get('image_url')
+                    generation.completed_at = datetime.utcnow()
+                    if result.get('seed') and not generation.seed:
+                        generation.seed = result['seed']
+
+                    if user:
+                        user.confirm_generations()
+
+                    if self.fibo_service.result_cache:
+                        self.fibo_service.result_cache.set(generation.get_parameters(), result)
+
+                timed_commit(db.session)
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+
+def get_result_poller(app, fibo_service) -> ResultPoller:
+    """Obtiene (o crea y arranca) el poller de la aplicación"""
+    poller = app.extensions.get('result_poller')
+    if poller is None:
+        poller = app.extensions.setdefault('result_poller', ResultPoller(
+            app,
+            fibo_service,
+            initial_interval=app.config.get('FIBO_POLL_INITIAL_INTERVAL', 1.0),
+            max_interval=app.config.get('FIBO_POLL_MAX_INTERVAL', 15.0),
+            backoff=app.config.get('FIBO_POLL_BACKOFF', 1.5),
+            timeout=app.config.get('FIBO_POLL_TIMEOUT', 600),
+            lease=build_process_lease(app.config.get('FIBO_POLL_LEASE_PATH'))
+        ))
+        poller.recover()
+    poller.start()
+    return poller
@@ -0,0 +1,151 @@
+"""
+Coalescencia de generaciones duplicadas en vuelo (single-flight).
+
+Si dos requests con el mismo payload llegan mientras el primero sigue
+esperando a Bria (doble click, reintentos del frontend), el segundo espera
+la misma llamada en lugar de hacer otra.
+
+Dentro de un proceso se coordina con threading; opcionalmente, entre
+procesos, con un lock-file por clave (flock) en un directorio compartido.
+El resultado del líder viaja en el lock-file, así que no hace falta una
+caché compartida (FIBO_RESULT_CACHE='sqlite') para evitar la segunda
+llamada a Bria.
+"""
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lease entre procesos
+    fcntl = None
+
+
+class _Call:
+    """Llamada en curso compartida por varios threads"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class FileLease:
+    """
+    Lease exclusivo por clave usando un lock-file, que además transporta el
+    resultado del líder a los procesos que esperaban la misma clave.
+
+    El líder escribe el resultado en el lock-file y lo borra antes de soltar
+    el lock: los que ya lo tenían abierto leen el resultado desde su propio
+    descriptor, y el directorio no acumula un archivo por payload. El lock
+    lo libera el sistema operativo si el proceso muere, así que no quedan
+    leases huérfanos.
+    """
+
+    def __init__(self, lock_dir: str):
+        self.lock_dir = lock_dir
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key: str, fn: Callable[[], Any],
+           recheck: Optional[Callable[[], Any]] = None) -> Tuple[Any, bool]:
+        """
+        Ejecuta `fn` como líder o toma el resultado del líder de otro proceso.
+
+        Returns:
+            tuple: (resultado, compartido)
+        """
+        path = os.path.join(self.lock_dir, f'{key}.lock')
+        while True:
+            with open(path, 'a+') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    if not self._is_current(lock_file, path):
+                        # El líder terminó y borró el archivo: si dejó resultado
+                        # se usa; si falló, se compite por el archivo nuevo
+                        lock_file.seek(0)
+                        content = lock_file.read()
+                        if content:
+                            return json.loads(content), True
+                        continue
+
+                    # Restos de un líder que murió antes de borrar el archivo
+                    lock_file.truncate(0)
+                    try:
+                        if recheck is not None:
+                            result = recheck()
+                            if result is not None:
+                                return result, True
+                        result = fn()
+                        try:
+                            lock_file.write(json.dumps(result))
+                            lock_file.flush()
+                        except (TypeError, ValueError):
+                            pass  # Sin resultado en el archivo, los demás compiten de nuevo
+                        return result, False
+                    finally:
+                        os.unlink(path)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _is_current(lock_file, path: str) -> bool:
+        """El descriptor abierto sigue siendo el archivo de `path`"""
+        try:
+            return os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+
+class SingleFlight:
+    """Ejecuta una sola vez las llamadas concurrentes con la misma clave"""
+
+    def __init__(self, lock_dir: Optional[str] = None):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.lease = FileLease(lock_dir) if lock_dir and fcntl else None
+
+    def do(self, key: str, fn: Callable[[], Any],
+           recheck: Optional[Callable[[], Any]] = None) -> Tuple[Any, bool]:
+        """
+        Ejecuta `fn` o espera a la ejecución en curso con la misma clave.
+
+        Args:
+            key: Clave de coalescencia (hash canónico del payload)
+            fn: Llamada real
+            recheck: Consulta opcional (ej: caché compartida) que se evalúa
+                tras obtener el lease entre procesos; si devuelve algo, otro
+                proceso ya hizo la llamada y no hace falta repetirla
+
+        Returns:
+            tuple: (resultado, compartido) donde compartido indica que el
+                resultado vino de otra llamada
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result, shared = self._run(key, fn, recheck)
+            return call.result, shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run(self, key, fn, recheck):
+        if self.lease is None:
+            return fn(), False
+        return self.lease.do(key, fn, recheck)
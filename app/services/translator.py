@@ -6,10 +6,13 @@
 #  - T1 map_camera_angle
 #  - T2 map_shot_size
 #  - T3 map_lighting
+#  - Variantes batch (NumPy) para trayectorias de cámara
 # ======================================================
 
 import math
 
+import numpy as np
+
 
 # ======================
 # T1: Camera angle
@@ -126,3 +129,128 @@ def translate_camera_data(camera_state, light_position=[0, 3, 3]):
         "fov": camera_state.get("fov", 50)
     }
 
+
+# ======================
+# Batch: trayectorias de cámara
+# ======================
+# Mismas reglas que las funciones escalares, evaluadas sobre arrays N×3 en
+# una sola pasada. np.select toma la primera condición verdadera, igual que
+# la cadena if/elif.
+
+def _as_points(points, name):
+    """Convierte a array float N×3 (un solo punto [x, y, z] también vale)"""
+    array = np.asarray(points, dtype=float)
+    if array.ndim == 1:
+        array = array.reshape(1, -1)
+    if array.ndim != 2 or array.shape[1] != 3:
+        raise ValueError(f"{name} debe ser una lista de puntos [x, y, z]")
+    return array
+
+
+def camera_heights(positions, target=(0, 0, 0)):
+    """Altura de la cámara respecto al objetivo (métrica de map_camera_angle)"""
+    return _as_points(positions, "positions")[:, 1] - target[1]
+
+
+def camera_distances(positions, target=(0, 0, 0)):
+    """Distancia cámara-objetivo (métrica de map_shot_size)"""
+    delta = _as_points(positions, "positions") - np.asarray(target, dtype=float)
+    return np.sqrt((delta * delta).sum(axis=1))
+
+
+def light_elevations(light_positions):
+    """Ángulo vertical de la luz en grados (métrica de map_lighting)"""
+    lights = _as_points(light_positions, "light_positions")
+    x, y, z = lights[:, 0], lights[:, 1], lights[:, 2]
+    return np.degrees(np.arctan2(y, np.sqrt(x * x + z * z)))
+
+
+def map_camera_angles(positions, target=(0, 0, 0)):
+    """
+    Versión batch de map_camera_angle.
+
+    positions: array N×3
+
+    Returns:
+        np.ndarray de N strings
+    """
+    diff = camera_heights(positions, target)
+
+    return np.select(
+        [diff > 3.0, diff > 1.0, diff < -1.0],
+        ["birds_eye", "high_angle", "low_angle"],
+        default="eye_level"
+    )
+
+
+def map_shot_sizes(positions, target=(0, 0, 0)):
+    """
+    Versión batch de map_shot_size.
+
+    positions: array N×3
+
+    Returns:
+        np.ndarray de N strings
+    """
+    dist = camera_distances(positions, target)
+
+    return np.select(
+        [dist < 4, dist < 8],
+        ["close_up", "medium_shot"],
+        default="long_shot"
+    )
+
+
+def map_lightings(light_positions):
+    """
+    Versión batch de map_lighting.
+
+    light_positions: array N×3
+
+    Returns:
+        np.ndarray de N strings
+    """
+    angle = light_elevations(light_positions)
+
+    return np.select(
+        [(angle >= 35) & (angle <= 55), angle < 20, angle > 60],
+        ["studio_lighting", "flat_lighting", "dramatic_lighting"],
+        default="neutral"
+    )
+
+
+def translate_camera_path(positions, light_positions=(0, 3, 3), fovs=50):
+    """
+    Versión batch de translate_camera_data para una trayectoria completa.
+
+    positions:       N×3 posiciones de cámara (keyframes)
+    light_positions: N×3, o un solo [x, y, z] para toda la trayectoria
+    fovs:            N valores, o uno solo
+
+    Returns:
+        list[dict]: Un dict por keyframe con angle, shot_type, lighting y fov
+    """
+    positions = _as_points(positions, "positions")
+    count = len(positions)
+
+    lights = _as_points(light_positions, "light_positions")
+    if len(lights) == 1:
+        # Todas las filas son iguales: se clasifica una vez
+        lightings = np.repeat(map_lightings(lights), count)
+    elif len(lights) == count:
+        lightings = map_lightings(lights)
+    else:
+        raise ValueError("light_positions debe tener un punto o uno por keyframe")
+
+    fovs = np.broadcast_to(np.asarray(fovs), (count,))
+
+    columns = zip(
+        map_camera_angles(positions).tolist(),
+        map_shot_sizes(positions).tolist(),
+        lightings.tolist(),
+        fovs.tolist()
+    )
+    return [
+        {"angle": angle, "shot_type": shot_type, "lighting": lighting, "fov": fov}
+        for angle, shot_type, lighting, fov in columns
+    ]
@@ -0,0 +1,75 @@
+"""
+Caché local del proceso con instantáneas de usuario para autorización.
+
+Los decoradores de permisos (admin, verificado, plan) solo necesitan unos
+pocos campos estables del usuario. Se guardan aquí con un TTL corto para
+no consultar la base en cada request. User.upgrade_plan y
+User.verify_email invalidan la entrada; en otros procesos la entrada
+caduca sola al vencer el TTL.
+
+Los contadores de cuota NO se cachean: cambian en cada generación.
+"""
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Dict, Optional, Tuple
+
+UserSnapshot = namedtuple('UserSnapshot', ['id', 'plan', 'is_verified', 'is_active'])
+
+
+def snapshot_of(user) -> UserSnapshot:
+    """Instantánea inmutable de los campos de autorización de un User"""
+    return UserSnapshot(user.id, user.plan, user.is_verified, user.is_active)
+
+
+class UserCache:
+    """Instantáneas de usuario por ID con expiración"""
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[int, Tuple[float, UserSnapshot]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, loader: Callable[[int], Optional[UserSnapshot]]) -> Optional[UserSnapshot]:
+        """
+        Devuelve la instantánea del usuario, cargándola con `loader` si no
+        está o ya expiró. Los usuarios inexistentes no se cachean.
+        """
+        user_id = int(user_id)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+
+        snapshot = loader(user_id)
+        if snapshot is not None:
+            self.put(snapshot)
+        return snapshot
+
+    def put(self, snapshot: UserSnapshot):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict_expired()
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[snapshot.id] = (time.monotonic() + self.ttl, snapshot)
+
+    def invalidate(self, user_id):
+        """Descarta la instantánea (p. ej. tras cambiar de plan)"""
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for user_id in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[user_id]
+
+
+user_cache = UserCache()
@@ -0,0 +1,129 @@
+"""
+Búsqueda de usuarios por username y nombre.
+
+En Postgres usa pg_trgm: los índices GIN gin_trgm_ops sobre username y
+full_name sirven tanto al ILIKE '%q%' como al operador de similitud `%`
+(que tolera errores de tipeo), y los resultados se ordenan por
+similarity(). En otras bases (SQLite en los tests) se usa ILIKE con un
+puntaje portable: coincidencia exacta > prefijo > contiene.
+
+Con ?cursor= la paginación es por cursor sobre (puntaje, id): no hay
+COUNT(*) ni OFFSET, así que la latencia no crece con el tamaño de la tabla.
+Sin cursor se mantiene la respuesta por página (page/total/pages).
+"""
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import Numeric, case, cast, func, or_, tuple_
+
+from app.models import db
+from app.models.user import User
+from app.utils.pagination import decode_cursor, encode_cursor
+
+# Puntaje de pg_trgm con 6 decimales exactos (similarity() devuelve float4).
+# Los puntajes portables (3, 2, 1, 0.5) ya son exactos como float.
+SCORE_TYPE = Numeric(10, 6)
+
+
+def _escape_like(text: str) -> str:
+    """Escapa los comodines de LIKE para buscar el texto literal"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _trigram_match(query: str):
+    """Filtro y puntaje con pg_trgm"""
+    pattern = f'%{_escape_like(query)}%'
+    condition = or_(
+        User.username.ilike(pattern, escape='\\'),
+        User.full_name.ilike(pattern, escape='\\'),
+        User.username.op('%')(query),
+        User.full_name.op('%')(query)
+    )
+    score = func.greatest(
+        func.similarity(User.username, query),
+        func.coalesce(func.similarity(User.full_name, query), 0)
+    )
+    # similarity() es float4 y el cursor viaja como texto: con un tipo exacto
+    # ORDER BY, la comparación del cursor y el token usan el mismo valor
+    return condition, cast(score, SCORE_TYPE)
+
+
+def _fallback_match(query: str):
+    """Filtro y puntaje portables (sin extensiones)"""
+    escaped = _escape_like(query)
+    contains = f'%{escaped}%'
+    prefix = f'{escaped}%'
+    username = func.lower(User.username)
+
+    condition = or_(
+        User.username.ilike(contains, escape='\\'),
+        User.full_name.ilike(contains, escape='\\')
+    )
+    score = case(
+        (username == query.lower(), 3.0),
+        (User.username.ilike(prefix, escape='\\'), 2.0),
+        (User.username.ilike(contains, escape='\\'), 1.0),
+        else_=0.5
+    )
+    return condition, score
+
+
+def _ranked_query(query: str):
+    """(consulta de (User, puntaje) de usuarios activos que coinciden, expresión de puntaje)"""
+    if db.engine.dialect.name == 'postgresql':
+        condition, score = _trigram_match(query)
+    else:
+        condition, score = _fallback_match(query)
+
+    results = db.session.query(User, score.label('score')).filter(
+        User.is_active.is_(True),
+        condition
+    )
+    return results, score
+
+
+def search_users(query: str, per_page: int = 10,
+                 cursor: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+    """
+    Busca usuarios activos cuyo username o nombre coincida con `query`.
+
+    Args:
+        query: Texto a buscar
+        per_page: Tamaño de página
+        cursor: Token de la página anterior (None o '' para la primera)
+
+    Returns:
+        tuple: (usuarios ordenados por relevancia, token de la siguiente página o None)
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    per_page = max(1, per_page)
+    results, score = _ranked_query(query)
+
+    if cursor:
+        last_score, last_id = decode_cursor(cursor)
+        results = results.filter(tuple_(score, User.id) < tuple_(last_score, last_id))
+
+    rows = results.order_by(score.desc(), User.id.desc()).limit(per_page + 1).all()
+    page = rows[:per_page]
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last_user, last_score = page[-1]
+        next_cursor = encode_cursor(last_score, last_user.id)
+
+    return [user for user, _ in page], next_cursor
+
+
+def search_users_page(query: str, page: int = 1, per_page: int = 10):
+    """
+    Igual que search_users, con paginación por página (OFFSET + COUNT(*)).
+
+    Returns:
+        tuple: (usuarios ordenados por relevancia, Pagination con total y pages)
+    """
+    results, score = _ranked_query(query)
+    pagination = results.order_by(score.desc(), User.id.desc()).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    return [user for user, _ in pagination.items], pagination
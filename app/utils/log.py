@@ -0,0 +1,113 @@
+"""
+Logging estructurado para la aplicación.
+
+- Cada evento es una línea JSON con nombre de evento y campos.
+- Los niveles se configuran por componente (nombre del logger).
+- Los campos grandes (payloads, respuestas de Bria) se truncan y se
+  convierten a texto solo si el evento realmente se emite.
+- La escritura a stdout ocurre en un thread aparte (QueueHandler +
+  QueueListener), fuera del thread del request.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict
+
+_listener = None
+
+
+class Truncated:
+    """Valor que se convierte a texto (truncado) solo al formatear"""
+
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value: Any, limit: int = 500):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        text = self.value if isinstance(self.value, str) else repr(self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}... (+{len(text) - self.limit} chars)"
+
+
+def fields(**kwargs) -> Dict[str, Any]:
+    """
+    Campos estructurados para un evento.
+
+    Usage:
+        logger.debug("bria.request", extra=fields(url=url, payload=Truncated(payload)))
+    """
+    return {'fields': kwargs}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formatea cada registro como una línea JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage()
+        }
+        for key, value in getattr(record, 'fields', {}).items():
+            data[key] = str(value) if isinstance(value, Truncated) else value
+
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler que encola el registro sin formatearlo.
+
+    El prepare() por defecto llama a format() en el thread del request,
+    mete el traceback en `msg` y borra exc_info; así StructuredFormatter no
+    podría emitirlo como campo propio. Aquí todo el formateo queda para el
+    thread del QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(app):
+    """
+    Configura los loggers de la aplicación según app.config.
+
+    Config:
+        LOG_LEVEL: Nivel base del logger 'app'
+        LOG_LEVELS: {'app.services.fibo_service': 'DEBUG', ...} por componente
+        LOG_ASYNC: Si True, la escritura ocurre en un thread aparte
+    """
+    global _listener
+
+    root = logging.getLogger('app')
+    root.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+    for component, level in app.config.get('LOG_LEVELS', {}).items():
+        logging.getLogger(component).setLevel(level)
+
+    # create_app puede llamarse varias veces (tests): un solo juego de handlers
+    if root.handlers:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(StructuredFormatter())
+
+    if app.config.get('LOG_ASYNC', True):
+        log_queue = queue.SimpleQueue()
+        root.addHandler(DeferredQueueHandler(log_queue))
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+    else:
+        root.addHandler(stream_handler)
+
+    root.propagate = False
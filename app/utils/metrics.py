@@ -0,0 +1,104 @@
+"""
+Métricas de latencia por etapa en formato Prometheus.
+
+Usage:
+    with stage_timer('validate'):
+        scene.validate()
+
+El endpoint /metrics expone los histogramas en texto plano (formato de
+exposición 0.0.4 de Prometheus).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Buckets en segundos: desde operaciones en memoria hasta renders de Bria
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+
+class Histogram:
+    """Histograma acumulativo con una serie por combinación de labels"""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # [conteos por bucket (+Inf al final), suma]
+                series = [[0] * (len(self.buckets) + 1), 0.0]
+                self._series[label_values] = series
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram"
+        ]
+
+        with self._lock:
+            snapshot = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+
+        for label_values, (counts, total) in sorted(snapshot.items()):
+            labels = ','.join(f'{n}="{v}"' for n, v in zip(self.label_names, label_values))
+            prefix = f"{labels}," if labels else ""
+
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+
+        return lines
+
+
+GENERATION_STAGE_SECONDS = Histogram(
+    'fibo_generation_stage_seconds',
+    'Latencia de cada etapa del pipeline de generación',
+    label_names=('stage',)
+)
+
+REGISTRY = [GENERATION_STAGE_SECONDS]
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Mide la duración del bloque como una etapa del pipeline de generación"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        GENERATION_STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+
+def timed_commit(session):
+    """Commit de una sesión de SQLAlchemy medido como etapa db_commit"""
+    with stage_timer('db_commit'):
+        session.commit()
+
+
+def render_prometheus() -> str:
+    """Todas las métricas registradas en formato de exposición de Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,97 @@
+"""
+Paginación por cursor (keyset) para listados ordenados por fecha.
+
+En lugar de OFFSET + COUNT(*), cada página continúa desde la última fila
+de la anterior: WHERE (fecha, id) < (cursor) ORDER BY fecha DESC, id DESC.
+Con un índice sobre (filtros..., fecha DESC, id) cualquier página cuesta lo
+mismo que la primera.
+
+Usage:
+    if wants_cursor():
+        items, next_cursor = keyset_paginate(
+            query, Generation.created_at, Generation.id,
+            request.args.get('cursor'), per_page
+        )
+"""
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Tuple, Union
+
+from flask import request
+from sqlalchemy import tuple_
+
+
+def wants_cursor() -> bool:
+    """El cliente pide paginación por cursor (?cursor= o ?cursor=<token>)"""
+    return 'cursor' in request.args
+
+
+def encode_cursor(sort_value: Union[datetime, Decimal, float], row_id: int) -> str:
+    """Token opaco con la posición (fecha o puntaje, id) de la última fila entregada"""
+    if isinstance(sort_value, datetime):
+        position = ['d', sort_value.isoformat(), row_id]
+    elif isinstance(sort_value, Decimal):
+        # Como texto, para que el valor vuelva idéntico
+        position = ['x', str(sort_value), row_id]
+    else:
+        position = ['n', sort_value, row_id]
+    raw = json.dumps(position, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> Tuple[Union[datetime, Decimal, float], int]:
+    """
+    Decodifica un token de encode_cursor.
+
+    Raises:
+        ValueError: Si el token no es válido
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        kind, sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if kind == 'd':
+            return datetime.fromisoformat(sort_value), int(row_id)
+        if kind == 'x':
+            return Decimal(sort_value), int(row_id)
+        return float(sort_value), int(row_id)
+    except Exception:
+        raise ValueError("Cursor de paginación inválido")
+
+
+def keyset_paginate(query, sort_column, id_column, cursor: Optional[str],
+                    per_page: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Devuelve una página en orden (sort_column DESC, id_column DESC).
+
+    Args:
+        query: Query ya filtrada (su ORDER BY se reemplaza)
+        sort_column: Columna de fecha (created_at / updated_at)
+        id_column: Primary key, desempata filas con la misma fecha
+        cursor: Token de la página anterior (None o '' para la primera)
+        per_page: Tamaño de página
+
+    Returns:
+        tuple: (filas, token de la siguiente página o None si no hay más)
+    """
+    per_page = max(1, per_page)
+    query = query.order_by(None).order_by(sort_column.desc(), id_column.desc())
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(sort_column, id_column) < tuple_(sort_value, row_id))
+
+    # Una fila extra indica si existe otra página, sin COUNT(*)
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(
+            getattr(last, sort_column.key),
+            getattr(last, id_column.key)
+        )
+
+    return items, next_cursor
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark de la mejora de prompts.
+
+Compara la implementación anterior (dicts literales reconstruidos en cada
+llamada) con prompt_compiler (tablas de módulo + memo LRU).
+
+Uso:
+    python -m benchmarks.bench_prompt_compiler
+"""
+import timeit
+
+from app.models.scene import Scene
+from app.services.prompt_compiler import enhance_prompt, compile_prompt
+
+
+def legacy_enhance(base_prompt, scene_payload):
+    """Implementación anterior de FIBOService._enhance_prompt_with_cinematics"""
+    enhancements = []
+
+    # Extraer info de cámara
+    camera = scene_payload.get("camera", {})
+    if camera:
+        shot_type = camera.get("shot_type", "")
+        angle = camera.get("angle", "")
+
+        if shot_type:
+            shot_descriptions = {
+                "close_up": "close-up shot",
+                "medium_shot": "medium shot",
+                "wide_shot": "wide shot",
+                "extreme_wide_shot": "extreme wide angle shot",
+                "full_shot": "full body shot"
+            }
+            if shot_type in shot_descriptions:
+                enhancements.append(shot_descriptions[shot_type])
+
+        if angle and angle != "eye_level":
+            angle_descriptions = {
+                "low_angle": "low angle view",
+                "high_angle": "high angle view",
+                "birds_eye": "aerial bird's eye view"
+            }
+            if angle in angle_descriptions:
+                enhancements.append(angle_descriptions[angle])
+
+    # Extraer info de iluminación
+    lighting = scene_payload.get("lighting", {})
+    if lighting:
+        time_of_day = lighting.get("time_of_day", "")
+        color_grading = lighting.get("color_grading", "")
+
+        if time_of_day:
+            time_descriptions = {
+                "golden_hour": "golden hour lighting",
+                "blue_hour": "blue hour lighting",
+                "night": "night scene",
+                "dawn": "dawn lighting"
+            }
+            if time_of_day in time_descriptions:
+                enhancements.append(time_descriptions[time_of_day])
+
+        if color_grading and color_grading != "neutral":
+            grading_descriptions = {
+                "cinematic": "cinematic color grading",
+                "warm": "warm tones",
+                "cool": "cool tones",
+                "cyberpunk": "cyberpunk neon colors"
+            }
+            if color_grading in grading_descriptions:
+                enhancements.append(grading_descriptions[color_grading])
+
+    # Agregar estilo si existe
+    style = scene_payload.get("style", "")
+    if style and style != "realistic":
+        enhancements.append(f"{style} style")
+
+    # Construir prompt mejorado
+    if enhancements:
+        enhanced = f"{base_prompt}, {', '.join(enhancements)}"
+    else:
+        enhanced = base_prompt
+
+    return enhanced
+
+
+def main(number: int = 100000):
+    payload = Scene.preset_noir("A detective in a rainy alley").to_fibo_payload()
+    payload["camera"]["shot_type"] = "close_up"
+
+    legacy = timeit.timeit(lambda: legacy_enhance(payload["prompt"], payload), number=number)
+    compiled = timeit.timeit(lambda: enhance_prompt(payload["prompt"], payload), number=number)
+
+    print(f"legacy:   {legacy / number * 1e6:.2f} µs/llamada")
+    print(f"compiled: {compiled / number * 1e6:.2f} µs/llamada ({legacy / compiled:.1f}x)")
+    print(f"memo:     {compile_prompt.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
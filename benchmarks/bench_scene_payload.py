@@ -0,0 +1,202 @@
+"""
+Micro-benchmark de la representación de escenas.
+
+Compara las dataclasses con __slots__ y los serializadores compilados
+(serialization.py) con la implementación anterior: dataclasses con
+__dict__ por instancia, to_fibo_payload armado con to_fibo_json + update
+y to_dict con dataclasses.asdict.
+
+Uso:
+    python -m benchmarks.bench_scene_payload
+"""
+import timeit
+import tracemalloc
+from dataclasses import MISSING, asdict, dataclass, field, fields
+
+from app.models.camera import CameraSettings
+from app.models.lighting import LightingSetup, LightSource
+from app.models.scene import Scene
+
+
+def unslotted(cls):
+    """Copia de la dataclass sin __slots__ (como estaban antes)"""
+    namespace = {"__annotations__": {}}
+    for f in fields(cls):
+        namespace["__annotations__"][f.name] = f.type
+        if f.default_factory is not MISSING:
+            namespace[f.name] = field(default_factory=f.default_factory)
+        elif f.default is not MISSING:
+            namespace[f.name] = f.default
+    return dataclass(type(f"Legacy{cls.__name__}", (), namespace))
+
+
+LegacyCamera = unslotted(CameraSettings)
+LegacyLighting = unslotted(LightingSetup)
+LegacyLightSource = unslotted(LightSource)
+LegacyScene = unslotted(Scene)
+
+
+def legacy_camera_json(camera):
+    return {
+        "camera": {
+            "angle": camera.angle,
+            "shot_type": camera.shot_type,
+            "movement": camera.movement,
+            "fov": camera.fov,
+            "focal_length": camera.focal_length,
+            "aperture": camera.aperture,
+            "sensor_size": camera.sensor_size
+        },
+        "composition": {
+            "rule": camera.composition_rule,
+            "depth_of_field": camera.depth_of_field,
+            "focus_point": camera.focus_point
+        },
+        "optical_effects": {
+            "lens_distortion": camera.lens_distortion,
+            "vignette": camera.vignette,
+            "chromatic_aberration": camera.chromatic_aberration
+        },
+        "format": {
+            "aspect_ratio": camera.aspect_ratio
+        }
+    }
+
+
+def legacy_lighting_json(lighting):
+    result = {
+        "lighting": {
+            "preset": lighting.preset,
+            "time_of_day": lighting.time_of_day,
+            "ambient_intensity": lighting.ambient_intensity,
+            "ambient_color": lighting.ambient_color,
+            "color_grading": lighting.color_grading
+        },
+        "exposure": {
+            "contrast": lighting.contrast,
+            "exposure": lighting.exposure,
+            "highlights": lighting.highlights,
+            "shadows": lighting.shadows
+        },
+        "atmosphere": {
+            "fog": lighting.fog,
+            "haze": lighting.haze,
+            "god_rays": lighting.god_rays
+        },
+        "shadows": {
+            "intensity": lighting.shadow_intensity,
+            "softness": lighting.shadow_softness
+        },
+        "effects": {
+            "lens_flare": lighting.lens_flare,
+            "bloom": lighting.bloom
+        }
+    }
+    if lighting.lights:
+        result["custom_lights"] = [
+            {
+                "type": light.type,
+                "intensity": light.intensity,
+                "color_temp": light.color_temp,
+                "position": light.position,
+                "softness": light.softness,
+                "angle": light.angle,
+                "color_tint": light.color_tint
+            }
+            for light in lighting.lights
+        ]
+    return result
+
+
+def legacy_payload(scene):
+    """to_fibo_payload anterior"""
+    payload = {
+        "prompt": scene.prompt,
+        "negative_prompt": scene.negative_prompt,
+        "width": scene.width,
+        "height": scene.height,
+        "steps": scene.steps,
+        "guidance_scale": scene.guidance_scale,
+        "style": scene.style,
+        "detail_level": scene.detail_level,
+        "texture_strength": scene.texture_strength,
+        "sharpness": scene.sharpness
+    }
+    if scene.seed is not None:
+        payload["seed"] = scene.seed
+    if scene.color_palette:
+        payload["color_palette"] = scene.color_palette
+    if scene.mood:
+        payload["mood"] = scene.mood
+    payload.update(legacy_camera_json(scene.camera))
+    payload.update(legacy_lighting_json(scene.lighting))
+    if scene.scene_number is not None:
+        payload["scene_number"] = scene.scene_number
+    if scene.tags:
+        payload["tags"] = scene.tags
+    return payload
+
+
+def legacy_dict(scene):
+    """to_dict anterior (asdict para cámara e iluminación)"""
+    data = {name: getattr(scene, name) for name in LegacyScene.__dataclass_fields__}
+    data["camera"] = asdict(scene.camera)
+    data["lighting"] = asdict(scene.lighting)
+    return data
+
+
+def build(scene_cls, camera_cls, lighting_cls, light_cls, count):
+    return [
+        scene_cls(
+            prompt=f"frame {i}",
+            seed=i,
+            scene_number=i + 1,
+            tags=["storyboard"],
+            camera=camera_cls(fov=30 + i % 60),
+            lighting=lighting_cls(lights=[light_cls(), light_cls(type="fill", intensity=0.5)])
+        )
+        for i in range(count)
+    ]
+
+
+def allocated(builder):
+    """Bytes retenidos por lo que devuelve builder()"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = builder()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del result
+    return size
+
+
+def main(scenes: int = 2000, number: int = 20):
+    legacy = build(LegacyScene, LegacyCamera, LegacyLighting, LegacyLightSource, scenes)
+    slotted = build(Scene, CameraSettings, LightingSetup, LightSource, scenes)
+
+    assert [legacy_payload(s) for s in legacy] == [s.to_fibo_payload() for s in slotted]
+    assert [legacy_dict(s) for s in legacy] == [s.to_dict() for s in slotted]
+
+    legacy_bytes = allocated(lambda: build(LegacyScene, LegacyCamera, LegacyLighting, LegacyLightSource, scenes))
+    slotted_bytes = allocated(lambda: build(Scene, CameraSettings, LightingSetup, LightSource, scenes))
+
+    timings = {}
+    for label, old, new in (
+        ("to_fibo_payload", lambda: [legacy_payload(s) for s in legacy],
+         lambda: [s.to_fibo_payload() for s in slotted]),
+        ("to_dict", lambda: [legacy_dict(s) for s in legacy],
+         lambda: [s.to_dict() for s in slotted]),
+    ):
+        timings[label] = (timeit.timeit(old, number=number), timeit.timeit(new, number=number))
+
+    print(f"escenas:          {scenes}")
+    print(f"memoria:          {legacy_bytes / scenes:.0f} -> {slotted_bytes / scenes:.0f} bytes/escena "
+          f"({1 - slotted_bytes / legacy_bytes:.0%} menos)")
+    for label, (old, new) in timings.items():
+        print(f"{label + ':':<17} {old / number * 1e3:.2f} -> {new / number * 1e3:.2f} ms/secuencia "
+              f"({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Micro-benchmark del traductor de trayectorias de cámara.
+
+Compara el bucle escalar (translate_camera_data por keyframe) con
+translate_camera_path (NumPy, una pasada por trayectoria).
+
+Uso:
+    python -m benchmarks.bench_translator
+"""
+import timeit
+
+import numpy as np
+
+from app.services.translator import (
+    map_camera_angles, map_lightings, map_shot_sizes,
+    translate_camera_data, translate_camera_path
+)
+
+
+def scalar_path(positions, light_position):
+    """Bucle anterior: un translate_camera_data por keyframe"""
+    return [
+        translate_camera_data({"position": position}, light_position)
+        for position in positions
+    ]
+
+
+def main(keyframes: int = 5000, number: int = 20):
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(-10, 10, size=(keyframes, 3)).tolist()
+    light_position = [0, 3, 3]
+
+    assert scalar_path(positions, light_position) == translate_camera_path(positions, light_position)
+
+    scalar = timeit.timeit(lambda: scalar_path(positions, light_position), number=number)
+    batch = timeit.timeit(lambda: translate_camera_path(positions, light_position), number=number)
+
+    # Solo la clasificación, con los datos ya en un array N×3
+    array = np.asarray(positions)
+    lights = np.broadcast_to(np.asarray(light_position, dtype=float), array.shape)
+    classify = timeit.timeit(
+        lambda: (map_camera_angles(array), map_shot_sizes(array), map_lightings(lights)),
+        number=number
+    )
+
+    print(f"keyframes: {keyframes}")
+    print(f"scalar:    {scalar / number * 1e3:.2f} ms/trayectoria")
+    print(f"batch:     {batch / number * 1e3:.2f} ms/trayectoria ({scalar / batch:.1f}x)")
+    print(f"classify:  {classify / number * 1e3:.2f} ms/trayectoria ({scalar / classify:.1f}x, sin conversión a JSON)")
+
+
+if __name__ == "__main__":
+    main()
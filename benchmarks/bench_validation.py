@@ -0,0 +1,39 @@
+"""
+Micro-benchmark de la validación de storyboards.
+
+Mide validate_scenes (validador compilado desde app/models/constraints.py)
+sobre un storyboard con luces personalizadas.
+
+Uso:
+    python -m benchmarks.bench_validation
+"""
+import timeit
+
+from app.models.camera import CameraSettings
+from app.models.constraints import validate_scenes
+from app.models.lighting import LightingSetup, LightSource
+from app.models.scene import Scene
+
+
+def main(frames: int = 500, number: int = 200):
+    scenes = [
+        Scene(
+            prompt=f"frame {i}",
+            seed=i,
+            camera=CameraSettings(fov=20 + i % 140),
+            lighting=LightingSetup(lights=[LightSource(), LightSource(color_temp=900 + i)])
+        )
+        for i in range(frames)
+    ]
+
+    invalid = sum(1 for errors in validate_scenes(scenes) if errors)
+    batch = timeit.timeit(lambda: validate_scenes(scenes), number=number)
+    first = timeit.timeit(lambda: [scene.validate() for scene in scenes], number=number)
+
+    print(f"frames:          {frames} ({invalid} con errores)")
+    print(f"validate_scenes: {batch / number / frames * 1e6:.2f} µs/frame")
+    print(f"Scene.validate:  {first / number / frames * 1e6:.2f} µs/frame")
+
+
+if __name__ == "__main__":
+    main()
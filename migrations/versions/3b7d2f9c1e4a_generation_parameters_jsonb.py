@@ -0,0 +1,66 @@
+"""Store generation parameters as JSONB with expression indexes
+
+Revision ID: 3b7d2f9c1e4a
+Revises: 971ee8440973
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7d2f9c1e4a'
+down_revision = '971ee8440973'
+branch_labels = None
+depends_on = None
+
+# Mismas expresiones que Generation.__table_args__ para que el planner las use
+INDEXES = {
+    'postgresql': {
+        'ix_generations_user_style': "CAST(parameters ->> 'style' AS VARCHAR)",
+        'ix_generations_user_shot_type': "CAST(parameters #>> '{camera, shot_type}' AS VARCHAR)",
+        'ix_generations_user_color_grading': "CAST(parameters #>> '{lighting, color_grading}' AS VARCHAR)",
+    },
+    'sqlite': {
+        'ix_generations_user_style': """JSON_EXTRACT(parameters, '$."style"')""",
+        'ix_generations_user_shot_type': """JSON_EXTRACT(parameters, '$."camera"."shot_type"')""",
+        'ix_generations_user_color_grading': """JSON_EXTRACT(parameters, '$."lighting"."color_grading"')""",
+    },
+}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.alter_column(
+            'generations',
+            'parameters',
+            existing_type=sa.Text(),
+            type_=postgresql.JSONB(),
+            postgresql_using='parameters::jsonb',
+            existing_nullable=True
+        )
+    # En SQLite el JSON se guarda como texto: la columna no cambia
+
+    for name, expression in INDEXES.get(dialect, {}).items():
+        op.create_index(name, 'generations', ['user_id', sa.text(expression)], unique=False)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    for name in INDEXES.get(dialect, {}):
+        op.drop_index(name, table_name='generations')
+
+    if dialect == 'postgresql':
+        op.alter_column(
+            'generations',
+            'parameters',
+            existing_type=postgresql.JSONB(),
+            type_=sa.Text(),
+            postgresql_using='parameters::text',
+            existing_nullable=True
+        )
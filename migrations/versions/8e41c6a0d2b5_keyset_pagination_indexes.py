@@ -0,0 +1,36 @@
+"""Composite indexes for keyset pagination
+
+Revision ID: 8e41c6a0d2b5
+Revises: 3b7d2f9c1e4a
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e41c6a0d2b5'
+down_revision = '3b7d2f9c1e4a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_generations_user_created',
+        'generations',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False
+    )
+    op.create_index(
+        'ix_projects_public_status_updated',
+        'projects',
+        ['is_public', 'status', sa.text('updated_at DESC'), sa.text('id DESC')],
+        unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_projects_public_status_updated', table_name='projects')
+    op.drop_index('ix_generations_user_created', table_name='generations')
@@ -0,0 +1,48 @@
+"""Add project_stats counter table
+
+Revision ID: c5a9e3d17f02
+Revises: 8e41c6a0d2b5
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a9e3d17f02'
+down_revision = '8e41c6a0d2b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('project_stats',
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('total_generations', sa.Integer(), nullable=False),
+    sa.Column('completed_generations', sa.Integer(), nullable=False),
+    sa.Column('failed_generations', sa.Integer(), nullable=False),
+    sa.Column('favorite_generations', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('project_id')
+    )
+
+    # Backfill con una sola agregación condicional
+    op.execute(
+        """
+        INSERT INTO project_stats (project_id, total_generations, completed_generations,
+                                   failed_generations, favorite_generations)
+        SELECT p.id,
+               COUNT(g.id),
+               COALESCE(SUM(CASE WHEN g.status = 'completed' THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN g.status = 'failed' THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN g.is_favorite THEN 1 ELSE 0 END), 0)
+        FROM projects p
+        LEFT OUTER JOIN generations g ON g.project_id = p.id
+        GROUP BY p.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table('project_stats')
@@ -0,0 +1,60 @@
+"""Add user_stats counter table
+
+Revision ID: e2f7b4a96c13
+Revises: c5a9e3d17f02
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f7b4a96c13'
+down_revision = 'c5a9e3d17f02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_projects', sa.Integer(), nullable=False),
+    sa.Column('public_projects', sa.Integer(), nullable=False),
+    sa.Column('completed_generations', sa.Integer(), nullable=False),
+    sa.Column('favorite_generations', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Backfill: una agregación por tabla, unidas por usuario
+    op.execute(
+        """
+        INSERT INTO user_stats (user_id, total_projects, public_projects,
+                                completed_generations, favorite_generations)
+        SELECT u.id,
+               COALESCE(p.total_projects, 0),
+               COALESCE(p.public_projects, 0),
+               COALESCE(g.completed_generations, 0),
+               COALESCE(g.favorite_generations, 0)
+        FROM users u
+        LEFT OUTER JOIN (
+            SELECT user_id,
+                   COUNT(*) AS total_projects,
+                   SUM(CASE WHEN is_public THEN 1 ELSE 0 END) AS public_projects
+            FROM projects
+            GROUP BY user_id
+        ) p ON p.user_id = u.id
+        LEFT OUTER JOIN (
+            SELECT user_id,
+                   SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) AS completed_generations,
+                   SUM(CASE WHEN is_favorite THEN 1 ELSE 0 END) AS favorite_generations
+            FROM generations
+            GROUP BY user_id
+        ) g ON g.user_id = u.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table('user_stats')
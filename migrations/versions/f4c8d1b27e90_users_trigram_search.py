@@ -0,0 +1,39 @@
+"""Trigram indexes for user search
+
+Revision ID: f4c8d1b27e90
+Revises: e2f7b4a96c13
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4c8d1b27e90'
+down_revision = 'e2f7b4a96c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        # Sin pg_trgm la búsqueda usa el fallback ILIKE
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_users_username_trgm', 'users', ['username'], unique=False,
+        postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_users_full_name_trgm', 'users', ['full_name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'}
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('ix_users_full_name_trgm', table_name='users')
+    op.drop_index('ix_users_username_trgm', table_name='users')
@@ -22,4 +22,19 @@ def test_post_routes(client):
 
 def test_invalid_route(client):
     response = client.get('/api/invalid_endpoint')  # Replace with an invalid endpoint
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_metrics_endpoint_exposes_stage_histograms(client):
+    from app.utils.metrics import stage_timer
+
+    with stage_timer('validate'):
+        pass
+
+    response = client.get('/metrics')
+    body = response.data.decode()
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE fibo_generation_stage_seconds histogram' in body
+    assert 'fibo_generation_stage_seconds_bucket{stage="validate",le="+Inf"}' in body
+    assert 'fibo_generation_stage_seconds_count{stage="validate"}' in body
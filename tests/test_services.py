@@ -16,3 +16,1372 @@ def test_example_service(client):
     assert response.json['expected_key'] == 'expected_value'  # Replace with actual expected value
 
 # Add more tests for services as needed
+
+
+@pytest.fixture
+def sqlite_app():
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+
+    from app.models import db
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_job_queue_claims_in_order():
+    from app.services.generation_queue import SQLiteJobQueue
+
+    queue = SQLiteJobQueue()
+    first = queue.put(1, {"prompt": "a"})
+    queue.put(2, {"prompt": "b"})
+
+    job = queue.claim()
+    assert job['id'] == first
+    assert job['payload'] == {"prompt": "a"}
+    assert queue.pending_count() == 1
+
+    queue.complete(job['id'])
+    assert queue.claim()['generation_id'] == 2
+    assert queue.claim() is None
+
+
+def test_worker_pool_completes_generation(sqlite_app):
+    from app.models import db
+    from app.models.user import User
+    from app.models.project import Generation
+    from app.services.generation_queue import SQLiteJobQueue, GenerationWorkerPool
+
+    class FakeFibo:
+        def generate_image(self, payload):
+            return {"id": "abc", "image_url": "https://img/1.png"}
+
+    user = User(username='queue_user', email='q@example.com', password_hash='x',
+                generations_today=0, total_generations=0)
+    db.session.add(user)
+    db.session.commit()
+    generation = Generation(user_id=user.id, prompt='p', status='pending')
+    db.session.add(generation)
+    assert user.reserve_generations()
+    db.session.commit()
+    generation_id, user_id = generation.id, user.id
+
+    queue = SQLiteJobQueue()
+    pool = GenerationWorkerPool(sqlite_app, queue, FakeFibo(), num_workers=1)
+    job = queue.put(generation_id, {"prompt": "p"})
+    pool._process(queue.claim())
+    queue.complete(job)
+
+    generation = Generation.query.get(generation_id)
+    assert generation.status == 'completed'
+    assert generation.image_url == 'https://img/1.png'
+    user = User.query.get(user_id)
+    assert user.generations_today == 1
+    assert user.total_generations == 1
+
+
+def test_generate_sequence_runs_frames_concurrently():
+    import time
+    from app.services.fibo_service import FIBOService
+
+    service = FIBOService()
+
+    def slow_generate(payload):
+        time.sleep(0.2)
+        return {"id": payload["prompt"], "image_url": f"https://img/{payload['prompt']}"}
+
+    service.generate_image = slow_generate
+
+    start = time.time()
+    results = service.generate_sequence([{"prompt": str(i)} for i in range(4)], user_key=1)
+    elapsed = time.time() - start
+
+    assert [r["id"] for r in results] == ["0", "1", "2", "3"]
+    assert elapsed < 0.6
+
+
+def test_fibo_session_reuses_connections():
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from app.services.fibo_service import FIBOService
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    service = FIBOService()
+    try:
+        url = f'http://127.0.0.1:{server.server_port}/health'
+        for _ in range(3):
+            service.session.get(url, timeout=5)
+
+        stats = service.connection_stats()
+        assert stats['pools'] == 1
+        assert stats['requests'] == 3
+        assert stats['connections_opened'] == 1
+        assert stats['connections_reused'] == 2
+    finally:
+        service.session.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_result_cache_serves_seeded_payloads(tmp_path):
+    from app.services.fibo_service import FIBOService
+    from app.services.result_cache import ResultCache, SQLiteBackend
+
+    service = FIBOService()
+    service.result_cache = ResultCache(SQLiteBackend(str(tmp_path / 'cache.sqlite3')))
+    calls = []
+
+    def fake_upstream(payload):
+        calls.append(payload)
+        return {"id": "1", "image_url": "https://img/1.png", "seed": payload.get("seed")}
+
+    service.mock_mode = True
+    service._mock_generate = fake_upstream
+
+    seeded = {"prompt": "castle", "seed": 42, "scene_number": 1}
+    first = service.generate_image(seeded)
+    second = service.generate_image(dict(seeded, scene_number=7))
+
+    assert len(calls) == 1
+    assert second['image_url'] == first['image_url']
+    assert second['cached'] is True
+
+    service.generate_image({"prompt": "castle"})
+    service.generate_image({"prompt": "castle"})
+    assert len(calls) == 3
+    assert service.result_cache.stats()['hits'] == 1
+
+
+def test_single_flight_coalesces_concurrent_duplicates():
+    import threading
+    import time
+    from app.services.fibo_service import FIBOService
+
+    service = FIBOService()
+    service.result_cache = None
+    service.mock_mode = True
+    calls = []
+
+    def slow_upstream(payload):
+        calls.append(payload)
+        time.sleep(0.2)
+        return {"id": "1", "image_url": "https://img/1.png"}
+
+    service._mock_generate = slow_upstream
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(service.generate_image({"prompt": "x", "seed": 7})))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 3
+    assert sum(1 for r in results if r.get('coalesced')) == 2
+
+
+def test_file_lease_passes_leader_result_across_processes(tmp_path):
+    import os
+    import threading
+    import time
+    from app.services.single_flight import SingleFlight
+
+    # Cada SingleFlight abre su propio lock-file, como dos workers de gunicorn
+    workers = [SingleFlight(lock_dir=str(tmp_path)) for _ in range(2)]
+    calls = []
+    results = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"id": "1", "image_url": "https://img/1.png"}
+
+    def request(worker):
+        results.append(worker.do('payload-hash', upstream))
+
+    threads = [threading.Thread(target=request, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+
+    # Sin caché compartida, el segundo worker recibe el resultado del primero
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True]
+    assert all(result['image_url'] == 'https://img/1.png' for result, _ in results)
+    assert os.listdir(tmp_path) == []
+
+    # Si el líder falla, el siguiente hace la llamada
+    def failing():
+        raise RuntimeError("Bria caído")
+
+    try:
+        workers[0].do('other', failing)
+    except RuntimeError:
+        pass
+    assert workers[1].do('other', upstream) == ({"id": "1", "image_url": "https://img/1.png"}, False)
+    assert os.listdir(tmp_path) == []
+
+
+def test_result_poller_completes_pending_generation(sqlite_app):
+    import time
+    from app.models import db
+    from app.models.user import User
+    from app.models.project import Generation
+    from app.services.result_poller import ResultPoller
+
+    class FakeFibo:
+        result_cache = None
+
+        def __init__(self):
+            self.polls = 0
+
+        def get_result_by_id(self, result_id):
+            self.polls += 1
+            if self.polls < 3:
+                return {"success": False, "status": "IN_PROGRESS"}
+            return {"success": True, "id": result_id, "status": "completed",
+                    "image_url": "https://img/polled.png"}
+
+    user = User(username='poll_user', email='p@example.com', password_hash='x',
+                generations_today=0, total_generations=0)
+    db.session.add(user)
+    db.session.commit()
+    generation = Generation(user_id=user.id, prompt='p', status='generating', fibo_generation_id='req-1')
+    db.session.add(generation)
+    db.session.commit()
+    generation_id = generation.id
+
+    fibo = FakeFibo()
+    poller = ResultPoller(sqlite_app, fibo, initial_interval=0.01, max_interval=0.05)
+    assert poller.recover() == 1
+    poller.start()
+    try:
+        deadline = time.time() + 3
+        while poller.pending_count() and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        poller.stop()
+
+    db.session.expire_all()
+    generation = Generation.query.get(generation_id)
+    assert fibo.polls == 3
+    assert generation.status == 'completed'
+    assert generation.image_url == 'https://img/polled.png'
+
+
+def test_result_poller_retries_failed_writes_and_recovers_once(sqlite_app, tmp_path):
+    import time
+    from app.models import db
+    from app.models.user import User
+    from app.models.project import Generation
+    from app.services.result_poller import ResultPoller
+    from app.services.process_lease import ProcessLease
+
+    class FakeFibo:
+        result_cache = None
+
+        def get_result_by_id(self, result_id):
+            return {"success": True, "id": result_id, "status": "completed",
+                    "image_url": "https://img/retried.png"}
+
+    class FlakyPoller(ResultPoller):
+        writes = 0
+
+        def _write_results(self, finished):
+            self.writes += 1
+            if self.writes == 1:
+                raise RuntimeError("database is locked")
+            super()._write_results(finished)
+
+    user = User(username='retry_user', email='r@example.com', password_hash='x',
+                generations_today=0, total_generations=0)
+    db.session.add(user)
+    db.session.commit()
+    generation = Generation(user_id=user.id, prompt='p', status='generating', fibo_generation_id='req-2')
+    db.session.add(generation)
+    db.session.commit()
+    generation_id = generation.id
+
+    lease_path = str(tmp_path / 'recover.lock')
+    poller = FlakyPoller(sqlite_app, FakeFibo(), initial_interval=0.01, max_interval=0.05,
+                         lease=ProcessLease(lease_path))
+    other_worker = ResultPoller(sqlite_app, FakeFibo(), lease=ProcessLease(lease_path))
+
+    # Solo un proceso retoma las pendientes
+    assert poller.recover() == 1
+    assert other_worker.recover() == 0
+
+    poller.start()
+    try:
+        deadline = time.time() + 3
+        while poller.pending_count() and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        poller.stop()
+
+    db.session.expire_all()
+    assert poller.writes == 2
+    assert Generation.query.get(generation_id).status == 'completed'
+
+    # Al detenerse libera el lease
+    assert other_worker.recover() == 0
+    assert other_worker.lease.held
+    other_worker.stop()
+
+
+def test_result_endpoint_resolver_caches_working_shape():
+    from app.services.fibo_service import ResultEndpointResolver
+
+    resolver = ResultEndpointResolver('https://api.example.com/v2')
+    # Las mismas tres formas que probaba _get_result, en el mismo orden
+    assert resolver.probe_order() == (
+        'https://api.example.com/v2/results/{id}',
+        'https://api.example.com/v2/result/{id}',
+        'https://api.example.com/results/{id}',
+    )
+
+    resolver.remember('https://api.example.com/results/{id}')
+    order = resolver.probe_order()
+    assert order[0] == 'https://api.example.com/results/{id}'
+    assert len(order) == len(resolver.templates)
+
+    resolver.ttl = 0
+    resolver._cached_at -= 1
+    assert resolver.probe_order() == resolver.templates
+
+
+def test_result_polling_probes_once_per_poll_after_learning_the_shape():
+    import requests
+    from app.services.fibo_service import FIBOService
+
+    class FakeResponse:
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+        def json(self):
+            return {"status": "IN_PROGRESS"}
+
+        def raise_for_status(self):
+            if self.status_code >= 400:
+                raise requests.HTTPError(f"{self.status_code} Error")
+
+    class FakeSession:
+        def __init__(self, statuses):
+            self.statuses = statuses
+            self.urls = []
+
+        def get(self, url, timeout=None):
+            self.urls.append(url)
+            return FakeResponse(self.statuses.get(url.rsplit('/', 1)[0], 404))
+
+    service = FIBOService()
+    service.result_endpoints.templates = (
+        'https://api.example.com/v2/results/{id}',
+        'https://api.example.com/v2/result/{id}',
+        'https://api.example.com/results/{id}',
+    )
+
+    # Un 5xx no fija la forma
+    service.session = FakeSession({'https://api.example.com/v2/results': 503})
+    assert 'error' in service.get_result_by_id('abc')
+    assert service.result_endpoints._cached is None
+
+    service.session = FakeSession({'https://api.example.com/results': 200})
+    service.get_result_by_id('abc')
+    assert len(service.session.urls) == 3
+
+    for poll in range(1, 4):
+        service.get_result_by_id('abc')
+        assert len(service.session.urls) == 3 + poll
+    assert service.session.urls[-1] == 'https://api.example.com/results/abc'
+
+
+def test_prompt_compiler_covers_scene_vocabulary():
+    from app.services.prompt_compiler import enhance_prompt
+
+    payload = {
+        "prompt": "A street",
+        "camera": {"shot_type": "close_up", "angle": "worms_eye"},
+        "lighting": {"time_of_day": "night", "color_grading": "noir"},
+        "mood": "tense",
+        "color_palette": "neon",
+        "style": "realistic",
+    }
+
+    assert enhance_prompt(payload["prompt"], payload) == (
+        "A street, close-up shot, worm's eye view from the ground, night scene, "
+        "high contrast film noir, tense atmosphere, neon colors"
+    )
+    assert enhance_prompt("A", {"style": "pixel_art"}) == "A, pixel_art style"
+
+
+def test_structured_log_truncates_fields():
+    import json
+    import logging
+    from app.utils.log import StructuredFormatter, Truncated, fields
+
+    record = logging.LogRecord('app.services.fibo_service', logging.DEBUG, __file__, 1,
+                               'bria.payload', None, None)
+    record.__dict__.update(fields(payload=Truncated("x" * 50, limit=10), status_code=200))
+
+    line = json.loads(StructuredFormatter().format(record))
+    assert line['event'] == 'bria.payload'
+    assert line['status_code'] == 200
+    assert line['payload'] == "xxxxxxxxxx... (+40 chars)"
+
+
+
+def test_async_log_keeps_exception_in_its_own_field():
+    import io
+    import json
+    import logging
+    import queue
+    from logging.handlers import QueueListener
+    from app.utils.log import DeferredQueueHandler, StructuredFormatter
+
+    log_queue = queue.SimpleQueue()
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(StructuredFormatter())
+    listener = QueueListener(log_queue, output)
+
+    logger = logging.getLogger('tests.async_log')
+    logger.propagate = False
+    handler = DeferredQueueHandler(log_queue)
+    logger.addHandler(handler)
+    listener.start()
+    try:
+        try:
+            raise ValueError("respuesta inválida")
+        except ValueError:
+            logger.exception('bria.response.invalid')
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+
+    line = json.loads(stream.getvalue())
+    assert line['event'] == 'bria.response.invalid'
+    assert 'ValueError: respuesta inválida' in line['exc_info']
+
+def test_single_frame_commits_at_most_twice(sqlite_app, monkeypatch):
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import event
+    from app.models import db
+    from app.models.user import User
+    from app.routes import generation as generation_routes
+
+    user = User.create('commits', 'commits@example.com', 'secret123')
+    token = create_access_token(identity=str(user.id))
+    user_id = user.id
+
+    monkeypatch.setattr(
+        generation_routes.fibo_service,
+        'generate_image',
+        lambda payload: {"id": "img-1", "image_url": "https://example.com/1.png"}
+    )
+
+    commits = []
+    listener = lambda session: commits.append(session)
+    event.listen(db.session, 'after_commit', listener)
+    try:
+        response = sqlite_app.test_client().post(
+            '/generation/single',
+            json={'prompt': 'a lighthouse at dusk'},
+            headers={'Authorization': f'Bearer {token}'}
+        )
+    finally:
+        event.remove(db.session, 'after_commit', listener)
+
+    assert response.status_code == 200
+    assert len(commits) == 2
+    assert User.query.get(user_id).total_generations == 1
+
+
+def test_quota_reservation_is_conditional_and_refundable(sqlite_app):
+    from app.models import db
+    from app.models.user import User
+
+    user = User(username='quota_user', email='quota@example.com', password_hash='x',
+                plan='free', generations_today=98, total_generations=0)
+    db.session.add(user)
+    db.session.commit()
+
+    assert user.reserve_generations(2)
+    assert not user.reserve_generations(1)
+    user.refund_generations(1)
+    assert user.reserve_generations(1)
+    db.session.commit()
+
+    assert user.generations_today == 100
+    assert user.get_remaining_generations() == 0
+
+
+def test_quota_resets_lazily_and_supports_rolling_window(sqlite_app):
+    from datetime import datetime, timedelta
+    from app.models import db
+    from app.models.user import User
+
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    user = User(username='reset_user', email='reset@example.com', password_hash='x',
+                plan='free', generations_today=100, last_generation_reset=yesterday)
+    db.session.add(user)
+    db.session.commit()
+
+    # La primera reserva de la nueva ventana reinicia el contador
+    assert user.get_remaining_generations() == 100
+    assert user.reserve_generations(3)
+    db.session.commit()
+    assert user.generations_today == 3
+    assert user.last_generation_reset > yesterday
+
+    # Token bucket: 100 por día, se vacía una unidad cada 864 s
+    sqlite_app.config['GENERATION_QUOTA_WINDOW'] = 'rolling'
+    user.generations_today = 100
+    user.last_generation_reset = datetime.utcnow() - timedelta(seconds=864 * 2 + 10)
+    db.session.commit()
+
+    assert user.get_remaining_generations() == 2
+    assert user.reserve_generations(2)
+    assert not user.reserve_generations(1)
+    db.session.commit()
+    assert user.generations_today == 100
+
+
+def test_auth_decorators_load_user_once_per_request(sqlite_app):
+    from flask import jsonify
+    from flask_jwt_extended import create_access_token, jwt_required
+    from sqlalchemy import event
+    from app.models import db
+    from app.models.user import User
+    from app.middleware import (
+        check_generation_limit, get_current_user, plan_required, verified_required
+    )
+    from app.services.user_cache import user_cache
+
+    user = User.create('stacked', 'stacked@example.com', 'secret123', plan='pro')
+    user.verify_email()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+    @sqlite_app.route('/_stacked')
+    @jwt_required()
+    @verified_required
+    @plan_required('pro')
+    @check_generation_limit
+    def stacked():
+        return jsonify({"plan": get_current_user().plan})
+
+    @sqlite_app.route('/_plan_only')
+    @jwt_required()
+    @plan_required('pro')
+    def plan_only():
+        return jsonify({"ok": True})
+
+    user_queries = []
+
+    def count_user_selects(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith('SELECT') and 'FROM users' in statement:
+            user_queries.append(statement)
+
+    user_cache.clear()
+    client = sqlite_app.test_client()
+    event.listen(db.engine, 'before_cursor_execute', count_user_selects)
+    try:
+        assert client.get('/_stacked', headers=headers).status_code == 200
+        assert len(user_queries) == 1
+
+        # La instantánea quedó en caché: plan_required no consulta la base
+        assert client.get('/_plan_only', headers=headers).status_code == 200
+        assert len(user_queries) == 1
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_user_selects)
+
+    # Cambiar de plan invalida la instantánea
+    User.query.get(user.id).upgrade_plan('free')
+    assert client.get('/_plan_only', headers=headers).status_code == 403
+
+
+def test_history_filters_on_json_parameters(sqlite_app):
+    from flask_jwt_extended import create_access_token
+    from app.models import db
+    from app.models.user import User
+    from app.models.project import Generation
+
+    user = User.create('history', 'history@example.com', 'secret123')
+    for style, shot_type in [('noir', 'close_up'), ('noir', 'wide_shot'), ('anime', 'close_up')]:
+        generation = Generation(user_id=user.id, prompt=f'{style} {shot_type}', status='completed')
+        generation.set_parameters({
+            'style': style,
+            'camera': {'shot_type': shot_type},
+            'lighting': {'color_grading': 'noir'}
+        })
+        db.session.add(generation)
+    db.session.commit()
+    db.session.expire_all()
+
+    stored = Generation.query.first()
+    assert stored.get_parameters()['camera']['shot_type'] == 'close_up'
+
+    response = sqlite_app.test_client().get(
+        '/generation/history?style=noir&shot_type=close_up',
+        headers={'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+    )
+
+    assert response.status_code == 200
+    assert [g['prompt'] for g in response.json['generations']] == ['noir close_up']
+
+
+def test_history_cursor_pagination_walks_all_rows(sqlite_app):
+    from datetime import datetime, timedelta
+    from flask_jwt_extended import create_access_token
+    from app.models import db
+    from app.models.user import User
+    from app.models.project import Generation
+
+    user = User.create('cursor', 'cursor@example.com', 'secret123')
+    base = datetime(2026, 1, 1)
+    for i in range(7):
+        # Pares de filas con la misma fecha: el id desempata
+        db.session.add(Generation(user_id=user.id, prompt=f'frame {i}',
+                                  created_at=base + timedelta(minutes=i // 2)))
+    db.session.commit()
+
+    client = sqlite_app.test_client()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+    prompts, cursor = [], ''
+    while cursor is not None:
+        response = client.get(f'/generation/history?per_page=3&cursor={cursor}', headers=headers)
+        assert response.status_code == 200
+        assert 'total' not in response.json
+        prompts += [g['prompt'] for g in response.json['generations']]
+        cursor = response.json['next_cursor']
+
+    assert prompts == [f'frame {i}' for i in reversed(range(7))]
+
+    bad = client.get('/generation/history?cursor=not-a-cursor', headers=headers)
+    assert bad.status_code == 400
+
+
+def test_project_listings_use_constant_query_count(sqlite_app):
+    from sqlalchemy import event
+    from app.models import db
+    from app.models.user import User
+    from app.models.project import Project
+
+    for i in range(6):
+        owner = User(username=f'owner{i}', email=f'owner{i}@example.com', password_hash='x')
+        db.session.add(owner)
+        db.session.flush()
+        db.session.add(Project(user_id=owner.id, title=f'p{i}', is_public=True, status='completed'))
+    db.session.commit()
+
+    client = sqlite_app.test_client()
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def queries_for(url):
+        db.session.remove()
+        statements.clear()
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            response = client.get(url)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        assert response.status_code == 200
+        return len(statements)
+
+    assert queries_for('/projects/public?per_page=2') == queries_for('/projects/public?per_page=6')
+    assert queries_for('/projects/public?cursor=&per_page=2') == queries_for('/projects/public?cursor=&per_page=6')
+    assert queries_for('/owner0/projects?per_page=2') == queries_for('/owner0/projects?per_page=6')
+
+
+def test_project_stats_counters_follow_generation_transitions(sqlite_app):
+    from app.models import db
+    from app.models.user import User
+    from app.models.project import Project, Generation
+    from app.models.stats import (
+        ProjectStats, aggregate_project_counts, init_stats, project_generation_counts
+    )
+
+    sqlite_app.config['STATS_COUNTERS'] = True
+    init_stats(sqlite_app)
+
+    user = User(username='stats', email='stats@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    project = Project(user_id=user.id, title='stats')
+    db.session.add(project)
+    db.session.flush()
+    generations = [Generation(user_id=user.id, project_id=project.id, prompt=str(i)) for i in range(4)]
+    db.session.add_all(generations)
+    db.session.commit()
+
+    # Transiciones sobre atributos expirados por el commit anterior
+    generations[0].status = 'completed'
+    generations[1].status = 'failed'
+    generations[2].is_favorite = True
+    db.session.commit()
+    generations[2].status = 'completed'
+    db.session.delete(generations[3])
+    db.session.commit()
+
+    expected = {
+        'total_generations': 3,
+        'completed_generations': 2,
+        'failed_generations': 1,
+        'favorite_generations': 1
+    }
+    assert aggregate_project_counts(project.id) == expected
+    assert ProjectStats.query.get(project.id).to_counts() == expected
+    assert project_generation_counts(project.id) == expected
+
+
+def test_user_stats_single_query_and_counters(sqlite_app):
+    from sqlalchemy import event
+    from app.models import db
+    from app.models.user import User
+    from app.models.project import Project, Generation
+    from app.models.stats import UserStats, aggregate_user_counts, init_stats, rebuild_stats
+
+    user = User(username='profile', email='profile@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    projects = [Project(user_id=user.id, title=str(i), is_public=i == 0) for i in range(2)]
+    db.session.add_all(projects)
+    db.session.flush()
+    db.session.add_all([
+        Generation(user_id=user.id, project_id=projects[0].id, prompt='a', status='completed', is_favorite=True),
+        Generation(user_id=user.id, project_id=projects[1].id, prompt='b', status='failed'),
+    ])
+    db.session.commit()
+
+    db.session.refresh(user)
+    statements = []
+    count = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        stats = user.to_dict(include_stats=True)['stats']
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    expected = {'total_projects': 2, 'public_projects': 1,
+                'completed_generations': 1, 'favorite_generations': 1}
+    assert stats == expected
+    assert len(statements) == 1
+
+    # Contadores: reconstrucción inicial y mantenimiento incremental
+    sqlite_app.config['STATS_COUNTERS'] = True
+    init_stats(sqlite_app)
+    rebuild_stats()
+    assert UserStats.query.get(user.id).to_counts() == expected
+
+    projects[1].is_public = True
+    Generation.query.filter_by(status='failed').one().status = 'completed'
+    db.session.delete(projects[0])
+    db.session.commit()
+
+    assert aggregate_user_counts(user.id) == {'total_projects': 1, 'public_projects': 1,
+                                              'completed_generations': 1, 'favorite_generations': 0}
+    assert UserStats.query.get(user.id).to_counts() == aggregate_user_counts(user.id)
+    assert user.to_dict(include_stats=True)['stats'] == aggregate_user_counts(user.id)
+
+
+def test_user_search_ranks_matches_and_pages_by_cursor(sqlite_app):
+    from app.models import db
+    from app.models.user import User
+
+    for username, full_name in [('ana', 'Ana Torres'), ('anabel', None), ('mariana', None),
+                                ('bob', 'Ana Bob'), ('carlos', 'Carlos Ruiz'), ('an_a', None)]:
+        db.session.add(User(username=username, email=f'{username}@example.com',
+                            password_hash='x', full_name=full_name))
+    db.session.commit()
+
+    client = sqlite_app.test_client()
+    found, cursor = [], ''
+    while cursor is not None:
+        response = client.get(f'/search?q=ana&per_page=2&cursor={cursor}')
+        assert response.status_code == 200
+        assert 'total' not in response.json
+        found += [u['username'] for u in response.json['users']]
+        cursor = response.json['next_cursor']
+
+    # Exacta, prefijo, contiene y luego coincidencias solo por nombre
+    assert found == ['ana', 'anabel', 'mariana', 'bob']
+
+    # Sin cursor se mantiene la respuesta por página
+    response = client.get('/search?q=ana&per_page=3&page=2')
+    assert response.status_code == 200
+    assert (response.json['total'], response.json['page'], response.json['pages']) == (4, 2, 2)
+    assert 'next_cursor' not in response.json
+    assert [u['username'] for u in response.json['users']] == ['bob']
+
+    # Los comodines de LIKE se buscan literalmente
+    response = client.get('/search?q=an_')
+    assert [u['username'] for u in response.json['users']] == ['an_a']
+
+
+def test_trigram_score_cursor_round_trips_exactly():
+    from decimal import Decimal
+    from sqlalchemy.dialects import postgresql
+    from app.services.user_search import _trigram_match
+    from app.utils.pagination import decode_cursor, encode_cursor
+
+    _, score = _trigram_match('ana')
+    assert 'AS NUMERIC(10, 6)' in str(score.compile(dialect=postgresql.dialect()))
+
+    token = encode_cursor(Decimal('0.333333'), 17)
+    assert decode_cursor(token) == (Decimal('0.333333'), 17)
+
+
+def test_batch_translator_matches_scalar_rules():
+    from app.services.translator import translate_camera_data, translate_camera_path
+
+    # Incluye los bordes de cada regla
+    positions = [[0, 2, 5], [0, 3.0, 0], [0, 4, 0], [0, -1.0, 0], [0, -2, 0],
+                 [4, 0, 0], [0, 0, 8], [3, 0, 0], [10, 10, 10]]
+    lights = [[0, 3, 3], [1, 0, 0], [0, 1, 0], [0, 35, 49], [0, 55, 1], [1, 1, 0],
+              [0, 0, 0], [2, 3, 0], [0, 10, 1]]
+
+    expected = [translate_camera_data({"position": p}, light) for p, light in zip(positions, lights)]
+    assert translate_camera_path(positions, lights) == expected
+
+    single_light = translate_camera_path(positions, [0, 3, 3], fovs=35)
+    assert [f["lighting"] for f in single_light] == ["studio_lighting"] * len(positions)
+    assert {f["fov"] for f in single_light} == {35}
+
+
+def test_camera_path_endpoint(sqlite_app):
+    from flask_jwt_extended import create_access_token
+
+    headers = {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+    client = sqlite_app.test_client()
+
+    response = client.post('/generation/camera-path', headers=headers,
+                           json={'positions': [[0, 5, 1], [0, 0, 10]], 'fov': [35, 50]})
+    assert response.status_code == 200
+    assert [(f['angle'], f['shot_type'], f['fov']) for f in response.json['frames']] == [
+        ('birds_eye', 'medium_shot', 35), ('eye_level', 'long_shot', 50)
+    ]
+
+    bad = client.post('/generation/camera-path', headers=headers, json={'positions': [[0, 1]]})
+    assert bad.status_code == 400
+
+
+def test_path_segmenter_hysteresis_and_scenes():
+    from app.services.path_segmenter import segment_camera_path, segments_to_scenes
+
+    # La altura oscila alrededor del umbral eye_level/high_angle (1.0): sin
+    # histéresis cada keyframe cambiaría de categoría
+    jitter = [[0, 1.0 + (0.1 if i % 2 else -0.1), 5] for i in range(20)]
+    # Luego sube claramente a birds_eye y se aleja a long_shot
+    positions = jitter + [[0, 5, 2]] * 5 + [[0, 5, 12]] * 5
+
+    segments = segment_camera_path(positions, fovs=[40] * 20 + [60] * 10)
+    assert [(s['start'], s['end'], s['angle'], s['shot_type']) for s in segments] == [
+        (0, 20, 'eye_level', 'medium_shot'),
+        (20, 25, 'birds_eye', 'medium_shot'),
+        (25, 30, 'birds_eye', 'long_shot'),
+    ]
+    assert [s['fov'] for s in segments] == [40.0, 60.0, 60.0]
+
+    scenes = segments_to_scenes(segments, 'A neon street', style='realistic')
+    assert [scene.scene_number for scene in scenes] == [1, 2, 3]
+    assert scenes[0].camera.angle == 'eye_level'
+    assert scenes[0].lighting.preset == 'three_point'
+    assert all(scene.validate()[0] for scene in scenes)
+
+
+def test_camera_path_endpoint_segments(sqlite_app):
+    from flask_jwt_extended import create_access_token
+
+    headers = {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+    client = sqlite_app.test_client()
+
+    body = {'positions': [[0, 5, 1]] * 3 + [[0, 0, 10]] * 2, 'segment': True}
+    assert client.post('/generation/camera-path', headers=headers, json=body).status_code == 400
+
+    body['prompt'] = 'A castle'
+    response = client.post('/generation/camera-path', headers=headers, json=body)
+    assert response.status_code == 200
+    assert response.json['total'] == 2
+    assert response.json['scenes'][1] == {
+        'prompt': 'A castle',
+        'camera': {'angle': 'eye_level', 'shot_type': 'long_shot', 'fov': 50.0},
+        'lighting': {'preset': 'three_point'}
+    }
+
+
+def test_scene_compiled_serializers():
+    from dataclasses import asdict
+    from app.models.lighting import LightingSetup, LightSource
+    from app.models.scene import Scene
+
+    scene = Scene.preset_noir('A detective')
+    scene.lighting = LightingSetup(lights=[LightSource(), LightSource(type='rim', color_tint='blue')])
+    scene.seed = 7
+    scene.tags = ['night']
+
+    # Instancias sin __dict__
+    assert not hasattr(scene, '__dict__')
+    assert not hasattr(scene.camera, '__dict__')
+
+    payload = scene.to_fibo_payload()
+    assert payload['seed'] == 7 and payload['tags'] == ['night']
+    assert payload['camera'] == scene.camera.to_fibo_json()['camera']
+    assert payload['custom_lights'][1] == asdict(scene.lighting.lights[1])
+    assert payload['mood'] == 'mysterious'
+
+    data = scene.to_dict()
+    assert data['camera'] == asdict(scene.camera)
+    assert data['lighting'] == asdict(scene.lighting)
+    assert Scene.from_dict(data).to_fibo_payload() == payload
+
+    plain = Scene('x').to_fibo_payload()
+    assert not {'custom_lights', 'seed', 'mood', 'color_palette', 'tags'} & set(plain)
+
+
+def test_batch_validation_reports_every_violation():
+    from pydantic import ValidationError
+    from app.models.camera import CameraSettings
+    from app.models.constraints import CAMERA_CONSTRAINTS, validate_scenes
+    from app.models.lighting import LightingSetup, LightSource
+    from app.models.scene import Scene
+    from app.schemas.validation import CameraParametersSchema, SceneParametersSchema
+
+    bad = Scene(
+        prompt=' ',
+        steps=5,
+        camera=CameraSettings(fov=200),
+        lighting=LightingSetup(lights=[LightSource(), LightSource(color_temp=500)])
+    )
+    assert validate_scenes([Scene('ok'), bad]) == [[], [
+        "El prompt no puede estar vacío",
+        "Steps debe estar entre 10 y 100",
+        "Error en cámara: FOV debe estar entre 10 y 150 grados",
+        "Error en iluminación: Light 1: color_temp debe estar entre 1000K y 12000K",
+    ]]
+    # validate() conserva su contrato: la primera violación
+    assert bad.validate() == (False, "El prompt no puede estar vacío")
+
+    # Pydantic usa los mismos límites
+    for constraint in CAMERA_CONSTRAINTS:
+        info = CameraParametersSchema.__fields__[constraint.field].field_info
+        assert (info.ge, info.le) == (constraint.low, constraint.high)
+    with pytest.raises(ValidationError):
+        SceneParametersSchema(prompt='x', camera={'fov': 200})
+    assert SceneParametersSchema(prompt='x', seed=0).seed == 0
+
+
+def test_scene_payload_serializes_once_per_frame(sqlite_app, monkeypatch):
+    import hashlib
+    import json
+    from app.models import db
+    from app.models.payload import ScenePayload
+    from app.models.project import Generation
+    from app.models.scene import Scene
+    from app.models.user import User
+    from app.services.fibo_service import FIBOService
+    from app.services.result_cache import MemoryLRUBackend, ResultCache, canonical_payload_hash
+
+    passes = []
+    original = ScenePayload._serialize
+    monkeypatch.setattr(ScenePayload, '_serialize', lambda self: passes.append(1) or original(self))
+
+    payload = Scene('A lighthouse at dusk', seed=11, scene_number=3, tags=['coast']).to_fibo_payload()
+    assert isinstance(payload, ScenePayload)
+
+    # Persistencia, caché de resultados, single-flight y llamada upstream
+    user = User.create('payload', 'payload@example.com', 'secret123')
+    generation = Generation(user_id=user.id, prompt=payload['prompt'], status='generating')
+    generation.set_parameters(payload)
+    db.session.add(generation)
+    db.session.commit()
+
+    service = FIBOService()
+    service.mock_mode = True
+    service.result_cache = ResultCache(MemoryLRUBackend())
+    service.generate_image(payload)
+    assert service.generate_image(payload)['cached'] is True
+    assert len(passes) == 1
+
+    # Mismo hash que el formato canónico anterior, sin metadatos de organización
+    render = {k: v for k, v in payload.items() if k not in ('scene_number', 'tags')}
+    canonical = json.dumps(render, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    assert payload.content_hash == hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    assert json.loads(payload.json_text) == payload
+
+    db.session.expire_all()
+    assert Generation.query.get(generation.id).get_parameters() == payload
+
+    # Cambiar un campo de render invalida lo cacheado
+    moved = ScenePayload(payload, scene_number=9)
+    assert canonical_payload_hash(moved) == payload.content_hash
+    moved['seed'] = 12
+    assert canonical_payload_hash(moved) != payload.content_hash
+
+
+def test_sequence_fails_only_the_malformed_frame(sqlite_app, monkeypatch):
+    from flask_jwt_extended import create_access_token
+    from app.models.user import User
+    from app.routes import generation as generation_routes
+
+    user = User.create('storyboard', 'storyboard@example.com', 'secret123')
+    token = create_access_token(identity=str(user.id))
+
+    monkeypatch.setattr(
+        generation_routes.fibo_service,
+        'generate_image',
+        lambda payload: {"id": "img", "image_url": "https://example.com/frame.png"}
+    )
+
+    response = sqlite_app.test_client().post(
+        '/generation/sequence',
+        json={'scenes': [
+            {'prompt': 'frame ok'},
+            {'prompt': 'fov no numérico', 'camera': {'fov': 'abc'}},
+            {'prompt': 'luz fuera de rango', 'lighting': {'lights': [{'color_temp': 20000}]}},
+            {'prompt': 'fov como texto y luces como dicts', 'camera': {'fov': '50'},
+             'lighting': {'lights': [{'intensity': 1.0}]}},
+        ]},
+        headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == 200
+    assert (response.json['completed'], response.json['failed']) == (2, 2)
+    frames = response.json['frames']
+    assert [f['status'] for f in frames] == ['completed', 'failed', 'failed', 'completed']
+    assert frames[1]['error_message'] == 'camera.fov: value is not a valid float'
+    assert frames[2]['error_message'] == (
+        'Error en iluminación: Light 0: color_temp debe estar entre 1000K y 12000K'
+    )
+    assert frames[3]['parameters']['camera']['fov'] == 50.0
+
+
+def test_single_rejects_bad_scene_input_before_building(sqlite_app, monkeypatch):
+    from flask_jwt_extended import create_access_token
+    from app.models.project import Generation
+    from app.models.user import User
+    from app.routes import generation as generation_routes
+
+    user = User.create('singleframe', 'single@example.com', 'secret123')
+    token = create_access_token(identity=str(user.id))
+
+    def fail_if_called(payload):
+        raise AssertionError("no debe llamarse a FIBO con una escena inválida")
+
+    monkeypatch.setattr(generation_routes.fibo_service, 'generate_image', fail_if_called)
+
+    client = sqlite_app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    # Tipos inválidos y campos desconocidos se rechazan al construir la escena
+    response = client.post(
+        '/generation/single',
+        json={'prompt': 'frame', 'camera': {'fov': 'abc', 'zoom': 2}, 'async': False},
+        headers=headers
+    )
+    assert response.status_code == 400
+    assert response.json['errors'] == [
+        'camera.fov: value is not a valid float',
+        'camera.zoom: extra fields not permitted',
+    ]
+
+    # Los rangos los revisa el validador compilado, con todas las violaciones
+    response = client.post(
+        '/generation/single',
+        json={'prompt': 'frame', 'camera': {'fov': '500'}, 'steps': 500},
+        headers=headers
+    )
+    assert response.status_code == 400
+    assert response.json['errors'] == [
+        'Steps debe estar entre 10 y 100',
+        'Error en cámara: FOV debe estar entre 10 y 150 grados',
+    ]
+
+    assert [g.status for g in Generation.query.filter_by(user_id=user.id)] == ['failed', 'failed']
+    assert user.get_remaining_generations() == user.get_daily_limit()
+
+
+def test_sequence_times_every_stage_and_commit(sqlite_app, monkeypatch):
+    from flask_jwt_extended import create_access_token
+    from app.models.user import User
+    from app.routes import generation as generation_routes
+    from app.utils.metrics import GENERATION_STAGE_SECONDS
+
+    def counts():
+        with GENERATION_STAGE_SECONDS._lock:
+            return {labels[0]: sum(series[0]) for labels, series in GENERATION_STAGE_SECONDS._series.items()}
+
+    user = User.create('timed', 'timed@example.com', 'secret123')
+    token = create_access_token(identity=str(user.id))
+
+    monkeypatch.setattr(
+        generation_routes.fibo_service,
+        'generate_image',
+        lambda payload: {"id": "img", "image_url": "https://example.com/frame.png"}
+    )
+
+    before = counts()
+    response = sqlite_app.test_client().post(
+        '/generation/sequence',
+        json={'scenes': [{'prompt': 'uno'}, {'prompt': 'dos'}, {'prompt': 'tres'}]},
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    after = counts()
+
+    assert response.status_code == 200
+    observed = {stage: after.get(stage, 0) - before.get(stage, 0) for stage in after}
+    assert observed['user_lookup'] == 1
+    # El storyboard se valida en un solo lote
+    assert observed['validate'] == 1
+    assert observed['scene_build'] == 3
+    assert observed['payload_build'] == 3
+    # Un commit para crear los registros y uno por frame terminado
+    assert observed['db_commit'] == 4
+
+
+def test_abandoned_sequence_cancels_pending_frames_and_frees_user_slot():
+    import time
+    from app.services.concurrency import ConcurrencyLimiter
+    from app.services.fibo_service import FIBOService
+
+    service = FIBOService()
+    service.limiter = ConcurrencyLimiter(global_limit=4, per_user_limit=1)
+    calls = []
+
+    def slow_generate(payload):
+        calls.append(payload['prompt'])
+        time.sleep(0.05)
+        return {"id": payload['prompt'], "image_url": "https://img/frame.png"}
+
+    service.generate_image = slow_generate
+
+    frames = service.iter_sequence([{"prompt": f"frame {i}"} for i in range(6)], user_key=42)
+    index, result, _ = next(frames)
+    frames.close()
+    time.sleep(0.2)
+
+    assert index == 0 and result['id'] == 'frame 0'
+    # Con un worker, a lo sumo el frame que ya estaba en curso llega a Bria
+    assert len(calls) <= 2
+    assert service.limiter._per_user == {}
+
+
+def test_generation_queue_starts_once_and_async_flag_is_strict(sqlite_app, monkeypatch):
+    import threading
+    from flask_jwt_extended import create_access_token
+    from app.models.user import User
+    from app.routes import generation as generation_routes
+    from app.services.generation_queue import get_generation_queue
+
+    sqlite_app.config['GENERATION_QUEUE_PATH'] = ':memory:'
+    states = []
+    barrier = threading.Barrier(8)
+
+    def init():
+        barrier.wait()
+        states.append(get_generation_queue(sqlite_app, generation_routes.fibo_service))
+
+    threads = [threading.Thread(target=init) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    queue, pool = states[0]
+    try:
+        assert all(state == (queue, pool) for state in states)
+        assert len(pool._threads) == sqlite_app.config.get('GENERATION_QUEUE_WORKERS', 2)
+
+        user = User.create('asyncflag', 'asyncflag@example.com', 'secret123')
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+        monkeypatch.setattr(
+            generation_routes.fibo_service,
+            'generate_image',
+            lambda payload: {"id": "img", "image_url": "https://example.com/frame.png"}
+        )
+        client = sqlite_app.test_client()
+
+        # "false" y "0" no activan el modo cola
+        for value in ('false', '0'):
+            response = client.post('/generation/single', json={'prompt': 'p', 'async': value}, headers=headers)
+            assert response.status_code == 200
+
+        response = client.post('/generation/single', json={'prompt': 'p', 'async': 'quizás'}, headers=headers)
+        assert response.status_code == 400
+        assert queue.pending_count() == 0
+    finally:
+        pool.stop()
+
+
+def test_failed_queue_job_fails_generation_and_refunds_quota(sqlite_app):
+    import time
+    from app.models import db
+    from app.models.user import User
+    from app.models.project import Generation
+    from app.services.generation_queue import GenerationWorkerPool, SQLiteJobQueue
+
+    class UnserializableResult:
+        def generate_image(self, payload):
+            # El commit final no puede guardar un ID que no es texto
+            return {"id": object(), "image_url": "https://img/x.png"}
+
+    user = User.create('queued', 'queued@example.com', 'secret123')
+    assert user.reserve_generations()
+    generation = Generation(user_id=user.id, prompt='p', status='pending')
+    db.session.add(generation)
+    db.session.commit()
+    generation_id = generation.id
+    remaining = user.get_remaining_generations()
+
+    queue = SQLiteJobQueue()
+    queue.put(generation_id, {"prompt": "p"})
+    pool = GenerationWorkerPool(sqlite_app, queue, UnserializableResult(), num_workers=1, poll_interval=0.01)
+    pool.start()
+    try:
+        deadline = time.time() + 3
+        while time.time() < deadline:
+            db.session.expire_all()
+            if Generation.query.get(generation_id).status == 'failed':
+                break
+            time.sleep(0.02)
+    finally:
+        pool.stop()
+
+    db.session.expire_all()
+    assert Generation.query.get(generation_id).status == 'failed'
+    assert User.query.get(user.id).get_remaining_generations() == remaining + 1
+
+
+def test_worker_pool_reconciles_orphaned_pending_generations(sqlite_app, tmp_path):
+    from datetime import datetime, timedelta
+    from app.models import db
+    from app.models.user import User
+    from app.models.project import Generation
+    from app.services.generation_queue import GenerationWorkerPool, SQLiteJobQueue
+
+    user = User.create('orphans', 'orphans@example.com', 'secret123')
+    assert user.reserve_generations(3)
+    old = datetime.utcnow() - timedelta(minutes=5)
+    with_payload = Generation(user_id=user.id, prompt='a', status='pending', created_at=old)
+    with_payload.set_parameters({"prompt": "a", "seed": 1})
+    without_payload = Generation(user_id=user.id, prompt='b', status='pending', created_at=old)
+    just_created = Generation(user_id=user.id, prompt='c', status='pending')
+    db.session.add_all([with_payload, without_payload, just_created])
+    db.session.commit()
+    ids = [with_payload.id, without_payload.id, just_created.id]
+    user_id = user.id
+    remaining = user.get_remaining_generations()
+
+    # Cola en archivo que perdió sus trabajos (como una ':memory:' tras reiniciar)
+    queue = SQLiteJobQueue(str(tmp_path / 'queue.sqlite3'))
+    pool = GenerationWorkerPool(sqlite_app, queue, fibo_service=None)
+
+    assert pool.reconcile_orphans() == 2
+    assert queue.active_generation_ids() == {ids[0]}
+    assert queue.claim()['payload'] == {"prompt": "a", "seed": 1}
+
+    db.session.expire_all()
+    assert [Generation.query.get(i).status for i in ids] == ['pending', 'failed', 'pending']
+    assert User.query.get(user_id).get_remaining_generations() == remaining + 1
+
+    # Las que ya tienen trabajo no se reencolan otra vez
+    queue.put(ids[0], {"prompt": "a", "seed": 1})
+    assert pool.reconcile_orphans() == 0
+
+
+def test_result_poller_restarts_dead_thread_on_track(sqlite_app):
+    import time
+    from app.models import db
+    from app.models.user import User
+    from app.models.project import Generation
+    from app.services.result_poller import ResultPoller
+
+    class CrashingFibo:
+        result_cache = None
+        calls = 0
+
+        def get_result_by_id(self, result_id):
+            self.calls += 1
+            if self.calls == 1:
+                return None  # Respuesta inesperada: el thread muere en _is_finished
+            return {"success": True, "id": result_id, "status": "completed",
+                    "image_url": f"https://img/{result_id}.png"}
+
+    user = User(username='crash_user', email='c@example.com', password_hash='x',
+                generations_today=0, total_generations=0)
+    db.session.add(user)
+    db.session.commit()
+    first = Generation(user_id=user.id, prompt='a', status='generating', fibo_generation_id='req-a')
+    second = Generation(user_id=user.id, prompt='b', status='generating', fibo_generation_id='req-b')
+    db.session.add_all([first, second])
+    db.session.commit()
+    ids = [first.id, second.id]
+
+    poller = ResultPoller(sqlite_app, CrashingFibo(), initial_interval=0.01, max_interval=0.05)
+    poller.start()
+    try:
+        poller.track(ids[0], 'req-a')
+        deadline = time.time() + 3
+        while poller._thread.is_alive() and time.time() < deadline:
+            time.sleep(0.01)
+        assert not poller._thread.is_alive()
+
+        # El siguiente track detecta el thread muerto y lo reinicia
+        poller.track(ids[1], 'req-b')
+        while poller.pending_count() and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        poller.stop()
+
+    db.session.expire_all()
+    assert [Generation.query.get(i).status for i in ids] == ['completed', 'completed']
+
+
+def test_camera_and_lighting_values_are_frozen():
+    import dataclasses
+    import pytest
+    from app.models.camera import CameraSettings
+    from app.models.lighting import LightingSetup, LightSource
+    from app.models.scene import Scene
+
+    camera = CameraSettings(fov=35.0)
+    lighting = LightingSetup(lights=[LightSource(intensity=1.5)])
+
+    for value, name in [(camera, 'fov'), (lighting, 'fog'), (lighting.lights[0], 'intensity')]:
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            setattr(value, name, 0.5)
+
+    wide = dataclasses.replace(camera, fov=90.0)
+    assert (camera.fov, wide.fov) == (35.0, 90.0)
+
+    # La escena sigue siendo mutable; sus valores de cámara e iluminación se reemplazan enteros
+    scene = Scene('frame', camera=camera, lighting=lighting)
+    scene.camera = wide
+    assert scene.to_fibo_payload()['camera']['fov'] == 90.0
+    assert scene.lighting.to_fibo_json()['custom_lights'][0]['intensity'] == 1.5